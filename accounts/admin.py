@@ -61,6 +61,7 @@ class CustomUserAdmin(admin.ModelAdmin):  # Changed from BaseUserAdmin to ModelA
         (None, {'fields': ('user',)}),
         ('Personal Info', {'fields': ('email', 'birthdate', 'phone_number')}),
         ('Profile', {'fields': ('person', 'role')}),
+        ('Evaluation', {'fields': ('max_open_evaluations',)}),
     )
     
     # Methods to display related User fields
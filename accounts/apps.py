@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounts'
+
+    def ready(self):
+        # Drop cached profiles when CustomUser, Role or Person change
+        from .profile import connect_signals
+        connect_signals()
@@ -0,0 +1,36 @@
+from functools import wraps
+
+from django.contrib import messages
+from django.http import JsonResponse
+from django.shortcuts import redirect
+
+from .profile import get_profile
+
+
+def role_required(*role_names, message="Access denied.", redirect_to='home', json=False, status=None):
+    """
+    Allow the view only for users whose CustomUser role is one of `role_names`.
+
+    Uses the profile loaded by UserProfileMiddleware (`request.profile`), so the
+    check costs no queries. Denied requests get `messages.error` + redirect, or
+    `{'success': False, 'error': message}` when `json=True`.
+
+        @login_required
+        @role_required('Coordinator')
+        def coordinator_dashboard(request): ...
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            profile = get_profile(request)
+            if profile is None or profile.role is None or profile.role.name not in role_names:
+                if json:
+                    response = JsonResponse({'success': False, 'error': message})
+                    if status:
+                        response.status_code = status
+                    return response
+                messages.error(request, message)
+                return redirect(redirect_to)
+            return view_func(request, *args, **kwargs)
+        return _wrapped
+    return decorator
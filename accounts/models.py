@@ -79,6 +79,15 @@ class CustomUser(models.Model):
         ]
     )
 
+    # Evaluators only: open evaluations (pending / in progress) the automatic
+    # assignment may leave on this user. Empty means no limit.
+    max_open_evaluations = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Máximo de evaluaciones abiertas",
+        help_text="Solo evaluadores. Límite de evaluaciones pendientes o en progreso para la asignación automática; vacío = sin límite."
+    )
+
     groups = models.ManyToManyField(
         'auth.Group',
         blank=True,
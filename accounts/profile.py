@@ -0,0 +1,95 @@
+"""
+Carga del perfil (CustomUser + Role + Person) una sola vez por peticion.
+
+`UserProfileMiddleware` (climas/middleware.py) llama a `load_profile()` y deja
+el resultado en `request.profile`. Ademas llena la cache de la relacion
+inversa `request.user.customuser`, de modo que el codigo existente que accede
+a `request.user.customuser.role.name` tampoco genera consultas.
+
+Con `USER_PROFILE_CACHE_TIMEOUT` > 0 el perfil se guarda en el cache de Django
+bajo el id del usuario y se invalida al guardar/borrar CustomUser, Role o
+Person. El serializador de sesion es JSON y no admite instancias de modelo,
+por eso no se guarda en la sesion misma.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+
+from .models import CustomUser, Role
+
+PROFILE_CACHE_KEY = 'climas:profile:{user_id}'
+
+# Cache descriptor for `user.customuser` (reverse one-to-one)
+_customuser_relation = CustomUser.user.field.remote_field
+
+
+def _cache_timeout():
+    return getattr(settings, 'USER_PROFILE_CACHE_TIMEOUT', 0)
+
+
+def load_profile(user):
+    """
+    Return the CustomUser for `user` with role and person loaded, or None.
+    """
+    if not user.is_authenticated:
+        return None
+
+    timeout = _cache_timeout()
+    key = PROFILE_CACHE_KEY.format(user_id=user.pk)
+    profile = cache.get(key) if timeout else None
+
+    if profile is None:
+        profile = (
+            CustomUser.objects
+            .select_related('role', 'person')
+            .filter(user_id=user.pk)
+            .first()
+        )
+        if profile is not None and timeout:
+            cache.set(key, profile, timeout)
+
+    if profile is not None:
+        # Reuse the request's user instead of the one cached/loaded with the profile
+        profile.user = user
+    _customuser_relation.set_cached_value(user, profile)
+    return profile
+
+
+def get_profile(request):
+    """`request.profile`, loading it here if the middleware did not run."""
+    if not hasattr(request, 'profile'):
+        request.profile = load_profile(request.user)
+    return request.profile
+
+
+def invalidate_profile(user_id):
+    cache.delete(PROFILE_CACHE_KEY.format(user_id=user_id))
+
+
+def _on_customuser_change(sender, instance, **kwargs):
+    if _cache_timeout():
+        invalidate_profile(instance.user_id)
+
+
+def _on_role_change(sender, instance, **kwargs):
+    if not _cache_timeout():
+        return
+    for user_id in CustomUser.objects.filter(role=instance).values_list('user_id', flat=True):
+        invalidate_profile(user_id)
+
+
+def _on_person_change(sender, instance, **kwargs):
+    if not _cache_timeout():
+        return
+    for user_id in CustomUser.objects.filter(person=instance).values_list('user_id', flat=True):
+        invalidate_profile(user_id)
+
+
+def connect_signals():
+    """Called from AccountsConfig.ready()."""
+    from people.models import Person
+
+    for name, signal in (('save', post_save), ('delete', post_delete)):
+        signal.connect(_on_customuser_change, sender=CustomUser, dispatch_uid=f'profile:customuser:{name}')
+        signal.connect(_on_role_change, sender=Role, dispatch_uid=f'profile:role:{name}')
+        signal.connect(_on_person_change, sender=Person, dispatch_uid=f'profile:person:{name}')
@@ -17,6 +17,12 @@ class CallAdmin(admin.ModelAdmin):
             'fields': ('opening_datetime', 'closing_datetime'),
             'classes': ('collapse',),
         }),
+        ('Evaluación', {
+            'fields': (
+                'approval_threshold', 'required_evaluations',
+                'escalation_score_gap', 'escalate_on_split', 'max_evaluations',
+            ),
+        }),
         ('Audit', {
             'fields': ('created_by', 'created_at', 'updated_at'),
             'classes': ('collapse',),
@@ -5,27 +5,41 @@ from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from decimal import Decimal
 import json
 
 from .models import Call
 from proponent_forms.models import ProponentForm, SharedQuestion
 from evaluations.models import EvaluationTemplate, TemplateCategory, TemplateItem
+from accounts.decorators import role_required
+from cbo.models import CBO
+from common.reference_data import reference_data
+from common.status_registry import statuses, scales
+from common.word_limits import EXPRESSION_LIMITS, PROPOSAL_LIMITS, WORD_LIMIT_SETS
+from expressions.models import Expression
+from expressions.persistence import (
+    MAX_EXPRESSION_BUDGET, scale_name_for_budget, to_int, to_date,
+    sync_products, sync_team_members, sync_budget_items, sync_cbo_roles, sync_responses,
+)
+from institutions.models import Institution
+from proposals.models import Proposal
+from proponent_forms.bundle import form_bundle
 
 User = get_user_model()
 
 @csrf_exempt
 @login_required
+@role_required('Coordinator', message='Permiso denegado', json=True, status=403)
 def api_save_call_templates(request, call_pk):
     """
     Save ProponentForm and EvaluationTemplate via AJAX.
     Called from setup_call.html with Alpine.js.
     """
-    if not request.user.role.name == 'Coordinator':
-        return JsonResponse({'error': 'Permiso denegado'}, status=403)
-
     try:
         data = json.loads(request.body)
-        call = get_object_or_404(Call, pk=call_pk, coordinator=request.user)
+        call = get_object_or_404(Call, pk=call_pk, coordinator=request.profile)
 
         proponent_form, created = ProponentForm.objects.get_or_create(
             call=call,
@@ -70,4 +84,315 @@ def api_save_call_templates(request, call_pk):
         return JsonResponse({'status': 'ok'})
 
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=400)
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@login_required
+def api_word_limits(request, form_name):
+    """Word limits of a form ('expression' or 'proposal') as JSON Schema."""
+    limits = WORD_LIMIT_SETS.get(form_name)
+    if limits is None:
+        return JsonResponse({'success': False, 'error': 'Formulario desconocido.'}, status=404)
+    return JsonResponse(limits.schema())
+
+
+# -------------------------
+# Section autosave (expression / proposal drafts)
+# -------------------------
+#
+# PATCH /calls/expression/<id>/autosave/<section>/   body: JSON for that section
+# PATCH /calls/proposal/<id>/autosave/<section>/
+#
+# Only the given section is validated and written. The response carries the
+# new version (also as ETag); send it back in If-Match and a stale draft gets
+# 412 instead of overwriting someone else's save.
+
+def _version(expression):
+    return f'"{int(expression.updated_at.timestamp() * 1000000)}"'
+
+
+def _json_error(error, status, **extra):
+    return JsonResponse({'success': False, 'error': error, **extra}, status=status)
+
+
+def _text(data, key):
+    value = data.get(key)
+    return value.strip() if isinstance(value, str) else ''
+
+
+def _autosave_core(request, expression, data):
+    fields = {}
+    for key in ('project_title', 'problem', 'general_objective', 'methodology', 'past_projects_summary'):
+        if key in data:
+            fields[key] = _text(data, key)
+    errors = EXPRESSION_LIMITS.validate(fields=fields)
+    if errors:
+        return errors, None
+    if 'funding_eligibility_acceptance' in data:
+        fields['funding_eligibility_acceptance'] = bool(data['funding_eligibility_acceptance'])
+    if 'thematic_axis' in data:
+        axis = reference_data.by_id('thematic_axes', data['thematic_axis'])
+        if axis is None:
+            return ['Eje temático inválido.'], None
+        fields['thematic_axis'] = axis
+    if 'implementation_country' in data:
+        country = reference_data.by_id('countries', data['implementation_country'])
+        if country is None:
+            return ['País de implementación inválido.'], None
+        fields['implementation_country'] = country
+    if 'primary_institution_id' in data:
+        inst_id = to_int(data['primary_institution_id'])
+        if inst_id and not Institution.objects.filter(id=inst_id).exists():
+            return ['Institución seleccionada no válida.'], None
+        fields['primary_institution_id'] = inst_id
+
+    changed = [name for name, value in fields.items() if getattr(expression, name) != value]
+    for name in changed:
+        setattr(expression, name, fields[name])
+    if changed:
+        expression.save(update_fields=changed + ['updated_at'])
+    return [], {'changed': changed}
+
+
+def _autosave_products(request, expression, data):
+    rows = []
+    for row in data.get('rows', []):
+        title = _text(row, 'title')
+        if not title:
+            continue
+        rows.append({
+            'title': title,
+            'description': row.get('description') or '',
+            'outcome': row.get('outcome') or '',
+            'start_date': to_date(row.get('start_date')),
+            'end_date': to_date(row.get('end_date')),
+            'effect_ids': {i for i in map(to_int, row.get('strategic_effects', [])) if i},
+        })
+    errors = EXPRESSION_LIMITS.validate(groups={'products': [row['description'] for row in rows]})
+    if errors:
+        return errors, None
+    return [], sync_products(expression, rows, statuses.get('Abierta'), request.user)
+
+
+def _autosave_team(request, expression, data):
+    rows = {}
+    for row in data.get('rows', []):
+        person_id = to_int(row.get('person_id'))
+        role = _text(row, 'role')
+        if not person_id or not role or person_id in rows:
+            continue
+        rows[person_id] = {
+            'role': role,
+            'status_id': to_int(row.get('status_id')),
+            'start_date': to_date(row.get('start_date')),
+            'end_date': to_date(row.get('end_date')),
+            'institution_id': to_int(row.get('institution_id')),
+            'antecedents': [
+                {
+                    'thematic_axis_id': to_int(a.get('thematic_axis_id')),
+                    'description': _text(a, 'description'),
+                    'evidence_url': _text(a, 'evidence_url'),
+                }
+                for a in row.get('antecedents', []) if _text(a, 'description')
+            ],
+        }
+    texts = []
+    for row in rows.values():
+        texts.append(row['role'])
+        texts.extend(a['description'] for a in row['antecedents'])
+    errors = EXPRESSION_LIMITS.validate(groups={'team': texts})
+    if errors:
+        return errors, None
+    return [], sync_team_members(expression, rows)
+
+
+def _autosave_budget(request, expression, data):
+    rows, errors = {}, []
+    total_budget = 0
+    for position, row in enumerate(data.get('rows', []), start=1):
+        category = reference_data.by_id('budget_categories', row.get('category_id'))
+        period = reference_data.by_id('budget_periods', row.get('period_id'))
+        try:
+            amount = float(row.get('amount') or 0)
+        except (TypeError, ValueError):
+            amount = 0
+        if category is None:
+            errors.append(f"Invalid category in budget item {position}")
+        elif period is None:
+            errors.append(f"Invalid period in budget item {position}")
+        elif amount <= 0:
+            errors.append(f"Invalid amount in budget item {position}: El valor debe ser mayor que 0.")
+        elif (category.id, period.id) in rows:
+            errors.append(f"Duplicated category and period in budget item {position}")
+        else:
+            rows[(category.id, period.id)] = {'amount': Decimal(str(amount)), 'notes': _text(row, 'notes')}
+            total_budget += amount
+    if total_budget > MAX_EXPRESSION_BUDGET:
+        errors.append("El presupuesto total no puede exceder los $900.000.000 COP.")
+    errors += EXPRESSION_LIMITS.validate(groups={'budget_notes': [row['notes'] for row in rows.values()]})
+    if errors:
+        return errors, None
+
+    delta = sync_budget_items(expression, rows)
+    scale = scales.get(scale_name_for_budget(total_budget))
+    if expression.scale_id != scale.id:
+        expression.scale = scale
+        expression.save(update_fields=['scale', 'updated_at'])
+    delta.update({'total_budget': total_budget, 'scale': scale.name})
+    return [], delta
+
+
+def _autosave_cbo(request, expression, data):
+    name = _text(data, 'name')
+    if not name:
+        if expression.community_organization_id is not None:
+            expression.community_organization = None
+            expression.save(update_fields=['community_organization', 'updated_at'])
+        return [], {'cbo_id': None}
+
+    description = _text(data, 'description')
+    members = to_int(data.get('number_of_members'))
+    if members is None or members < 0:
+        return ['Número de miembros inválido.'], None
+
+    cbo, _ = CBO.objects.get_or_create(
+        name=name,
+        defaults={'description': description, 'number_of_members': members, 'is_active': True}
+    )
+    if cbo.description != description or cbo.number_of_members != members:
+        cbo.description = description
+        cbo.number_of_members = members
+        cbo.save()
+
+    rows = [
+        {
+            'predefined_role': row.get('predefined_role') or None,
+            'custom_role': _text(row, 'custom_role'),
+            'person_name': _text(row, 'person_name'),
+            'contact_phone': _text(row, 'contact_phone'),
+            'contact_email': _text(row, 'contact_email'),
+        }
+        for row in data.get('roles', []) if _text(row, 'person_name')
+    ]
+    delta = sync_cbo_roles(cbo, rows)
+    if expression.community_organization_id != cbo.id:
+        expression.community_organization = cbo
+        expression.save(update_fields=['community_organization', 'updated_at'])
+    delta['cbo_id'] = cbo.id
+    return [], delta
+
+
+def _autosave_questions(request, expression, data):
+    responses = data.get('responses') or {}
+    bundle = form_bundle(expression.call_id)
+    values = {}
+    for key, value in responses.items():
+        question = bundle.question(to_int(key), 'expression')
+        if question is None:
+            return [f'Pregunta {key} no pertenece a este formulario.'], None
+        values[question.id] = bool(value) if question.field_type == 'boolean' else value
+    return [], sync_responses(expression, values)
+
+
+EXPRESSION_SECTIONS = {
+    'core': _autosave_core,
+    'products': _autosave_products,
+    'team': _autosave_team,
+    'budget': _autosave_budget,
+    'cbo': _autosave_cbo,
+    'questions': _autosave_questions,
+}
+
+PROPOSAL_NARRATIVE_FIELDS = (
+    'project_title_override', 'general_objective_override', 'principal_research_experience',
+    'community_description', 'summary', 'context_problem_justification',
+    'methodology_analytical_plan_ethics', 'equity_inclusion', 'communication_strategy',
+    'risk_analysis_mitigation', 'principal_investigator_title', 'principal_investigator_position',
+)
+
+
+def _autosave_narrative(request, proposal, data):
+    fields, errors = {}, []
+    for key in PROPOSAL_NARRATIVE_FIELDS:
+        if key not in data:
+            continue
+        value = _text(data, key)
+        max_length = Proposal._meta.get_field(key).max_length
+        if max_length and len(value) > max_length:
+            errors.append(f"{Proposal._meta.get_field(key).verbose_name}: máximo {max_length} caracteres.")
+        fields[key] = value
+    if 'duration_months' in data:
+        duration = to_int(data['duration_months'])
+        if not duration or duration < 1:
+            errors.append('La duración debe ser de al menos 1 mes.')
+        fields['duration_months'] = duration
+    errors += PROPOSAL_LIMITS.validate(fields=fields)
+    if errors:
+        return errors, None
+
+    changed = [name for name, value in fields.items() if getattr(proposal, name) != value]
+    for name in changed:
+        setattr(proposal, name, fields[name])
+    if changed:
+        proposal.save(update_fields=changed + ['updated_at'])
+    return [], {'changed': changed}
+
+
+PROPOSAL_SECTIONS = {
+    'narrative': _autosave_narrative,
+}
+
+
+def _autosave(request, model, pk, section, handlers):
+    if request.method != 'PATCH':
+        return _json_error('Método no permitido.', 405)
+    handler = handlers.get(section)
+    if handler is None:
+        return _json_error(f"Sección desconocida: '{section}'.", 404)
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return _json_error('JSON inválido.', 400)
+    if not isinstance(data, dict):
+        return _json_error('JSON inválido.', 400)
+
+    with transaction.atomic():
+        # Row lock: concurrent autosaves of the same draft are applied one at a time
+        target = model.objects.select_for_update().filter(pk=pk, user=request.profile).first()
+        if target is None:
+            return _json_error('Borrador no encontrado.', 404)
+        if model is Expression and target.status_id not in statuses.ids('Borrador', 'Abierta'):
+            return _json_error('Solo se pueden editar expresiones en borrador.', 409)
+        if model is Proposal and target.proposal_status_id != statuses.id('Borrador'):
+            return _json_error('Solo se pueden editar propuestas en borrador.', 409)
+
+        version = _version(target)
+        if_match = request.headers.get('If-Match')
+        if if_match and if_match not in ('*', version):
+            return _json_error('El borrador cambió desde la última carga.', 412, version=version)
+
+        errors, delta = handler(request, target, data)
+        if errors:
+            transaction.set_rollback(True)
+            return JsonResponse({'success': False, 'errors': errors, 'version': version}, status=400)
+
+        # Every section save moves the version, including child-only sections
+        target.updated_at = timezone.now()
+        Expression.objects.filter(pk=target.pk).update(updated_at=target.updated_at)
+
+    version = _version(target)
+    response = JsonResponse({'success': True, 'section': section, 'version': version, 'delta': delta})
+    response['ETag'] = version
+    return response
+
+
+@login_required
+@role_required('Researcher', message='Acceso denegado.', json=True, status=403)
+def autosave_expression_section(request, expression_id, section):
+    return _autosave(request, Expression, expression_id, section, EXPRESSION_SECTIONS)
+
+
+@login_required
+@role_required('Researcher', message='Acceso denegado.', json=True, status=403)
+def autosave_proposal_section(request, proposal_id, section):
+    return _autosave(request, Proposal, proposal_id, section, PROPOSAL_SECTIONS)
@@ -0,0 +1,250 @@
+"""
+Secciones del dashboard del coordinador, cargadas por separado.
+
+La pagina del dashboard ya no consulta las convocatorias, preguntas,
+plantillas, expresiones, propuestas, evaluaciones ni evaluadores: solo arma
+las pestanas. Cada seccion de la pestana visible pide sus filas a
+`calls:dashboard_section` (fragmento HTML), de a una pagina por llave (ver
+common/keyset.py), con busqueda, filtros y orden resueltos en el servidor.
+El costo de abrir el dashboard no crece con los anios de datos acumulados.
+
+Cada seccion define:
+    - la consulta base (ya filtrada por el usuario si corresponde);
+    - los ordenes disponibles, el primero es el de defecto; todos terminan en
+      la llave primaria;
+    - la busqueda (?q=) y los filtros (?call=) que acepta;
+    - la plantilla del fragmento (solo las filas) y su contexto extra.
+
+La respuesta trae el cursor de la pagina siguiente en la cabecera
+`X-Next-Cursor` (vacia en la ultima pagina).
+"""
+from dataclasses import dataclass, field
+
+from django.db.models import Prefetch, Q
+
+from accounts.models import CustomUser
+from common import counters
+from common.keyset import KeysetPaginator
+from common.search import normalize_search
+from common.status_registry import statuses
+from evaluations.models import Evaluation, EvaluationTemplate
+from expressions.models import Expression
+from institutions.models import Institution
+from proponent_forms.models import SharedQuestion
+from proposals.models import Proposal
+
+from .models import Call
+
+SECTION_PAGE_SIZE = 25
+
+
+@dataclass(frozen=True)
+class Sort:
+    key: str
+    label: str
+    ordering: tuple
+
+
+@dataclass(frozen=True)
+class Section:
+    name: str
+    template: str
+    queryset: object  # (request) -> QuerySet
+    sorts: tuple
+    search: object = None  # (queryset, term) -> QuerySet
+    search_placeholder: str = 'Buscar...'
+    filters: dict = field(default_factory=dict)  # GET param -> integer lookup
+    context: object = None  # (request, rows) -> dict
+    per_page: int = SECTION_PAGE_SIZE
+    non_null: tuple = ()
+
+    @property
+    def searchable(self):
+        return self.search is not None
+
+    def sort(self, key):
+        return next((s for s in self.sorts if s.key == key), self.sorts[0])
+
+    def page(self, request):
+        """The requested page of this section's rows."""
+        queryset = self.queryset(request)
+        for param, lookup in self.filters.items():
+            try:
+                value = int(request.GET.get(param) or 0)
+            except ValueError:
+                value = 0
+            if value:
+                queryset = queryset.filter(**{lookup: value})
+        term = request.GET.get('q', '').strip()
+        if term and self.search is not None:
+            queryset = self.search(queryset, term)
+        paginator = KeysetPaginator(
+            queryset, self.sort(request.GET.get('sort')).ordering, self.per_page, self.non_null
+        )
+        return paginator.page(request.GET.get('cursor'))
+
+    def extra_context(self, request, rows):
+        return self.context(request, rows) if self.context else {}
+
+
+def _title_search(lookup):
+    def search(queryset, term):
+        return queryset.filter(**{f'{lookup}__icontains': term})
+    return search
+
+
+def _coordinator_calls(request):
+    return Call.objects.filter(coordinator=request.user.customuser)
+
+
+def _templates_prefetch():
+    # The assignment forms list the call's templates on every row
+    return Prefetch('call__evaluation_templates', queryset=EvaluationTemplate.objects.order_by('name'))
+
+
+def _evaluators():
+    return CustomUser.objects.filter(
+        role__name='Evaluator', role__is_active=True
+    ).select_related('person', 'user')
+
+
+def _evaluator_choices(request, rows):
+    # One query per page; the evaluator list itself is its own section
+    return {'evaluators': list(_evaluators().order_by('person__first_name', 'person__first_last_name', 'pk'))}
+
+
+def _template_counts(request, rows):
+    # Denormalized per-template category counts (one query for the page)
+    return {'category_counts': counters.by_object(counters.TEMPLATE_CATEGORIES, [t.pk for t in rows])}
+
+
+def _institution_search(queryset, term):
+    normalized = normalize_search(term)
+    return queryset.filter(
+        Q(search_name__istartswith=normalized)
+        | Q(search_acronym__istartswith=normalized)
+        | Q(tax_register_number__istartswith=term)
+    )
+
+
+def _person_search(queryset, term):
+    return queryset.filter(
+        Q(person__first_name__icontains=term)
+        | Q(person__first_last_name__icontains=term)
+        | Q(user__username__icontains=term)
+        | Q(user__email__icontains=term)
+    )
+
+
+RECENT_FIRST = Sort('recent', 'Más recientes', ('-submission_datetime', '-pk'))
+BY_TITLE = Sort('title', 'Proyecto (A-Z)', ('project_title', 'pk'))
+
+DASHBOARD_SECTIONS = {section.name: section for section in (
+    Section(
+        name='calls',
+        template='calls/partials/sections/calls.html',
+        queryset=lambda request: _coordinator_calls(request).select_related('status'),
+        sorts=(
+            Sort('recent', 'Apertura más reciente', ('-opening_datetime', '-pk')),
+            Sort('closing', 'Cierre más próximo', ('closing_datetime', 'pk')),
+            Sort('title', 'Título (A-Z)', ('title', 'pk')),
+        ),
+        search=_title_search('title'),
+        search_placeholder='Buscar convocatoria...',
+    ),
+    Section(
+        name='call_options',
+        template='calls/partials/sections/call_options.html',
+        queryset=lambda request: _coordinator_calls(request).only('pk', 'title', 'opening_datetime'),
+        sorts=(Sort('recent', 'Apertura más reciente', ('-opening_datetime', '-pk')),),
+        per_page=100,
+    ),
+    Section(
+        name='shared_questions',
+        template='calls/partials/sections/shared_questions.html',
+        queryset=lambda request: SharedQuestion.objects.all(),
+        sorts=(
+            Sort('category', 'Categoría', ('target_category', 'question', 'pk')),
+            Sort('recent', 'Más recientes', ('-pk',)),
+        ),
+        search=_title_search('question'),
+        search_placeholder='Buscar pregunta...',
+    ),
+    Section(
+        name='templates',
+        template='calls/partials/sections/templates.html',
+        queryset=lambda request: EvaluationTemplate.objects.all(),
+        sorts=(
+            Sort('active', 'Activas primero', ('-is_active', 'name', 'pk')),
+            Sort('name', 'Nombre (A-Z)', ('name', 'pk')),
+            Sort('recent', 'Más recientes', ('-pk',)),
+        ),
+        search=_title_search('name'),
+        search_placeholder='Buscar plantilla...',
+        context=_template_counts,
+    ),
+    Section(
+        name='institutions',
+        template='calls/partials/sections/institutions.html',
+        queryset=lambda request: Institution.objects.select_related('institution_type'),
+        sorts=(
+            Sort('name', 'Nombre (A-Z)', ('search_name', 'pk')),
+            Sort('recent', 'Más recientes', ('-pk',)),
+        ),
+        search=_institution_search,
+        search_placeholder='Buscar por nombre, sigla o NIT...',
+    ),
+    Section(
+        name='expressions',
+        template='calls/partials/sections/expressions.html',
+        queryset=lambda request: Expression.objects.filter(
+            status_id=statuses.id('Enviada'), submission_datetime__isnull=False,
+        ).select_related('user__person', 'user__user', 'call').prefetch_related(_templates_prefetch()),
+        sorts=(RECENT_FIRST, BY_TITLE),
+        search=_title_search('project_title'),
+        search_placeholder='Buscar proyecto...',
+        filters={'call': 'call_id'},
+        context=_evaluator_choices,
+        non_null=('submission_datetime',),
+    ),
+    Section(
+        name='proposals',
+        template='calls/partials/sections/proposals.html',
+        queryset=lambda request: Proposal.objects.filter(
+            proposal_status_id=statuses.id('Enviada'), submission_datetime__isnull=False,
+        ).select_related('user__person', 'user__user', 'call').prefetch_related(_templates_prefetch()),
+        sorts=(RECENT_FIRST, BY_TITLE),
+        search=_title_search('project_title'),
+        search_placeholder='Buscar proyecto...',
+        filters={'call': 'call_id'},
+        context=_evaluator_choices,
+        non_null=('submission_datetime',),
+    ),
+    Section(
+        name='evaluators',
+        template='calls/partials/sections/evaluators.html',
+        queryset=lambda request: _evaluators(),
+        sorts=(Sort('name', 'Nombre (A-Z)', ('person__first_name', 'person__first_last_name', 'pk')),),
+        search=_person_search,
+        search_placeholder='Buscar evaluador...',
+    ),
+    Section(
+        name='evaluations',
+        template='calls/partials/sections/evaluations.html',
+        queryset=lambda request: Evaluation.objects.filter(
+            status_id=statuses.id('Completada'), submission_datetime__isnull=False,
+        ).select_related(
+            'target_content_type', 'evaluator__person', 'evaluator__user',
+            'researcher__person', 'researcher__user', 'call', 'template', 'status',
+        ),
+        sorts=(
+            RECENT_FIRST,
+            Sort('score', 'Mayor puntaje', ('-total_score', '-pk')),
+            BY_TITLE,
+        ),
+        search=_title_search('project_title'),
+        search_placeholder='Buscar proyecto...',
+        filters={'call': 'call_id'},
+        non_null=('submission_datetime',),
+    ),
+)}
@@ -7,7 +7,9 @@ class CallForm(forms.ModelForm):
     class Meta:
         model = Call
         fields = [
-            'title', 'description', 'opening_datetime', 'closing_datetime'
+            'title', 'description', 'opening_datetime', 'closing_datetime',
+            'approval_threshold', 'required_evaluations',
+            'escalation_score_gap', 'escalate_on_split', 'max_evaluations',
         ]
         widgets = {
             'description': forms.Textarea(attrs={'rows': 5}),
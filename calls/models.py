@@ -1,6 +1,7 @@
 from django.db import models
 from core.models import TimestampMixin, CreatedByMixin
-from django.core.validators import RegexValidator
+from decimal import Decimal
+from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
 
 class Call(TimestampMixin, CreatedByMixin, models.Model):
     id = models.AutoField(
@@ -47,6 +48,45 @@ class Call(TimestampMixin, CreatedByMixin, models.Model):
         verbose_name="Fecha de Cierre"
     )
 
+    # Auto-approval rules (see evaluations/approval.py)
+    approval_threshold = models.DecimalField(
+        max_digits=3,
+        decimal_places=2,
+        default=Decimal('0.70'),
+        validators=[MinValueValidator(0), MaxValueValidator(1)],
+        verbose_name="Umbral de Aprobación",
+        help_text="Fracción del puntaje máximo para que una evaluación sea positiva (ej. 0.70)"
+    )
+    required_evaluations = models.PositiveSmallIntegerField(
+        default=2,
+        validators=[MinValueValidator(1)],
+        verbose_name="Evaluaciones Requeridas",
+        help_text="Evaluaciones positivas necesarias para la aprobación automática"
+    )
+
+    # Third-evaluator escalation rules (see evaluations/escalation.py)
+    escalation_score_gap = models.DecimalField(
+        max_digits=3,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        default=Decimal('0.25'),
+        validators=[MinValueValidator(0), MaxValueValidator(1)],
+        verbose_name="Diferencia para Escalar",
+        help_text="Si los puntajes (fracción del máximo) de un objetivo difieren más que esto, se asigna otro evaluador. Vacío = no escalar por diferencia"
+    )
+    escalate_on_split = models.BooleanField(
+        default=True,
+        verbose_name="Escalar si hay Desacuerdo",
+        help_text="Asignar otro evaluador cuando un objetivo tiene evaluaciones positivas y negativas"
+    )
+    max_evaluations = models.PositiveSmallIntegerField(
+        default=3,
+        validators=[MinValueValidator(1)],
+        verbose_name="Máximo de Evaluadores",
+        help_text="Evaluadores por objetivo hasta los que puede llegar el escalamiento"
+    )
+
     class Meta:
         db_table= 'calls'
         verbose_name = 'Convocatoria'
@@ -1,5 +1,5 @@
 from django.urls import path, include
-from . import views
+from . import views, api
 
 app_name = 'calls'
 
@@ -7,12 +7,16 @@ urlpatterns = [
     # Calls
     path('researcher/', views.researcher_dashboard, name='researcher_dashboard'),
     path('coordinator/', views.coordinator_dashboard, name='coordinator_dashboard'),
+    path('coordinator/section/<str:name>/', views.dashboard_section, name='dashboard_section'),
     path('institution/create/', views.create_institution, name='create_institution'),
     path('create/', views.create_call, name='create_call'),
     path('<int:call_pk>/setup/', views.setup_call, name='setup_call'),
     path('<int:call_pk>/', views.call_detail, name='call_detail'),
     path('<int:call_pk>/apply/', views.apply_call, name='apply_call'),
     path('<int:call_pk>/view/', views.view_call, name='view_call'),
+    path('word-limits/<str:form_name>/', api.api_word_limits, name='api_word_limits'),
+    path('expression/<int:expression_id>/autosave/<str:section>/', api.autosave_expression_section, name='autosave_expression_section'),
+    path('proposal/<int:proposal_id>/autosave/<str:section>/', api.autosave_proposal_section, name='autosave_proposal_section'),
     path('expression/<int:expression_id>/apply-proposal/', views.apply_proposal, name='apply_proposal'),
     path('upload-commitment/', views.upload_commitment_document, name='upload_commitment_document'),
 
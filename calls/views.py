@@ -7,9 +7,22 @@ from django.http import HttpResponseForbidden, JsonResponse, FileResponse, Http4
 from django.core.serializers import serialize
 from django.core.serializers.json import DjangoJSONEncoder
 from .models import Call
+from .dashboard import DASHBOARD_SECTIONS
 from .forms import CallForm, SharedQuestionForm # For create_shared_question
 from proponent_forms.models import SharedQuestion
-from common.models import Status, Scale
+from common.models import Status
+from common import counters
+from common.keyset import KeysetPaginator
+from common.reference_data import reference_data
+from common.status_registry import statuses, scales
+from common.word_limits import EXPRESSION_LIMITS, PROPOSAL_LIMITS
+from proponent_forms.bundle import form_bundle
+from expressions.persistence import (
+    MAX_EXPRESSION_BUDGET, scale_name_for_budget,
+    lock_expression, posted_indices, parse_products, parse_team_members, parse_cbo_roles,
+    sync_products, sync_team_members, sync_budget_items, sync_cbo_roles, sync_responses,
+)
+from accounts.decorators import role_required
 from proponent_forms.models import (
     ProponentForm, 
     ProponentFormQuestion, 
@@ -43,6 +56,7 @@ from project_team.models import (
 from intersectionality.models import IntersectionalityScope
 from budgets.models import BudgetCategory, BudgetItem, BudgetPeriod
 from evaluations.models import Evaluation, EvaluationResponse, EvaluationTemplate, TemplateCategory, TemplateItem
+from evaluations.review_bundle import capture_review_snapshot
 from cbo.models import CBORelevantRole, CBO, CBOAntecedent, CBODocument
 from cbo.forms import CBODocumentForm
 from django.db import transaction
@@ -50,92 +64,44 @@ from collections import defaultdict
 from decimal import Decimal
 
 @login_required
+@role_required('Coordinator', message="Access denied. Coordinator role required.")
 def coordinator_dashboard(request):
-    if not hasattr(request.user, 'customuser'):
-        messages.error(request, "User profile not found.")
-        return redirect('home')
-
-    if request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied. Coordinator role required.")
-        return redirect('home')
-
-    # Get coordinator's calls
-    calls = Call.objects.filter(coordinator=request.user.customuser).order_by('-opening_datetime')
-    # Get all shared questions
-    shared_questions = SharedQuestion.objects.all().order_by('target_category', 'question')
-
-    # return render(request, 'calls/coordinator_dashboard.html', {
-    #     'calls': calls,
-    #     'shared_questions': shared_questions,
-    # })
-    institution_types = InstitutionType.objects.filter(is_active=True).order_by('name')
-    institutions = Institution.objects.all().select_related('institution_type').order_by('name')
-    countries = Country.objects.all().order_by('name')
-    document_types = DocumentType.objects.select_related('country').order_by('country__name', 'name')
-    thematic_axes = ThematicAxis.objects.filter(is_active=True).order_by('name')
-    strategic_effects = StrategicEffect.objects.filter(is_active=True).order_by('name')
-    budget_categories = BudgetCategory.objects.filter(is_active=True).order_by('name')
-    budget_periods = BudgetPeriod.objects.all().order_by('order', 'name')
-    # Filter people NOT linked to any CustomUser (for safe assignment)
-    users_with_person = CustomUser.objects.exclude(person__isnull=True).values_list('person_id', flat=True)
-    people_without_user = Person.objects.exclude(id__in=users_with_person).order_by('first_name', 'first_last_name')
-    people = Person.objects.filter(created_by__isnull=False).order_by('first_name', 'first_last_name')
-
-
-    # Get all templates
-    templates = EvaluationTemplate.objects.all().order_by('-is_active', 'name')
-    # print(f"Templates are {templates}")
-    
-    # Get all submitted expressions (status = 'Enviada')
-    submitted_expressions = Expression.objects.filter(
-        status__name='Enviada'
-    ).select_related('user', 'call', 'scale', 'status').order_by('-submission_datetime')
-
-    submitted_proposals = Proposal.objects.filter(
-        proposal_status__name='Enviada'
-    ).select_related(
-        'expression_ptr__user',
-        'expression_ptr__call',
-        'expression_ptr__scale',
-        'expression_ptr__status'
-    ).order_by('-submission_datetime')
-
-    completed_evaluations = Evaluation.objects.filter(
-        status__name='Completada'
-    ).select_related(
-        'target_content_type',
-        'evaluator__person',
-        'template',
-        'status'
-    ).order_by('-submission_datetime')
-
-    # Get all Evaluator users
-    evaluators = CustomUser.objects.filter(
-        role__name='Evaluator',
-        role__is_active=True
-    ).select_related('role', 'person', 'user').order_by('person__first_name', 'person__first_last_name')
+    # Only the tab shell is rendered here; each section loads its rows from
+    # dashboard_section when its tab is shown (see calls/dashboard.py)
     context = {
-        'calls': calls,
-        'shared_questions': shared_questions,
-        'submitted_expressions': submitted_expressions,
-        'submitted_proposals': submitted_proposals,
-        'evaluations': completed_evaluations,
-        'evaluators': evaluators,
-        'institutions': institutions,
-        'institution_types': institution_types,
-        'countries': countries,
-        'document_types': document_types,
-        'thematic_axes': thematic_axes,
-        'strategic_effects': strategic_effects,
-        'budget_categories': budget_categories,
-        'budget_periods': budget_periods,
-        'people': people,
-        'people_without_user': people_without_user, 
-        'templates': templates,
+        'sections': DASHBOARD_SECTIONS,
+        # Tab header totals from the denormalized counters (one query)
+        'counts': counters.totals(
+            submitted_expressions=(counters.EXPRESSIONS, ['Enviada']),
+            submitted_proposals=(counters.PROPOSALS, ['Enviada']),
+            completed_evaluations=(counters.EVALUATION_KINDS.values(), ['Completada']),
+        ),
+        # Reference tables come from the in-process registry, no queries
+        'institution_types': reference_data.active('institution_types'),
+        'countries': reference_data.get('countries'),
+        'document_types': reference_data.get('document_types'),
+        'thematic_axes': reference_data.active('thematic_axes'),
+        'strategic_effects': reference_data.active('strategic_effects'),
+        'budget_categories': reference_data.active('budget_categories'),
+        'budget_periods': reference_data.get('budget_periods'),
     }
     return render(request, 'calls/coordinator_dashboard.html', context)
 
 
+@login_required
+@role_required('Coordinator')
+def dashboard_section(request, name):
+    """One keyset page of a coordinator dashboard section, as an HTML fragment."""
+    section = DASHBOARD_SECTIONS.get(name)
+    if section is None:
+        raise Http404("Sección no encontrada.")
+    page = section.page(request)
+    context = {'rows': page.object_list, 'page': page, **section.extra_context(request, page.object_list)}
+    response = render(request, section.template, context)
+    response['X-Next-Cursor'] = page.next_cursor
+    return response
+
+
 # @login_required
 # def assign_evaluator(request, target_type, target_id):
 #     if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
@@ -238,30 +204,26 @@ def coordinator_dashboard(request):
 #     return redirect('calls:coordinator_dashboard')
 
 @login_required
+@role_required('Evaluator')
 def evaluator_dashboard(request):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Evaluator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-
-    # Get all evaluations assigned to this evaluator (status: Pendiente, En Progreso, etc.)
+    # Evaluations assigned to this evaluator (status: Pendiente, En Progreso), newest first
     evaluations = Evaluation.objects.filter(
         evaluator=request.user.customuser,
-        status__name__in=['Pendiente', 'En Progreso']
+        status_id__in=statuses.ids('Pendiente', 'En Progreso')
     ).select_related(
-        'expression', 'expression__call', 'expression__user', 'template'
-    ).order_by('-submission_datetime')
+        'expression', 'expression__call', 'expression__user__person', 'expression__user__user', 'template', 'status'
+    )
+    page = KeysetPaginator(evaluations, ('-created_at', '-pk')).page(request.GET.get('cursor'))
 
     context = {
-        'evaluations': evaluations,
+        'evaluations': page,
+        'page': page,
     }
     return render(request, 'calls/evaluator_dashboard.html', context)
 
 @login_required
+@role_required('Evaluator')
 def evaluate_expression(request, evaluation_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Evaluator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-
     evaluation = get_object_or_404(Evaluation, id=evaluation_id, evaluator=request.user.customuser)
 
     if evaluation.status.name not in ['Pendiente', 'En Progreso']:
@@ -321,7 +283,7 @@ def evaluate_expression(request, evaluation_id):
 
         # Update total score
         evaluation.total_score = total_score
-        evaluation.status = Status.objects.get(name='Completada')
+        evaluation.status = statuses.get('Completada')
         evaluation.submission_datetime = timezone.now()
         evaluation.save()
 
@@ -336,31 +298,30 @@ def evaluate_expression(request, evaluation_id):
     return render(request, 'calls/evaluate_expression.html', context)
 
 @login_required
+@role_required('Coordinator')
 def coordinator_view_evaluations(request):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-
     evaluations = Evaluation.objects.select_related(
-        'expression__user__person',
-        'expression__call',
+        'expression__status',
+        'researcher__person',
+        'researcher__user',
         'evaluator__person',
+        'evaluator__user',
         'template'
-    ).order_by('-submission_datetime')
+    )
+    # Pending evaluations have no submission date yet; they sort last
+    page = KeysetPaginator(evaluations, ('-submission_datetime', '-pk')).page(request.GET.get('cursor'))
 
     context = {
-        'evaluations': evaluations,
+        'evaluations': page,
+        'page': page,
     }
     return render(request, 'calls/coordinator_view_evaluations.html', context)
 
 
 
 @login_required
+@role_required('Coordinator')
 def create_shared_question(request):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-
     if request.method == 'POST':
         form = SharedQuestionForm(request.POST)
         if form.is_valid():
@@ -389,11 +350,8 @@ def create_shared_question(request):
     })
 
 @login_required
+@role_required('Coordinator')
 def edit_shared_question(request, question_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-
     # Get the question
     question = get_object_or_404(SharedQuestion, id=question_id)
 
@@ -432,17 +390,15 @@ def edit_shared_question(request, question_id):
     })
 
 @login_required
+@role_required('Coordinator')
 def delete_shared_question(request, question_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-
     question = get_object_or_404(SharedQuestion, id=question_id)
     question.delete()
     messages.success(request, 'Question deleted successfully!')
     return redirect('calls:coordinator_dashboard')
 
 @login_required
+@role_required('Coordinator', 'Researcher', json=True)
 def preview_source_model(request, model_path):
     """
     Preview first 5 items from a model.
@@ -451,8 +407,6 @@ def preview_source_model(request, model_path):
     """
     # if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
     #     return JsonResponse({'success': False, 'error': 'Access denied.'})
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name not in ['Coordinator', 'Researcher']:
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
 
     try:
         app_label, model_name = model_path.split('.')
@@ -488,11 +442,8 @@ def preview_source_model(request, model_path):
 
 
 @login_required
+@role_required('Coordinator')
 def create_call(request):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-
     if request.method == 'POST':
         form = CallForm(request.POST)
         if form.is_valid():
@@ -500,9 +451,7 @@ def create_call(request):
             call.coordinator = request.user.customuser
             call.created_by = request.user
             # Set default status
-            from common.models import Status
-            draft_status, _ = Status.objects.get_or_create(name='Draft')
-            call.status = draft_status
+            call.status = statuses.get('Draft')
             call.save()
             messages.success(request, 'Call created successfully!')
             return redirect('calls:setup_call', call_pk=call.pk)
@@ -538,12 +487,11 @@ def create_institution(request):
             if not all([name, institution_type_id, country_id, tax_register_number]):
                 return JsonResponse({'success': False, 'error': 'Name, type, country, and tax number are required.'})
 
-            try:
-                institution_type = InstitutionType.objects.get(id=institution_type_id)
-                country = Country.objects.get(id=country_id)
-            except Country.DoesNotExist:
+            institution_type = reference_data.by_id('institution_types', institution_type_id)
+            country = reference_data.by_id('countries', country_id)
+            if country is None:
                 return JsonResponse({'success': False, 'error': 'País inválido.'})
-            except InstitutionType.DoesNotExist:
+            if institution_type is None:
                 return JsonResponse({'success': False, 'error': 'Tipo de institución inválido.'})
 
             # Optional relations
@@ -692,8 +640,8 @@ def create_institution_page(request):
             except Exception as e:
                 messages.error(request, str(e))
 
-    institution_types = InstitutionType.objects.filter(is_active=True).order_by('name')
-    countries = Country.objects.all().order_by('name')
+    institution_types = reference_data.active('institution_types')
+    countries = reference_data.get('countries')
 
     return render(request, 'calls/create_institution_page.html', {
         'institution_types': institution_types,
@@ -702,10 +650,8 @@ def create_institution_page(request):
     })
 
 @login_required
+@role_required('Coordinator', json=True)
 def create_thematic_axis(request):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
-
     if request.method == 'POST':
         try:
             name = request.POST.get('name')
@@ -734,10 +680,8 @@ def create_thematic_axis(request):
     return JsonResponse({'success': False, 'error': 'Invalid request method.'})
 
 @login_required
+@role_required('Coordinator', json=True)
 def create_strategic_effect(request):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
-
     if request.method == 'POST':
         try:
             name = request.POST.get('name')
@@ -773,18 +717,17 @@ def create_strategic_effect(request):
 
 
 @login_required
+@role_required('Coordinator')
 def view_call(request, call_pk):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-
     call = get_object_or_404(Call, pk=call_pk, coordinator=request.user.customuser)
 
     if request.method == 'POST':
         new_status_id = request.POST.get('status')
         if new_status_id:
             try:
-                new_status = Status.objects.get(id=new_status_id)
+                new_status = reference_data.by_id('statuses', new_status_id)
+                if new_status is None:
+                    raise Status.DoesNotExist
                 call.status = new_status
                 call.save()
                 messages.success(request, f'Call status updated to "{new_status.name}".')
@@ -796,11 +739,11 @@ def view_call(request, call_pk):
         return redirect('calls:view_call', call_pk=call.pk)
 
     # Get all possible statuses for dropdown
-    statuses = Status.objects.all().order_by('name')
+    status_choices = reference_data.get('statuses')
 
     return render(request, 'calls/view_call.html', {
         'call': call,
-        'statuses': statuses,
+        'statuses': status_choices,
     })
 
 @login_required
@@ -813,7 +756,7 @@ def setup_call(request, call_pk):
     call = get_object_or_404(Call, pk=call_pk)
 
     # Permission: Must be coordinator of this call
-    if not hasattr(request.user, 'customuser') or call.coordinator != request.user.customuser:
+    if request.profile is None or call.coordinator_id != request.profile.id:
         messages.error(request, "You are not authorized to manage this call.")
         return redirect('calls:coordinator_dashboard')
 
@@ -853,20 +796,20 @@ def setup_call(request, call_pk):
 
     # Get all questions and which are in form
     all_questions = SharedQuestion.objects.filter(is_active=True)
-    form_question_ids = set(proponent_form.form_questions.values_list('shared_question_id', flat=True))
+    bundle = form_bundle(call.pk)
+    form_question_ids = {q.id for q in bundle.questions}
 
     return render(request, 'calls/setup_call.html', {
         'call': call,
         'proponent_form': proponent_form,
+        'bundle': bundle,
         'all_questions': all_questions,
         'form_question_ids': form_question_ids,
     })
 
 @login_required
+@role_required('Coordinator', json=True)
 def edit_thematic_axis(request, axis_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
-
     axis = get_object_or_404(ThematicAxis, id=axis_id)
 
     if request.method == 'POST':
@@ -895,10 +838,8 @@ def edit_thematic_axis(request, axis_id):
     return JsonResponse({'success': False, 'error': 'Invalid request method.'})
 
 @login_required
+@role_required('Coordinator', json=True)
 def edit_strategic_effect(request, effect_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
-
     effect = get_object_or_404(StrategicEffect, id=effect_id)
 
     if request.method == 'POST':
@@ -932,20 +873,16 @@ def edit_strategic_effect(request, effect_id):
     return JsonResponse({'success': False, 'error': 'Invalid request method.'})
 
 @login_required
+@role_required('Coordinator', json=True)
 def delete_thematic_axis(request, axis_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
-
     axis = get_object_or_404(ThematicAxis, id=axis_id)
     axis.delete()
     messages.success(request, 'Thematic Axis deleted successfully!')
     return redirect('calls:coordinator_dashboard')
 
 @login_required
+@role_required('Coordinator', json=True)
 def delete_strategic_effect(request, effect_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
-
     effect = get_object_or_404(StrategicEffect, id=effect_id)
     effect.delete()
     messages.success(request, 'Strategic Effect deleted successfully!')
@@ -954,10 +891,8 @@ def delete_strategic_effect(request, effect_id):
 
 
 @login_required
+@role_required('Coordinator', json=True)
 def create_budget_category(request):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
-
     if request.method == 'POST':
         try:
             name = request.POST.get('name')
@@ -986,10 +921,8 @@ def create_budget_category(request):
     return JsonResponse({'success': False, 'error': 'Invalid request method.'})
 
 @login_required
+@role_required('Coordinator', json=True)
 def edit_budget_category(request, category_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
-
     category = get_object_or_404(BudgetCategory, id=category_id)
 
     if request.method == 'POST':
@@ -1018,21 +951,16 @@ def edit_budget_category(request, category_id):
     return JsonResponse({'success': False, 'error': 'Invalid request method.'})
 
 @login_required
+@role_required('Coordinator')
 def delete_budget_category(request, category_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-
     category = get_object_or_404(BudgetCategory, id=category_id)
     category.delete()
     messages.success(request, 'Budget Category deleted successfully!')
     return redirect('calls:coordinator_dashboard')
 
 @login_required
+@role_required('Coordinator', json=True)
 def create_budget_period(request):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
-
     if request.method == 'POST':
         try:
             name = request.POST.get('name')
@@ -1059,10 +987,8 @@ def create_budget_period(request):
     return JsonResponse({'success': False, 'error': 'Invalid request method.'})
 
 @login_required
+@role_required('Coordinator', json=True)
 def edit_budget_period(request, period_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
-
     period = get_object_or_404(BudgetPeriod, id=period_id)
 
     if request.method == 'POST':
@@ -1089,11 +1015,8 @@ def edit_budget_period(request, period_id):
     return JsonResponse({'success': False, 'error': 'Invalid request method.'})
 
 @login_required
+@role_required('Coordinator')
 def delete_budget_period(request, period_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-
     period = get_object_or_404(BudgetPeriod, id=period_id)
     period.delete()
     messages.success(request, 'Budget Period deleted successfully!')
@@ -1104,19 +1027,19 @@ def delete_budget_period(request, period_id):
 @login_required
 def researcher_dashboard(request):
     # Simple placeholder 
-    if not hasattr(request.user, 'customuser'):
+    if request.profile is None:
         messages.error(request, "User profile not found.")
         return redirect('home')
 
     # Show calls the researcher can apply to
     from .models import Call
     open_calls = Call.objects.filter(
-        status__name='Abierta'  # based on Status model
+        status_id=statuses.id('Abierta')  # based on Status model
     ).order_by('-opening_datetime')
 
     # Add context for apply form (optional, but good for consistency)
-    thematic_axes = ThematicAxis.objects.filter(is_active=True)
-    countries = Country.objects.all()
+    thematic_axes = reference_data.active('thematic_axes')
+    countries = reference_data.get('countries')
 
     # Get the latest approved Expression (if any)
     latest_approved_expression = None
@@ -1124,7 +1047,7 @@ def researcher_dashboard(request):
 
     expressions = Expression.objects.filter(
         user=request.user.customuser,
-        status__name='Aprobada'
+        status_id=statuses.id('Aprobada')
     ).order_by('-created_at')
 
     if expressions.exists():
@@ -1148,6 +1071,7 @@ def researcher_dashboard(request):
     # })
 
 @login_required
+@role_required('Researcher', message="Only researchers can apply to calls.")
 def apply_call(request, call_pk):
     try:
         call = get_object_or_404(Call, pk=call_pk)
@@ -1161,15 +1085,16 @@ def apply_call(request, call_pk):
         
     
     # Ensure the user is a researcher
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Researcher':
-        messages.error(request, "Only researchers can apply to calls.")
-        return redirect('home')
     
     # Get or create Expression for this user + call
 
-    default_axis = ThematicAxis.objects.filter(is_active=True).first()
-    default_country = Country.objects.first()
-    default_status = Status.objects.filter(name='Abierta').first()
+    active_axes = reference_data.active('thematic_axes')
+    all_countries = reference_data.get('countries')
+    # Same defaults as ThematicAxis/Country.objects.first(): both models are ordered
+    # by name (Meta.ordering), like the registry lists, so the first entry matches
+    default_axis = active_axes[0] if active_axes else None
+    default_country = all_countries[0] if all_countries else None
+    default_status = statuses.get('Abierta')
 
     # Validate system configuration before creating
     if not default_axis or not default_country or not default_status:
@@ -1193,34 +1118,20 @@ def apply_call(request, call_pk):
         }
     )
 
-    # Get ProponentForm for this call
-    try:
-        proponent_form = ProponentForm.objects.get(call=call)
-        form_questions = ProponentFormQuestion.objects.filter(
-            form=proponent_form
-        ).select_related(
-            'shared_question', 'shared_question__category'
-        ).prefetch_related(
-            'shared_question__options_set'
-        ).order_by('order')
-        form_questions = [
-                fq.shared_question for fq in form_questions
-                if fq.shared_question.target_category == 'expression'
-            ]
-    except ProponentForm.DoesNotExist:
-        form_questions = []
+    # Compiled ProponentForm for this call (cached, no queries once built)
+    form_questions = form_bundle(call.pk).expression_questions
 
     # Get data for the form
-    strategic_effects = StrategicEffect.objects.filter(is_active=True).order_by('name')
-    thematic_axes = ThematicAxis.objects.filter(is_active=True)
-    countries = Country.objects.all()
-    budget_categories = BudgetCategory.objects.filter(is_active=True).order_by('name')
-    budget_periods = BudgetPeriod.objects.all().order_by('order', 'name')
+    strategic_effects = reference_data.active('strategic_effects')
+    thematic_axes = active_axes
+    countries = all_countries
+    budget_categories = reference_data.active('budget_categories')
+    budget_periods = reference_data.get('budget_periods')
     existing_budget_items = BudgetItem.objects.filter(expression=expression).select_related('category', 'period')
     documents = ExpressionDocument.objects.filter(expression=expression)
-    institution_types = InstitutionType.objects.filter(is_active=True).order_by('name')
-    people = Person.objects.filter(created_by__isnull=False).order_by('first_name', 'first_last_name')
-    scale_choices = Scale.objects.filter(is_active=True).order_by('name')
+    institution_types = reference_data.active('institution_types')
+    scale_choices = reference_data.active('scales')
+    intersectionality_scopes = reference_data.active('intersectionality_scopes')
     all_cbos = CBO.objects.filter(is_active=True).order_by('name')
     cbo_role_choices = CBORelevantRole.PREDEFINED_ROLE_CHOICES
     
@@ -1339,113 +1250,41 @@ def apply_call(request, call_pk):
             # Process dynamic questions
             #print('Dynamic questions', request.POST)
             question_errors = []
-            for fq in form_questions:
-                field_name = f"question_{fq.shared_question.id}"
+            responses = {}
+            for question in form_questions:
+                field_name = f"question_{question.id}"
                 #value = request.POST.get(field_name)
                 raw_value = request.POST.get(field_name)
-                if fq.shared_question.field_type == 'boolean':
+                if question.field_type == 'boolean':
                     value = raw_value == "on"
                 else:
                     value = raw_value
 
-                if fq.shared_question.is_required and not value:
-                    question_errors.append(f'Question "{fq.shared_question.question}" is required.')
+                if question.is_required and not value:
+                    question_errors.append(f'Question "{question.question}" is required.')
                     continue
-                    #messages.error(request, f'Question "{fq.shared_question.question}" is required.')
+                    #messages.error(request, f'Question "{question.question}" is required.')
                 
                 if value is not None:
-                    ProponentResponse.objects.update_or_create(
-                        expression=expression,
-                        shared_question=fq.shared_question,
-                        defaults={'value': value}
-                    )
+                    responses[question.id] = value
             if question_errors:
+                # Answers that did pass are still kept
+                with transaction.atomic():
+                    sync_responses(expression, responses)
                 for err in question_errors:
                     messages.error(request, err)
                 #return redirect(request.path)
             else:  # Only if no break
-                # Products
-                #print('Products', request.POST)
-                ExpressionProduct.objects.filter(expression=expression).delete()
-                product_indices = set(k.split('_')[-1] for k in request.POST.keys() if k.startswith('product_title_'))
-                for index in product_indices:
-                    title = request.POST.get(f'product_title_{index}', '').strip()
-                    if title:
-                        product = ExpressionProduct.objects.create(
-                            expression=expression,
-                            title=title,
-                            description=request.POST.get(f'product_description_{index}', ''),
-                            outcome=request.POST.get(f'product_outcome_{index}', ''),
-                            start_date=request.POST.get(f'product_start_date_{index}'),
-                            end_date=request.POST.get(f'product_end_date_{index}'),
-                            status=Status.objects.get(name='Abierta'),
-                            created_by=request.user
-                        )
-                        effect_ids = request.POST.getlist(f'product_strategic_effects_{index}')
-                        if effect_ids:
-                            product.strategic_effects.set(StrategicEffect.objects.filter(id__in=effect_ids))
-
-                # Team Members
-                #print('Project Members', request.POST)
-                ExpressionTeamMember.objects.filter(expression=expression).delete()
-                team_indices = set(k.split('_')[-1] for k in request.POST.keys() if k.startswith('team_member_person_'))
-
-                # print("START DEBUG")
-                # print("POST keys:")
-                # for k in request.POST.keys():
-                #     print(f"'{k}'")
-
-                # print("Team indices:", team_indices)
-                # for i in team_indices:
-                #     key = f"team_member_person_id_{i}"
-                #     print(f"Checking key: '{key}' -> {key in request.POST}")
-                #     print(f"Raw index repr: {repr(i)}")
-                # print(request.POST.get('team_member_person_id_0'))
-                # print("END DEBUG")
-                # print("Team indices", team_indices)
-                # print("POST dict is:",request.POST)
-                for index in team_indices:
-                    person_id = request.POST.get(f'team_member_person_id_{index}')
-                    role = request.POST.get(f'team_member_role_{index}', '').strip()
-                    # print(f'team_member_person_id_{index}')
-                    # print("Person ID:", request.POST.get(f'team_member_person_id_{index}'))
-                    # print("Person ID:", person_id)
-                    # print(request.POST.get(f'team_member_role_{index}', '').strip())
-                    if person_id and person_id.strip() and role:
-                        member = ExpressionTeamMember.objects.create(
-                            expression=expression,
-                            person_id=person_id,
-                            role=role,
-                            status_id=request.POST.get(f'team_member_status_{index}'),
-                            start_date=request.POST.get(f'team_member_start_date_{index}'),
-                            end_date=request.POST.get(f'team_member_end_date_{index}'),
-                            institution_id=request.POST.get(f'team_member_institution_{index}')
-                        )
-                        # print("Member inst ID:", member.institution_id)
-                        # Antecedents
-                        axis_ids = request.POST.getlist(f'team_member_antecedent_axis_{index}')
-                        descriptions = request.POST.getlist(f'team_member_antecedent_description_{index}')
-                        urls = request.POST.getlist(f'team_member_antecedent_url_{index}')
-                        print(axis_ids)
-                        print(descriptions)
-                        print(urls)
-                        for i, description in enumerate(descriptions):
-                            description = description.strip()
-                            if not description:
-                                continue
-                            ExpressionInvestigatorThematicAntecedent.objects.create(
-                                team_member=member,
-                                thematic_axis_id=axis_ids[i] if i < len(axis_ids) and axis_ids[i] else None,
-                                description=description,
-                                evidence_url=urls[i].strip() if i < len(urls) else ''
-                            )
+                # Products, team members (+ antecedents), budget items and CBO roles
+                # are diffed against the stored rows and written in bulk below.
+                product_rows = parse_products(request.POST)
+                team_rows = parse_team_members(request.POST)
 
                 # Budget Items
                 #print('Budget', request.POST)
-                BudgetItem.objects.filter(expression=expression).delete()
-                budget_indices = set(k.split('_')[-1] for k in request.POST.keys() if k.startswith('budget_item_category_'))
+                budget_rows = {}
                 total_budget = 0
-                for index in budget_indices:
+                for index in posted_indices(request.POST, 'budget_item_category_'):
                     category_id = request.POST.get(f'budget_item_category_{index}')
                     period_id = request.POST.get(f'budget_item_period_{index}')
                     amount_str = request.POST.get(f'budget_item_amount_{index}', '').strip()
@@ -1455,15 +1294,20 @@ def apply_call(request, call_pk):
                             amount = float(amount_str) if amount_str else 0.0
                             if amount <= 0:
                                 raise ValueError("El valor debe ser mayor que 0.")
-                            category = BudgetCategory.objects.get(id=category_id)
-                            period = BudgetPeriod.objects.get(id=period_id)
-                            BudgetItem.objects.create(
-                                expression=expression,
-                                category=category,
-                                period=period,
-                                amount=amount,
-                                notes=notes
-                            )
+                            category = reference_data.by_id('budget_categories', category_id)
+                            if category is None:
+                                raise BudgetCategory.DoesNotExist
+                            period = reference_data.by_id('budget_periods', period_id)
+                            if period is None:
+                                raise BudgetPeriod.DoesNotExist
+                            if (category.id, period.id) in budget_rows:
+                                # unique_together (expression, category, period)
+                                messages.error(request, f"Duplicated category and period in budget item {int(index)+1}")
+                                continue
+                            budget_rows[(category.id, period.id)] = {
+                                'amount': Decimal(str(amount)),
+                                'notes': notes,
+                            }
                             total_budget += amount
                         except ValueError as e:
                             messages.error(request, f"Invalid amount in budget item {int(index)+1}: {e}")
@@ -1473,91 +1317,76 @@ def apply_call(request, call_pk):
                             messages.error(request, f"Invalid period in budget item {int(index)+1}")
                 
                 
-                MAX_BUDGET = 900000000
-                if total_budget > MAX_BUDGET:
+                if total_budget > MAX_EXPRESSION_BUDGET:
                     messages.error(request, "El presupuesto total no puede exceder los $900.000.000 COP.")
                     return render(request, 'calls/apply_call.html', post_data)
 
-                if total_budget <= 250000000:
-                    scale = Scale.objects.get(name='S')
-                elif total_budget <= 500000000:
-                    scale = Scale.objects.get(name='M')
-                else:
-                    scale = Scale.objects.get(name='B')
+                scale = scales.get(scale_name_for_budget(total_budget))
                 print(f"Total budget is {total_budget}, therefore scale is {scale}")
                 expression.scale = scale
 
                 # Handle scale from hidden field (in case JS is bypassed)
                 scale_name = request.POST.get('scale')
                 if scale_name and scale_name in ['S', 'M', 'B']:
-                    expression.scale = Scale.objects.get(name=scale_name)
-
-                cbo_name = post_data['cbo_name']
-                if cbo_name:
-                    description = post_data['cbo_description']
-                    members_str = post_data['cbo_number_of_members']
-                    if not members_str.isdigit():
-                        messages.warning(request, "Número de miembros inválido.")
-                    else:
-                        try:
-                            cbo, _ = CBO.objects.get_or_create(
-                                name=cbo_name,
-                                defaults={
-                                    'description': description,
-                                    'number_of_members': int(members_str),
-                                    'is_active': True
-                                }
-                            )
-                            if cbo.description != description or cbo.number_of_members != int(members_str):
-                                cbo.description = description
-                                cbo.number_of_members = int(members_str)
-                                cbo.save()
-                            expression.community_organization = cbo
-
-                            # Save CBO roles
-                            if expression.community_organization:
-                                CBORelevantRole.objects.filter(cbo=expression.community_organization).delete()
-                                role_indices = [k.split('_')[-1] for k in request.POST.keys() if k.startswith('cbo_role_person_name_')]
-                                for r_idx in role_indices:
-                                    person_name = request.POST.get(f'cbo_role_person_name_{r_idx}', '').strip()
-                                    if not person_name:
-                                        continue
-                                    predefined = request.POST.get(f'cbo_role_predefined_{r_idx}')
-                                    custom = request.POST.get(f'cbo_role_custom_{r_idx}', '').strip()
-                                    phone = request.POST.get(f'cbo_role_phone_{r_idx}', '').strip()
-                                    email = request.POST.get(f'cbo_role_email_{r_idx}', '').strip()
-
-                                    CBORelevantRole.objects.create(
-                                        cbo=expression.community_organization,
-                                        predefined_role=predefined if predefined else None,
-                                        custom_role=custom,
-                                        person_name=person_name,
-                                        contact_phone=phone,
-                                        contact_email=email
+                    expression.scale = scales.get(scale_name)
+
+                # All child rows and the expression itself are written in one transaction
+                with transaction.atomic():
+                    lock_expression(expression)
+                    sync_responses(expression, responses)
+                    sync_products(expression, product_rows, statuses.get('Abierta'), request.user)
+                    sync_team_members(expression, team_rows)
+                    sync_budget_items(expression, budget_rows)
+
+                    cbo_name = post_data['cbo_name']
+                    if cbo_name:
+                        description = post_data['cbo_description']
+                        members_str = post_data['cbo_number_of_members']
+                        if not members_str.isdigit():
+                            messages.warning(request, "Número de miembros inválido.")
+                        else:
+                            try:
+                                # Savepoint: a CBO failure must not break the outer transaction
+                                with transaction.atomic():
+                                    cbo, _ = CBO.objects.get_or_create(
+                                        name=cbo_name,
+                                        defaults={
+                                            'description': description,
+                                            'number_of_members': int(members_str),
+                                            'is_active': True
+                                        }
                                     )
-                                
-                                # Save CBO document
-                                # if 'cbo_document_file' in request.FILES:
-                                #     cbo_doc_form = CBODocumentForm(request.POST, request.FILES)
-                                #     if expression.community_organization.documents.exists():
-                                #         cbo_doc_form.fields['file'].required = False
-                                #     if cbo_doc_form.is_valid():
-                                #         doc = cbo_doc_form.save(commit=False)
-                                #         doc.cbo = expression.community_organization
-                                #         doc.uploaded_by = request.user.customuser
-                                #         if not doc.file.name.lower().endswith(('.pdf', '.docx', '.jpg', '.png')):
-                                #             messages.error(request, "Solo se permiten PDF, DOCX, JPG o PNG para documentos de CBO.")
-                                #         else:
-                                #             doc.save()
-                                #             messages.success(request, "Documento de CBO cargado.")
-                                #     else:
-                                #         for error in cbo_doc_form.non_field_errors():
-                                #             messages.error(request, f"Error en documento de CBO: {error}")
-                        except Exception as e:
-                            messages.warning(request, f"Error al guardar CBO: {str(e)}")
-                else:
-                    expression.community_organization = None
-                expression.save()
+                                    if cbo.description != description or cbo.number_of_members != int(members_str):
+                                        cbo.description = description
+                                        cbo.number_of_members = int(members_str)
+                                        cbo.save()
+
+                                    # Save CBO roles
+                                    sync_cbo_roles(cbo, parse_cbo_roles(request.POST))
+                                    
+                                    # Save CBO document
+                                    # if 'cbo_document_file' in request.FILES:
+                                    #     cbo_doc_form = CBODocumentForm(request.POST, request.FILES)
+                                    #     if expression.community_organization.documents.exists():
+                                    #         cbo_doc_form.fields['file'].required = False
+                                    #     if cbo_doc_form.is_valid():
+                                    #         doc = cbo_doc_form.save(commit=False)
+                                    #         doc.cbo = expression.community_organization
+                                    #         doc.uploaded_by = request.user.customuser
+                                    #         if not doc.file.name.lower().endswith(('.pdf', '.docx', '.jpg', '.png')):
+                                    #             messages.error(request, "Solo se permiten PDF, DOCX, JPG o PNG para documentos de CBO.")
+                                    #         else:
+                                    #             doc.save()
+                                    #             messages.success(request, "Documento de CBO cargado.")
+                                    #     else:
+                                    #         for error in cbo_doc_form.non_field_errors():
+                                    #             messages.error(request, f"Error en documento de CBO: {error}")
+                                expression.community_organization = cbo
+                            except Exception as e:
+                                messages.warning(request, f"Error al guardar CBO: {str(e)}")
+                    else:
+                        expression.community_organization = None
+                    expression.save()
 
                 # Save main expression document
                 if 'file' in request.FILES:
@@ -1598,94 +1427,10 @@ def apply_call(request, call_pk):
                 # FINAL WORD COUNT VALIDATION BLOCK
                 # -------------------------------
 
-                has_errors = False  # Reset for word count checks
-
-                # === 1. SINGLE FIELD: Project Title (max 15 words) ===
-                title = request.POST.get('project_title', '').strip()
-                if title:
-                    words = [w for w in title.split() if w]
-                    if len(words) > 50:
-                        messages.error(request, "El título del proyecto no puede tener más de 15 palabras.")
-                        has_errors = True
-
-                # === 2. CATEGORY: All ExpressionProduct Descriptions Combined (max 600 words) ===
-                product_desc_words = 0
-                product_indices_set = set(k.split('_')[-1] for k in request.POST.keys() if k.startswith('product_description_'))
-                for index in product_indices_set:
-                    desc = request.POST.get(f'product_description_{index}', '').strip()
-                    if desc:
-                        word_count = len([w for w in desc.split() if w])
-                        product_desc_words += word_count
-
-                if product_desc_words > 600:
-                    messages.error(request, f"Las descripciones de productos combinadas exceden el límite de 600 palabras ({product_desc_words}).")
-                    has_errors = True
-
-                # === 3. CATEGORY: All Team Member Roles + Antecedents (max 500 words) ===
-                team_member_words = 0
-                team_indices_set = set(k.split('_')[-1] for k in request.POST.keys() if k.startswith('team_member_role_'))
-                print("==== DEBUG TEAM MEMBER WORD COUNT ====")
-                print("POST KEYS:", [k for k in request.POST.keys() if k.startswith('team_member')])
-                print("team_indices_set:", team_indices_set)
-                for index in team_indices_set:
-                    role = request.POST.get(f'team_member_role_{index}', '').strip()
-                    antecedent_descriptions = request.POST.getlist(f'team_member_antecedent_description_{index}')
-                    print(f"Index {index}:")
-                    print(f"  role = {repr(role)}")
-                    print(f"  antecedent_descriptions = {antecedent_descriptions}")
-                    if role:
-                        team_member_words += len([w for w in role.split() if w])
-                    for desc in antecedent_descriptions:
-                        if desc.strip():
-                            team_member_words += len([w for w in desc.split() if w])
-
-                if team_member_words > 900:
-                    messages.error(request, f"Los roles y antecedentes de colaboradores no deben exceder 500 palabras ({team_member_words}).")
-                    has_errors = True
-
-                # === 4. CATEGORY: All Budget Item Notes (max 100 words) ===
-                budget_notes_words = 0
-                budget_indices_set = set(k.split('_')[-1] for k in request.POST.keys() if k.startswith('budget_item_notes_'))
-                for index in budget_indices_set:
-                    note = request.POST.get(f'budget_item_notes_{index}', '').strip()
-                    if note:
-                        budget_notes_words += len([w for w in note.split() if w])
-
-                if budget_notes_words > 100:
-                    messages.error(request, f"Las notas del presupuesto no deben superar 100 palabras en total ({budget_notes_words}).")
-                    has_errors = True
-
-                # === 5. SINGLE FIELDS: Other Text Fields ===
-                field_limits = {
-                    'problem': 50,
-                    'general_objective': 50,
-                    'methodology': 1500,
-                }
-
-                for field_name, max_words in field_limits.items():
-                    value = request.POST.get(field_name, '').strip()
-                    if not value:
-                        continue
-                    word_count = len([w for w in value.split() if w])
-                    if word_count > max_words:
-                        human_names = {
-                            'problem': 'Descripción del Problema',
-                            'general_objective': 'Objetivo General',
-                            'methodology': 'Metodología'
-                        }
-                        messages.error(
-                            request,
-                            f"{human_names[field_name]} no debe exceder {max_words} palabras ({word_count} detectadas)."
-                        )
-                        has_errors = True
-                
-                # === 6. Past Projects Summary (max 180 words) ===
-                past_projects = request.POST.get('past_projects_summary', '').strip()
-                if past_projects:
-                    word_count = len([w for w in past_projects.split() if w])
-                    if word_count > 180:
-                        messages.error(request, f"La sección de proyectos anteriores no debe exceder 180 palabras ({word_count} detectadas).")
-                        has_errors = True
+                word_errors = EXPRESSION_LIMITS.validate_post(request.POST)
+                for error in word_errors:
+                    messages.error(request, error)
+                has_errors = bool(word_errors)
 
                 # If any word count fails, stop here
                 if has_errors:
@@ -1714,18 +1459,8 @@ def apply_call(request, call_pk):
                         'existing_team_members': ExpressionTeamMember.objects.filter(
                             expression=expression
                         ).select_related('person', 'institution').prefetch_related('expression_thematic_antecedents'),
-                        'statuses': Status.objects.all().order_by('name'),
-                        'institutions': list(Institution.objects.filter(is_active=True).order_by('name').values('id', 'name')),
+                        'statuses': reference_data.get('statuses'),
                         'institution_types': institution_types,
-                        'people': people,
-                        'people_json': [
-                            {
-                                'id': person.id,
-                                'first_name': person.first_name,
-                                'first_last_name': person.first_last_name
-                            }
-                            for person in people
-                        ],
                         'budget_categories': budget_categories,
                         'budget_periods': budget_periods,
                         'existing_budget_items': BudgetItem.objects.filter(expression=expression).select_related('category', 'period'),
@@ -1741,7 +1476,7 @@ def apply_call(request, call_pk):
                         ], cls=DjangoJSONEncoder),
                         'documents': documents,
                         'document_form': doc_form,
-                        'intersectionality_scopes': IntersectionalityScope.objects.filter(is_active=True).order_by('name'),
+                        'intersectionality_scopes': intersectionality_scopes,
                         'post_data': post_data,
                     }
                     return render(request, 'calls/apply_call.html', context)
@@ -1754,16 +1489,15 @@ def apply_call(request, call_pk):
                     if expression.status.name == 'Aprobada':
                         messages.warning(request, "Esta expresión ya fue aprobada. No se puede volver a enviar.")
                     else:
-                        submitted_status, _ = Status.objects.get_or_create(name='Enviada')
-                        expression.status = submitted_status
+                        expression.status = statuses.get('Enviada')
                         expression.submission_datetime = timezone.now()
                         expression.save()
+                        capture_review_snapshot(expression)
                         messages.success(request, '¡Expresión de interés enviada con éxito!')
                     #messages.success(request, '¡Expresión de interés enviada con éxito!')
                     return redirect('calls:researcher_dashboard')
                 elif 'save_draft' in request.POST:
-                    submitted_status, _ = Status.objects.get_or_create(name='Borrador')
-                    expression.status = submitted_status
+                    expression.status = statuses.get('Borrador')
                     expression.submission_datetime = timezone.now()
                     expression.save()
                     print('Expresión guardada como borrador.')
@@ -1785,8 +1519,6 @@ def apply_call(request, call_pk):
     ).get(pk=expression.pk)
 
     # Prepare context
-    institutions_list = list(Institution.objects.filter(is_active=True).order_by('name').values('id', 'name'))
-
     context = {
         'call': call,
         'expression': expression,
@@ -1808,18 +1540,8 @@ def apply_call(request, call_pk):
         ], cls=DjangoJSONEncoder),
         'existing_products': ExpressionProduct.objects.filter(expression=expression).prefetch_related('strategic_effects'),
         'existing_team_members': ExpressionTeamMember.objects.filter(expression=expression).select_related('person', 'institution').prefetch_related('expression_thematic_antecedents'),
-        'statuses': Status.objects.all().order_by('name'),
-        'institutions': institutions_list,
+        'statuses': reference_data.get('statuses'),
         'institution_types': institution_types,
-        'people': people,
-        'people_json': [
-            {
-                'id': person.id,
-                'first_name': person.first_name,
-                'first_last_name': person.first_last_name
-            }
-            for person in people
-        ],
         'budget_categories': budget_categories,
         'budget_periods': budget_periods,
         'existing_budget_items': existing_budget_items,
@@ -1835,7 +1557,7 @@ def apply_call(request, call_pk):
         ], cls=DjangoJSONEncoder),
         'documents': documents,
         'document_form': doc_form,
-        'intersectionality_scopes': IntersectionalityScope.objects.filter(is_active=True).order_by('name'),
+        'intersectionality_scopes': intersectionality_scopes,
         'all_cbos': CBO.objects.filter(is_active=True).order_by('name'),
         'cbo_role_choices': CBORelevantRole.PREDEFINED_ROLE_CHOICES,
         # 'cbo_doc_form': cbo_doc_form,
@@ -1843,7 +1565,6 @@ def apply_call(request, call_pk):
         'post_data': post_data,
     }
 
-    #print(f"People list is: {context['people_json']}")
     return render(request, 'calls/apply_call.html', context)
 
 @login_required
@@ -1859,14 +1580,10 @@ def get_strategic_effects_by_axis(request):
         return JsonResponse({'success': False, 'error': 'Thematic Axis ID is required.'})
 
     try:
-        effects = StrategicEffect.objects.filter(
-            thematic_axis_id=axis_id,
-            is_active=True
-        ).order_by('name')
-
         effect_list = [
             {'id': effect.id, 'name': effect.name}
-            for effect in effects
+            for effect in reference_data.active('strategic_effects')
+            if str(effect.thematic_axis_id) == str(axis_id)
         ]
 
         return JsonResponse({'success': True, 'effects': effect_list})
@@ -1900,13 +1617,11 @@ def render_institution_input(request):
 
 
 @login_required
+@role_required('Researcher', message="Solo los investigadores pueden enviar propuestas.")
 def apply_proposal(request, expression_id):
     """
     Allows researcher to submit a full Proposal after Expression is approved.
     """
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Researcher':
-        messages.error(request, "Solo los investigadores pueden enviar propuestas.")
-        return redirect('home')
 
     expression = get_object_or_404(Expression, id=expression_id, user=request.user.customuser)
 
@@ -1941,13 +1656,7 @@ def apply_proposal(request, expression_id):
     #     }
     # )
 
-    draft_status, _ = Status.objects.get_or_create(
-        name='Borrador',
-        defaults={
-            'description': 'Propuesta creada automáticamente tras aprobación de expresión',
-            'is_active': True
-        }
-    )
+    draft_status = statuses.get('Borrador')
     # Check if proposal already exists
     try:
         proposal = Proposal.objects.get(pk=expression.pk)
@@ -1981,43 +1690,22 @@ def apply_proposal(request, expression_id):
         proposal.save()        
 
     # Load ProponentForm questions for 'proposal' target
-    proposal_questions = []
-    try:
-        proponent_form = ProponentForm.objects.get(call=expression.call)
-        form_questions = ProponentFormQuestion.objects.filter(
-            form=proponent_form,
-        ).select_related(
-            'shared_question', 'shared_question__category'
-        ).prefetch_related(
-            'shared_question__options_set'
-        ).order_by('order')
-        proposal_questions = [
-            fq.shared_question for fq in form_questions
-            if fq.shared_question.target_category == 'proposal'
-        ]
-    except ProponentForm.DoesNotExist:
-        pass  # No form: no extra questions
+    proposal_questions = form_bundle(expression.call_id).proposal_questions
 
     # Load existing responses for these questions
     existing_responses = ProponentResponse.objects.filter(
         expression=expression,
-        shared_question__in=proposal_questions
+        shared_question_id__in=[q.id for q in proposal_questions]
     )
     response_dict = {resp.shared_question_id: resp for resp in existing_responses}
 
     # Load context data
-    countries = Country.objects.all().order_by('name')
-    institutions = list(
-        Institution.objects.filter(is_active=True)
-        .order_by('name')
-        .values('id', 'name')
-    )   
-    people = Person.objects.filter(created_by__isnull=False).order_by('first_name', 'first_last_name')
-
-    thematic_axes = ThematicAxis.objects.filter(is_active=True)
-    strategic_effects = StrategicEffect.objects.filter(is_active=True).order_by('name')
-    budget_categories = BudgetCategory.objects.filter(is_active=True).order_by('name')
-    budget_periods = BudgetPeriod.objects.all().order_by('order', 'name')
+    countries = reference_data.get('countries')
+
+    thematic_axes = reference_data.active('thematic_axes')
+    strategic_effects = reference_data.active('strategic_effects')
+    budget_categories = reference_data.active('budget_categories')
+    budget_periods = reference_data.get('budget_periods')
     # all_cbos = CBO.objects.filter(is_active=True).order_by('name')
     # cbo_role_choices =  CBORelevantRole.PREDEFINED_ROLE_CHOICES
 
@@ -2148,11 +1836,20 @@ def apply_proposal(request, expression_id):
         #     setattr(proposal, field, post_data[field])     
 
 
-        # Country fields
+        # Country fields (an unknown id is reported with the other form errors)
+        invalid_choices = []
         if post_data['community_country']:
-            proposal.community_country = Country.objects.get(id=post_data['community_country'])
+            country = reference_data.by_id('countries', post_data['community_country'])
+            if country is None:
+                invalid_choices.append("Seleccione un país de la comunidad válido.")
+            else:
+                proposal.community_country = country
         if post_data['project_location']:
-            proposal.project_location = Country.objects.get(id=post_data['project_location'])
+            country = reference_data.by_id('countries', post_data['project_location'])
+            if country is None:
+                invalid_choices.append("Seleccione una ubicación del proyecto válida.")
+            else:
+                proposal.project_location = country
 
         if post_data['primary_institution_id'] and post_data['primary_institution_id'].isdigit():
             try:
@@ -2163,10 +1860,11 @@ def apply_proposal(request, expression_id):
         if post_data['project_title_override']:
             proposal.project_title_override = post_data['project_title_override']
         if post_data['thematic_axis_override']:
-            try:
-                proposal.thematic_axis_override = ThematicAxis.objects.get(id=post_data['thematic_axis_override'])
-            except ThematicAxis.DoesNotExist:
-                pass
+            axis = reference_data.by_id('thematic_axes', post_data['thematic_axis_override'])
+            if axis is None:
+                invalid_choices.append("Seleccione un eje temático válido.")
+            else:
+                proposal.thematic_axis_override = axis
 
         # # Partner institutions
         # institution_ids = request.POST.getlist('partner_institution_ids')
@@ -2252,14 +1950,13 @@ def apply_proposal(request, expression_id):
             # Get or create response
             response, created = ProponentResponse.objects.update_or_create(
                 expression=expression,
-                shared_question=question,
+                shared_question_id=question.id,
                 defaults={'value': value, 'comment': comment}
             )
 
             # Auto-assign score for choice fields
             if question.field_type in ['radio', 'dropdown']:
-                scored_opts = dict(question.get_scored_options())
-                response.score = scored_opts.get(str(value), None)
+                response.score = question.score_for(value)
                 response.save(update_fields=['score'])
 
         # ============================
@@ -2483,6 +2180,10 @@ def apply_proposal(request, expression_id):
 
         has_word_errors = False
 
+        for error in invalid_choices:
+            messages.error(request, error)
+            has_word_errors = True
+
         # Validate number of partner institutions
         partner_institutions_count = proposal.partner_institutions.count()
         if partner_institutions_count < 1:
@@ -2492,36 +2193,9 @@ def apply_proposal(request, expression_id):
             messages.error(request, "No puede seleccionar más de dos instituciones aliadas.")
             has_word_errors = True
             
-        def count_words(text):
-            return len([w for w in text.strip().split() if w])
-
-        field_limits = [
-            ('principal_research_experience', 250, "Experiencia en investigación del Investigador/a Principal"),
-            ('summary', 250, "Resumen"),
-            ('context_problem_justification', 400, "Contexto, problema y justificación"),
-            ('specific_objectives', 200, "Objetivos específicos"),
-            ('methodology_analytical_plan_ethics', 1500, "Metodología, planeamiento analítico y aspectos éticos"),
-            ('equity_inclusion', 250, "Equidad, género, interseccionalidad e inclusión"),
-            ('communication_strategy', 100, "Estrategia de comunicación"),
-            ('risk_analysis_mitigation', 200, "Riesgos y plan de mitigación"),
-            #('research_team', 900, "Equipo de investigación"),
-            ('community_description', 150, "Descripción de la Comunidad"),
-        ]
-
-        for field_name, max_words, label in field_limits:
-            value = post_data.get(field_name, '')
-            if not value:
-                print(f"{field_name} -- {label}: No value")
-                continue
-            word_count = count_words(value)
-            if word_count > max_words:
-                messages.error(
-                    request,
-                    f"{label}: Máximo {max_words} palabras. Tienes {word_count}."
-                )
-                has_word_errors = True
-                print(f"{label}: Máximo {max_words} palabras. Tienes {word_count}.")
-            f"{label}: Máximo {max_words} palabras. Tienes {word_count}."
+        for error in PROPOSAL_LIMITS.validate(fields=post_data):
+            messages.error(request, error)
+            has_word_errors = True
         # If any word count fails, re-render with error messages
         if has_word_errors:
             # Re-fetch fresh proposal
@@ -2548,7 +2222,6 @@ def apply_proposal(request, expression_id):
                 'expression': expression,
                 'proposal': proposal,
                 'countries': countries,
-                'institutions': institutions,
                 'thematic_axes': thematic_axes,
                 'strategic_effects': strategic_effects,
                 'strategic_effects_json': json.dumps([
@@ -2559,14 +2232,6 @@ def apply_proposal(request, expression_id):
                     }
                     for effect in strategic_effects
                 ], cls=DjangoJSONEncoder),
-                'people_json': [
-                            {
-                                'id': person.id,
-                                'first_name': person.first_name,
-                                'first_last_name': person.first_last_name
-                            }
-                            for person in people
-                        ],
                 'budget_categories': budget_categories,
                 'budget_periods': budget_periods,
                 # 'all_cbos': all_cbos,
@@ -2594,22 +2259,15 @@ def apply_proposal(request, expression_id):
         proposal.save()
 
         if 'submit_proposal' in request.POST:
-            status, _ = Status.objects.get_or_create(
-                name='Enviada',
-                defaults={'description': 'Propuesta enviada por investigador', 'is_active': True}
-            )
-            proposal.proposal_status = status
+            proposal.proposal_status = statuses.get('Enviada')
             proposal.submission_datetime = timezone.now()
             proposal.save()
+            capture_review_snapshot(proposal)
             print(proposal.proposal_status)
             messages.success(request, "¡Propuesta formal enviada con éxito! Su propuesta será revisada por el coordinador.")
             return redirect('calls:researcher_dashboard')
         elif 'save_draft' in request.POST:
-            status, _ = Status.objects.get_or_create(
-                name='Borrador',
-                defaults={'description': 'Propuesta guardada como borrador', 'is_active': True}
-            )
-            proposal.proposal_status = status
+            proposal.proposal_status = statuses.get('Borrador')
             proposal.save()
             messages.success(request, "Propuesta guardada como borrador.")
             return redirect('calls:researcher_dashboard')
@@ -2625,7 +2283,6 @@ def apply_proposal(request, expression_id):
         'expression': expression,
         'proposal': proposal,
         'countries': countries,
-        'institutions': institutions,
         'thematic_axes': thematic_axes,
         'strategic_effects': strategic_effects,
         'strategic_effects_json': json.dumps([
@@ -2636,14 +2293,6 @@ def apply_proposal(request, expression_id):
                     }
                     for effect in strategic_effects
                 ], cls=DjangoJSONEncoder),
-        'people_json': [
-                            {
-                                'id': person.id,
-                                'first_name': person.first_name,
-                                'first_last_name': person.first_last_name
-                            }
-                            for person in people
-                        ],
         'budget_categories': budget_categories,
         'budget_periods': budget_periods,
         # 'all_cbos': all_cbos,
@@ -2668,6 +2317,7 @@ def apply_proposal(request, expression_id):
 
 
 @login_required
+@role_required('Researcher', message='Acceso denegado.', json=True)
 def upload_commitment_document(request):
     """
     Uploads a commitment letter. It is linked to the Proposal.
@@ -2678,9 +2328,6 @@ def upload_commitment_document(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Método no permitido.'})
 
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Researcher':
-        return JsonResponse({'success': False, 'error': 'Acceso denegado.'})
-
     file = request.FILES.get('commitment_document')
     institution_id = request.POST.get('institution_id')
     proposal_id = request.POST.get('proposal_id')
@@ -11,11 +11,14 @@ class AutoLogoutMiddleware(MiddlewareMixin):
 
             # Get timeout from settings (default: 15 minutes)
             timeout_seconds = getattr(settings, 'AUTO_LOGOUT_DELAY', 15 * 60)
+            # last_activity is only refreshed once per granularity window, so
+            # it can lag the real last request by up to that much
+            granularity = getattr(settings, 'AUTO_LOGOUT_ACTIVITY_GRANULARITY', 60)
 
             if last_activity_str:
                 try:
                     last_activity = datetime.datetime.fromisoformat(last_activity_str)
-                    if (now - last_activity).total_seconds() > timeout_seconds:
+                    if (now - last_activity).total_seconds() > timeout_seconds + granularity:
                         logout(request)
                         request.session.flush()
                         return
@@ -25,5 +28,22 @@ class AutoLogoutMiddleware(MiddlewareMixin):
                     request.session.flush()
                     return
 
+                # Only touch the session (and so write it) once per granularity
+                # window. The check above allows for that lag: logout comes
+                # between timeout and timeout + granularity after the real
+                # last request, never before.
+                if (now - last_activity).total_seconds() < granularity:
+                    return
+
             # Update last activity
-            request.session['last_activity'] = now.isoformat()
\ No newline at end of file
+            request.session['last_activity'] = now.isoformat()
+
+
+class UserProfileMiddleware(MiddlewareMixin):
+    """
+    Load CustomUser + Role + Person once per request into `request.profile`.
+    Must run after AuthenticationMiddleware.
+    """
+    def process_request(self, request):
+        from accounts.profile import load_profile
+        request.profile = load_profile(request.user)
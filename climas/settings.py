@@ -91,22 +91,38 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'climas.middleware.UserProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'climas.middleware.AutoLogoutMiddleware'
 ]
 
+# Cache the loaded CustomUser/Role/Person per user id (seconds, 0 = off)
+USER_PROFILE_CACHE_TIMEOUT = int(os.getenv('USER_PROFILE_CACHE_TIMEOUT', 0))
+
+# Institution/person typeahead (common.search)
+TYPEAHEAD_MIN_LENGTH = 2            # shorter queries return nothing
+TYPEAHEAD_MAX_RESULTS = 20          # page size, also the hard cap per request
+TYPEAHEAD_MAX_PAGES = 5
+TYPEAHEAD_CACHED_PREFIX_LENGTH = 3  # prefixes up to this length are cached
+TYPEAHEAD_CACHE_TIMEOUT = int(os.getenv('TYPEAHEAD_CACHE_TIMEOUT', 60))
+
 # Auto-logout after 15 minutes of inactivity
 AUTO_LOGOUT_DELAY = 900  # 900 seconds = 15 minutes
 
+# Record activity (and write the session) at most once per this many seconds
+AUTO_LOGOUT_ACTIVITY_GRANULARITY = int(os.getenv('AUTO_LOGOUT_ACTIVITY_GRANULARITY', 60))
+
 # Expire session when browser closes
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 
-# Expire after 15 minutes of inactivity
-SESSION_COOKIE_AGE = 900  # same as AUTO_LOGOUT_DELAY
+# Expire after 15 minutes of inactivity. The expiry is refreshed only when
+# last_activity is, so it gets the same slack as AutoLogoutMiddleware.
+SESSION_COOKIE_AGE = AUTO_LOGOUT_DELAY + AUTO_LOGOUT_ACTIVITY_GRANULARITY
 
-# Save session on every request (so last_activity updates reliably)
-SESSION_SAVE_EVERY_REQUEST = True
+# The session is saved only when it changes; AutoLogoutMiddleware refreshes
+# last_activity (and with it the expiry) every AUTO_LOGOUT_ACTIVITY_GRANULARITY
+SESSION_SAVE_EVERY_REQUEST = False
 
 
 ROOT_URLCONF = 'climas.urls'
@@ -152,6 +168,19 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared by all gunicorn workers: holds the reference-data version stamp
+# (common.reference_data) so every worker notices when a lookup table changes.
+# The default file-based cache works for the single-container deployment; point
+# CACHE_BACKEND/CACHE_LOCATION to Redis or Memcached when running several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', '/tmp/climas_cache'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -27,7 +27,8 @@ urlpatterns = [
     path('proponent_forms/', include('proponent_forms.urls', namespace='proponent_forms')),
     path('', RedirectView.as_view(pattern_name='accounts:login', permanent=False), name='home'),
     path('captcha/', include('captcha.urls')),
+    path('institutions/', include('institutions.urls', namespace='institutions')),
+    path('people/', include('people.urls', namespace='people')),
 
-    #path('institutions/', include('institutions.urls'))
     #path('screening/', include('screening.urls'))
 ]
@@ -9,8 +9,21 @@ class CommonConfig(AppConfig):
     def ready(self):
         from django.db.models.signals import post_migrate
         from .management.commands.load_base_data import Command as LoadBaseData
+        from .reference_data import connect_signals
+        from .search import connect_signals as connect_search_signals
+        from .counters import connect_signals as connect_counter_signals
 
         def load_initial_data(sender, **kwargs):
             LoadBaseData().handle()
 
-        post_migrate.connect(load_initial_data, sender=self)
\ No newline at end of file
+        post_migrate.connect(load_initial_data, sender=self)
+
+        # Reload cached lookup tables (countries, axes, budget...) when they change
+        connect_signals()
+
+        # Drop cached typeahead pages when institutions or people change
+        connect_search_signals()
+
+        # Keep the dashboard counters in step with expressions, proposals,
+        # evaluations and template categories
+        connect_counter_signals()
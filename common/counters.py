@@ -0,0 +1,258 @@
+"""
+Contadores denormalizados para los dashboards.
+
+Los dashboards mostraban totales con `.count` sobre tablas completas
+(expresiones enviadas, propuestas enviadas, categorias por plantilla...).
+`DashboardCounter` guarda esos totales por tipo, convocatoria, estado y
+objeto, y se mantiene al dia con senales:
+
+    - `pre_save` lee los valores que cuentan (convocatoria, estado...) de la
+      fila actual, solo si el guardado puede cambiarlos (con SELECT ... FOR
+      UPDATE si hay una transaccion abierta);
+    - `post_save` / `post_delete` mueven +1 / -1 entre las llaves afectadas
+      con UPDATE ... SET value = value + n (en una transaccion).
+
+Las escrituras masivas que no disparan senales (bulk_create, update) arman
+sus propios deltas con `key()` para las filas que cambiaron y llaman a
+`apply_deltas()`, igual que las senales: solo se bloquean las filas de
+contador afectadas. El comando `reconcile_dashboard_counters` recalcula todo
+desde cero.
+
+Uso:
+    from common import counters
+
+    counters.totals(
+        expressions=(counters.EXPRESSIONS, ['Enviada']),
+        evaluations=(counters.EVALUATION_KINDS.values(), ['Completada']),
+    )                                   # {'expressions': 12, 'evaluations': 30}
+    counters.by_object(counters.TEMPLATE_CATEGORIES, template_ids)
+"""
+from collections import Counter
+from dataclasses import dataclass
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .status_registry import statuses
+
+EXPRESSIONS = 'expressions'
+PROPOSALS = 'proposals'
+EXPRESSION_EVALUATIONS = 'expression_evaluations'
+PROPOSAL_EVALUATIONS = 'proposal_evaluations'
+TEMPLATE_CATEGORIES = 'template_categories'
+
+EVALUATION_KINDS = {'expression': EXPRESSION_EVALUATIONS, 'proposal': PROPOSAL_EVALUATIONS}
+
+# pre_save marker: this save cannot change any counted value
+_UNCHANGED = object()
+
+
+def key(kind, call_id=None, status_id=None, object_id=None):
+    """Counter key (kind, call_id, status_id, object_id); missing values are stored as 0."""
+    return (kind, call_id or 0, status_id or 0, object_id or 0)
+
+
+def _expression_key(row):
+    return key(EXPRESSIONS, row['call_id'], row['status_id'])
+
+
+def _proposal_key(row):
+    return key(PROPOSALS, row['call_id'], row['proposal_status_id'])
+
+
+def _evaluation_key(row):
+    if not row['target_content_type_id']:
+        return None
+    kind = EVALUATION_KINDS.get(ContentType.objects.get_for_id(row['target_content_type_id']).model)
+    if kind is None:
+        return None
+    return key(kind, row['call_id'], row['status_id'])
+
+
+def _category_key(row):
+    return key(TEMPLATE_CATEGORIES, object_id=row['template_id'])
+
+
+@dataclass(frozen=True)
+class Counted:
+    model: str
+    fields: tuple  # attnames the key is built from
+    key: object  # (row dict) -> (kind, call_id, status_id, object_id) or None
+
+    def get_model(self):
+        return apps.get_model(self.model)
+
+
+COUNTED = (
+    Counted('expressions.Expression', ('call_id', 'status_id'), _expression_key),
+    Counted('proposals.Proposal', ('call_id', 'proposal_status_id'), _proposal_key),
+    Counted('evaluations.Evaluation', ('call_id', 'status_id', 'target_content_type_id'), _evaluation_key),
+    Counted('evaluations.TemplateCategory', ('template_id',), _category_key),
+)
+
+
+def _counter_model():
+    return apps.get_model('common', 'DashboardCounter')
+
+
+def _key_filter(counter_key):
+    kind, call_id, status_id, object_id = counter_key
+    return {'kind': kind, 'call_id': call_id, 'status_id': status_id, 'object_id': object_id}
+
+
+def apply_deltas(deltas):
+    """Add each {key: delta} to its counter row (created on first use), in key order."""
+    DashboardCounter = _counter_model()
+    with transaction.atomic():
+        for counter_key, delta in sorted(deltas.items()):
+            if not delta:
+                continue
+            rows = DashboardCounter.objects.filter(**_key_filter(counter_key))
+            if not rows.update(value=F('value') + delta):
+                # Concurrent first writers: one insert wins, both updates apply
+                DashboardCounter.objects.bulk_create(
+                    [DashboardCounter(**_key_filter(counter_key))], ignore_conflicts=True
+                )
+                rows.update(value=F('value') + delta)
+
+
+def _keys(counted, row):
+    return [k for k in (c.key(row) for c in counted) if k is not None]
+
+
+# A Proposal save writes its Expression row too (without Expression signals),
+# so it moves both counters; deletes send a signal for each table.
+def _counted_on_save(sender):
+    return [c for c in COUNTED if issubclass(sender, c.get_model())]
+
+
+def _counted_on_delete(sender):
+    return [c for c in COUNTED if sender is c.get_model()]
+
+
+def _fields(counted):
+    return sorted({name for c in counted for name in c.fields})
+
+
+def _before_save(sender, instance, update_fields=None, **kwargs):
+    counted = _counted_on_save(sender)
+    fields = _fields(counted)
+    if update_fields is not None:
+        touched = set(update_fields)
+        names = {sender._meta.get_field(name[:-3] if name.endswith('_id') else name).name for name in fields}
+        if not touched & (names | set(fields)):
+            instance._counter_keys = _UNCHANGED
+            return
+    keys = []
+    if instance.pk is not None:
+        # Inside a transaction, lock the row so a concurrent save of the same
+        # row waits and then reads our values; otherwise both would subtract
+        # the same old key. Autocommit saves cannot hold the lock until
+        # post_save, so two of them racing on one row can drift by one until
+        # `reconcile_dashboard_counters` runs.
+        lock = transaction.get_connection().in_atomic_block
+        # Per table: a new Proposal may sit on an Expression row that is already counted
+        for c in counted:
+            rows = c.get_model()._base_manager.filter(pk=instance.pk)
+            if lock:
+                rows = rows.select_for_update()
+            old = rows.values(*c.fields).first()
+            if old:
+                keys += _keys([c], old)
+    instance._counter_keys = keys
+
+
+def _after_save(sender, instance, **kwargs):
+    before = getattr(instance, '_counter_keys', _UNCHANGED)
+    if before is _UNCHANGED:
+        return
+    counted = _counted_on_save(sender)
+    after = _keys(counted, {name: getattr(instance, name) for name in _fields(counted)})
+    deltas = Counter(after)
+    deltas.subtract(before)
+    apply_deltas(deltas)
+    instance._counter_keys = _UNCHANGED
+
+
+def _after_delete(sender, instance, **kwargs):
+    counted = _counted_on_delete(sender)
+    deltas = Counter()
+    deltas.subtract(_keys(counted, {name: getattr(instance, name) for name in _fields(counted)}))
+    apply_deltas(deltas)
+
+
+def connect_signals():
+    """Called from CommonConfig.ready()."""
+    senders = {c.get_model() for c in COUNTED}
+    for model in senders:
+        label = model._meta.label_lower
+        pre_save.connect(_before_save, sender=model, dispatch_uid=f'counters:{label}:pre_save')
+        post_save.connect(_after_save, sender=model, dispatch_uid=f'counters:{label}:post_save')
+        post_delete.connect(_after_delete, sender=model, dispatch_uid=f'counters:{label}:post_delete')
+
+
+def _grouped(counted, queryset):
+    """{key: count} of `queryset` grouped by the fields of `counted` (one query)."""
+    totals = Counter()
+    for row in queryset.values(*counted.fields).annotate(n=Count('pk')).order_by():
+        counter_key = counted.key(row)
+        if counter_key is not None:
+            totals[counter_key] += row['n']
+    return totals
+
+
+def _store(totals):
+    DashboardCounter = _counter_model()
+    DashboardCounter.objects.bulk_create(
+        [DashboardCounter(value=value, **_key_filter(k)) for k, value in totals.items() if value],
+        batch_size=1000,
+    )
+
+
+def reconcile():
+    """Recompute every counter from scratch. Returns the number of counter rows."""
+    totals = Counter()
+    with transaction.atomic():
+        # Delete (and lock) first, count afterwards: a concurrent +1 either
+        # committed before the count or waits and applies on top of it
+        _counter_model().objects.all().delete()
+        for counted in COUNTED:
+            totals.update(_grouped(counted, counted.get_model()._base_manager.all()))
+        _store(totals)
+    return sum(1 for value in totals.values() if value)
+
+
+def totals(call_id=None, **wanted):
+    """
+    Several totals in one query. `wanted` maps a name to (kind or kinds,
+    status names); an empty status list counts every status. Restrict to one
+    call with `call_id`.
+    """
+    if not wanted:
+        return {}
+    wanted = {
+        name: ((kind,) if isinstance(kind, str) else tuple(kind), status_names)
+        for name, (kind, status_names) in wanted.items()
+    }
+    rows = _counter_model().objects.filter(kind__in={k for kinds, _ in wanted.values() for k in kinds})
+    if call_id is not None:
+        rows = rows.filter(call_id=call_id)
+    sums = {}
+    for name, (kinds, status_names) in wanted.items():
+        match = Q(kind__in=kinds)
+        if status_names:
+            match &= Q(status_id__in=statuses.ids(*status_names))
+        sums[name] = Coalesce(Sum('value', filter=match), 0)
+    return rows.aggregate(**sums)
+
+
+def by_object(kind, object_ids):
+    """{object_id: value} of a per-object counter (missing ids count 0)."""
+    values = dict(
+        _counter_model().objects.filter(kind=kind, object_id__in=object_ids).values_list('object_id', 'value')
+    )
+    return {pk: values.get(pk, 0) for pk in object_ids}
@@ -0,0 +1,189 @@
+"""
+Paginacion por llave (keyset / seek) para listados grandes.
+
+En lugar de OFFSET, cada pagina pide las filas que vienen despues de la
+ultima fila de la pagina anterior segun el orden del listado:
+
+    WHERE (fecha, id) < (ultima_fecha, ultimo_id) ORDER BY fecha DESC, id DESC
+
+asi que la pagina 1000 cuesta lo mismo que la primera si existe un indice
+sobre las columnas del orden. No se cuenta el total.
+
+El orden debe terminar en un campo unico (normalmente 'pk'). Los campos que
+admiten NULL se ordenan con los NULL al final en cualquier motor; si el
+listado ya excluye los NULL de una columna, pasarla en `non_null` mantiene el
+ORDER BY simple para que use el indice.
+
+El cursor es un texto opaco (base64 de JSON) con los valores de esa ultima
+fila; un cursor invalido se trata como la primera pagina.
+
+Uso:
+    paginator = KeysetPaginator(queryset, ('-submission_datetime', '-pk'), per_page=25)
+    page = paginator.page(request.GET.get('cursor'))
+    page.object_list, page.next_cursor, page.has_next
+
+    {% include 'common/keyset_pager.html' with page=page %}
+
+El admin pagina por numero de pagina (OFFSET); `CappedCountPaginator` evita
+el COUNT(*) completo de las tablas grandes contando a lo sumo `count_limit`
+filas, lo que tambien acota la pagina mas profunda a la que se puede llegar.
+"""
+import base64
+import binascii
+import datetime
+import json
+from dataclasses import dataclass
+from decimal import Decimal
+from functools import reduce
+from operator import and_, or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+
+@dataclass(frozen=True)
+class KeysetPage:
+    object_list: list
+    next_cursor: str
+    has_next: bool
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _json_value(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        # Full precision: DjangoJSONEncoder drops microseconds past milliseconds
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_json_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """The JSON value list of `cursor`, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+class KeysetPaginator:
+    """Seek pagination of `queryset` by `ordering` ('-field' for descending, last one unique)."""
+
+    def __init__(self, queryset, ordering, per_page=25, non_null=()):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.keys = []  # (lookup, descending, field, nullable)
+        self.paths = []  # attribute path of each key on a row
+        for name in ordering:
+            lookup = name.lstrip('-')
+            field, nullable, attname = self._resolve(queryset.model, lookup)
+            nullable = nullable and lookup not in non_null
+            self.keys.append((lookup, name.startswith('-'), field, nullable))
+            self.paths.append(lookup.split('__')[:-1] + [attname])
+
+    @staticmethod
+    def _resolve(model, lookup):
+        """
+        Model field behind `lookup` ('pk', 'call__title', ...), whether it can
+        be NULL and its attribute name on the last model.
+        """
+        nullable = False
+        parts = lookup.split('__')
+        for position, part in enumerate(parts):
+            field = model._meta.pk if part == 'pk' else model._meta.get_field(part)
+            nullable = nullable or field.null
+            if position < len(parts) - 1:
+                if not field.is_relation:
+                    raise FieldDoesNotExist(f"{lookup}: '{part}' is not a relation")
+                model = field.related_model
+        attname = 'pk' if parts[-1] == 'pk' else field.attname
+        if field.is_relation:
+            field = field.target_field
+        return field, nullable, attname
+
+    def order_by(self):
+        """The ORDER BY expressions; NULLs last only where the column allows them."""
+        expressions = []
+        for lookup, descending, _, nullable in self.keys:
+            expression = F(lookup)
+            nulls = {'nulls_last': True} if nullable else {}
+            expressions.append(expression.desc(**nulls) if descending else expression.asc(**nulls))
+        return expressions
+
+    def _parse(self, values):
+        if values is None or len(values) != len(self.keys):
+            return None
+        try:
+            return [
+                None if value is None else field.to_python(value)
+                for value, (_, _, field, _) in zip(values, self.keys)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            return None
+
+    def _after(self, values):
+        """Q for the rows that come after a row with `values` in this ordering."""
+        branches = []
+        equal = []
+        for (lookup, descending, _, nullable), value in zip(self.keys, values):
+            if value is not None:
+                after = Q(**{f'{lookup}__{"lt" if descending else "gt"}': value})
+                if nullable:
+                    # NULLs sort last, so they come after every value
+                    after |= Q(**{f'{lookup}__isnull': True})
+                branches.append(reduce(and_, equal, after))
+                equal.append(Q(**{lookup: value}))
+            else:
+                # Nothing sorts after NULL on this column; only ties continue
+                equal.append(Q(**{f'{lookup}__isnull': True}))
+        return reduce(or_, branches) if branches else Q(pk__in=[])
+
+    def _values(self, obj):
+        values = []
+        for path in self.paths:
+            value = obj
+            for part in path:
+                value = getattr(value, part, None) if value is not None else None
+            values.append(value)
+        return values
+
+    def page(self, cursor=None):
+        """The page after `cursor` (the first page if `cursor` is empty or invalid)."""
+        queryset = self.queryset.order_by(*self.order_by())
+        values = self._parse(decode_cursor(cursor))
+        if values is not None:
+            queryset = queryset.filter(self._after(values))
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        next_cursor = encode_cursor(self._values(rows[-1])) if has_next else ''
+        return KeysetPage(object_list=rows, next_cursor=next_cursor, has_next=has_next)
+
+
+class CappedCountPaginator(Paginator):
+    """
+    Admin paginator that stops counting at `count_limit` rows. Use it with
+    `show_full_result_count = False` so the changelist runs no COUNT(*) over
+    the whole table.
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        return self.object_list.order_by().values('pk')[:self.count_limit].count()
@@ -10,6 +10,7 @@ from accounts.models import Role, CustomUser
 from budgets.models import BudgetCategory, BudgetPeriod
 from common.models import Scale
 from common.models import Status
+from common.status_registry import statuses
 from institutions.models import InstitutionType
 from geo.models import DocumentType
 from proponent_forms.models import (
@@ -231,27 +232,8 @@ class Command(BaseCommand):
         # -------------------------
         # 6. Load Status
         # -------------------------
-        status_data = [
-            {'name': 'Draft', 'description': None},
-            {'name': 'Abierta', 'description': None}, # Y cerrada pillin?
-            {'name': 'Borrador', 'description': None},
-            {'name': 'Enviada', 'description': None},
-            {'name': 'Aprobada', 'description': None},
-            {'name': 'Pendiente', 'description': 'Evaluación pendiente de revisión'},
-        ]
-        
-        created_statuses = 0
-        for data in status_data:
-            obj, created = Status.objects.get_or_create(
-                name=data['name'],
-                defaults={
-                    'description': data['description'],
-                    'is_active': True,
-                    'color': ''
-                }
-            )
-            if created:
-                created_statuses += 1
+        # Names and defaults live in common/status_registry.py (STATUS_DEFAULTS)
+        created_statuses = statuses.ensure_defaults()
 
         self.stdout.write(
             self.style.SUCCESS(f"Created {created_statuses} statuses.")
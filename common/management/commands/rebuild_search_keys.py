@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from institutions.models import Institution
+from people.models import Person
+
+
+class Command(BaseCommand):
+    help = "Fill the normalized typeahead columns of Institution and Person (run once after adding them, safe to repeat)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        targets = (
+            (Institution, ['search_name', 'search_acronym']),
+            (Person, ['search_name', 'search_surname']),
+        )
+        for model, fields in targets:
+            updated = 0
+            last_pk = 0
+            while True:
+                batch = list(model.objects.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+                if not batch:
+                    break
+                for obj in batch:
+                    obj.update_search_fields()
+                model.objects.bulk_update(batch, fields)
+                updated += len(batch)
+                last_pk = batch[-1].pk
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: {updated} rows updated."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from common import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized dashboard counters from the source tables (safe to repeat)"
+
+    def handle(self, *args, **options):
+        rows = counters.reconcile()
+        self.stdout.write(self.style.SUCCESS(f"Dashboard counters rebuilt: {rows} rows."))
@@ -77,4 +77,31 @@ class Scale(TimestampMixin, models.Model):
     def save(self, *args, **kwargs):
         if not self.description:
             self.description = self.get_name_display()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class DashboardCounter(models.Model):
+    """
+    Conteo denormalizado de filas por tipo, convocatoria y estado (ver
+    common/counters.py). Los dashboards leen estos valores en lugar de contar
+    tablas completas.
+    """
+    kind = models.CharField(max_length=40, verbose_name="Tipo")
+    # Plain ids, not foreign keys: 0 means "none" so the unique key works on every engine
+    call_id = models.PositiveIntegerField(default=0, verbose_name="Convocatoria")
+    status_id = models.PositiveIntegerField(default=0, verbose_name="Estado")
+    object_id = models.PositiveIntegerField(default=0, verbose_name="Objeto")
+    value = models.BigIntegerField(default=0, verbose_name="Valor")
+
+    class Meta:
+        db_table = 'dashboard_counter'
+        verbose_name = "Contador de Dashboard"
+        verbose_name_plural = "Contadores de Dashboard"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'call_id', 'status_id', 'object_id'],
+                name='dashboard_counter_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} ({self.call_id}/{self.status_id}/{self.object_id}): {self.value}"
@@ -0,0 +1,149 @@
+"""
+Registro de datos de referencia (tablas de catalogo) en memoria del proceso.
+
+Las tablas que siembra `load_base_data` (paises, ejes tematicos, categorias
+de presupuesto, etc.) casi nunca cambian, pero cada pagina del formulario las
+volvia a consultar. Este registro las carga una sola vez por worker de
+gunicorn y las reutiliza entre peticiones.
+
+Consistencia entre workers:
+    Una marca de version compartida vive en el cache de Django (ver CACHES en
+    settings). Cada `post_save` / `post_delete` sobre un modelo registrado
+    cambia la marca al hacer commit; cada worker compara su version local con
+    la compartida antes de servir datos y recarga si difieren.
+
+Hilos (gunicorn gthread):
+    Las tablas de una version viven en un diccionario que nunca se modifica:
+    una carga arma uno nuevo y lo publica con una sola asignacion, y cada
+    lectura trabaja sobre el que tomo al empezar.
+
+Uso:
+    from common.reference_data import reference_data
+
+    reference_data.get('countries')            # tupla ordenada de instancias
+    reference_data.active('thematic_axes')     # solo is_active=True
+    reference_data.by_id('budget_periods', 3)  # instancia o None
+
+`for_model_path()` (listas de las preguntas dinamicas) devuelve las filas en
+el orden de `Meta.ordering` de cada modelo, como la consulta que reemplaza.
+"""
+import threading
+from uuid import uuid4
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+VERSION_CACHE_KEY = 'climas:reference_data:version'
+
+# key -> (model path, select_related, ordering)
+REFERENCE_TABLES = {
+    'countries': ('geo.Country', (), ('name',)),
+    'document_types': ('geo.DocumentType', ('country',), ('country__name', 'name')),
+    'thematic_axes': ('thematic_axes.ThematicAxis', (), ('name',)),
+    'strategic_effects': ('strategic_effects.StrategicEffect', ('thematic_axis',), ('name',)),
+    'budget_categories': ('budgets.BudgetCategory', (), ('name',)),
+    'budget_periods': ('budgets.BudgetPeriod', (), ('order', 'name')),
+    'scales': ('common.Scale', (), ('name',)),
+    'statuses': ('common.Status', (), ('name',)),
+    'institution_types': ('institutions.InstitutionType', (), ('name',)),
+    'intersectionality_scopes': ('intersectionality.IntersectionalityScope', (), ('name',)),
+}
+
+# 'geo.Country' -> 'countries' (used by the dynamic dropdown helpers)
+KEYS_BY_MODEL_PATH = {model_path: key for key, (model_path, _, _) in REFERENCE_TABLES.items()}
+
+
+class ReferenceData:
+    """
+    Cache por proceso de las tablas de referencia, invalidado por version.
+    """
+
+    def __init__(self):
+        # (version, {key: (rows, {pk: row})}); replaced as a whole, never mutated
+        self._state = (None, {})
+        self._lock = threading.Lock()
+
+    def _shared_version(self):
+        version = cache.get(VERSION_CACHE_KEY)
+        if version is None:
+            # First worker to get here seeds the stamp; the rest read it back.
+            cache.add(VERSION_CACHE_KEY, uuid4().hex, None)
+            version = cache.get(VERSION_CACHE_KEY)
+        return version
+
+    def _load(self, key, model_order):
+        model_path, related, ordering = REFERENCE_TABLES[key]
+        model = apps.get_model(model_path)
+        queryset = model.objects.all()
+        if related:
+            queryset = queryset.select_related(*related)
+        if not model_order:
+            queryset = queryset.order_by(*ordering)
+        rows = tuple(queryset)
+        return rows, {obj.pk: obj for obj in rows}
+
+    def _table(self, key, model_order=False):
+        """(rows, {pk: row}) of `key` for the current shared version."""
+        version = self._shared_version()
+        table_key = (key, model_order)
+        state_version, tables = self._state
+        if state_version == version and table_key in tables:
+            return tables[table_key]
+
+        table = self._load(key, model_order)
+        with self._lock:
+            state_version, tables = self._state
+            tables = dict(tables) if state_version == version else {}
+            tables[table_key] = table
+            self._state = (version, tables)
+        return table
+
+    def get(self, key):
+        """Return every row of a reference table, in display order."""
+        return self._table(key)[0]
+
+    def active(self, key):
+        """Return only the rows flagged `is_active` (all rows if the model has no flag)."""
+        return tuple(obj for obj in self.get(key) if getattr(obj, 'is_active', True))
+
+    def by_id(self, key, pk):
+        """Return a single row by primary key, or None."""
+        by_id = self._table(key)[1]
+        try:
+            return by_id.get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def for_model_path(self, model_path):
+        """
+        Rows for a 'app_label.Model' path in the model's Meta.ordering, or None
+        if the model is not registered.
+        """
+        key = KEYS_BY_MODEL_PATH.get(model_path)
+        if key is None:
+            return None
+        return self._table(key, model_order=True)[0]
+
+    def invalidate(self):
+        """Publish a new version so every worker reloads on its next access."""
+        cache.set(VERSION_CACHE_KEY, uuid4().hex, None)
+        with self._lock:
+            self._state = (None, {})
+
+
+reference_data = ReferenceData()
+
+
+def _on_reference_change(sender, **kwargs):
+    transaction.on_commit(reference_data.invalidate)
+
+
+def connect_signals():
+    """Connect invalidation to every registered model. Called from CommonConfig.ready()."""
+    for model_path, _, _ in REFERENCE_TABLES.values():
+        model = apps.get_model(model_path)
+        uid = f'reference_data:{model_path}'
+        post_save.connect(_on_reference_change, sender=model, dispatch_uid=uid + ':save')
+        post_delete.connect(_on_reference_change, sender=model, dispatch_uid=uid + ':delete')
@@ -0,0 +1,103 @@
+"""
+Busqueda por prefijo para los campos de autocompletado (typeahead).
+
+Los formularios ya no incrustan todas las instituciones y personas en la
+pagina; consultan `institutions:search` y `people:search` mientras el
+usuario escribe. Cada modelo guarda columnas normalizadas (minusculas, sin
+tildes, con indice) para que el prefijo sea insensible a acentos. Las vistas
+filtran con `istartswith`: en MySQL se traduce a `LIKE 'x%'` con la collation
+del campo, que puede usar el indice (`startswith` genera `LIKE BINARY`, que
+no lo usa). En PostgreSQL `istartswith` envuelve la columna en UPPER() y
+necesitaria un indice `varchar_pattern_ops` sobre esa expresion.
+
+Las respuestas para prefijos cortos (los mas repetidos y los mas caros) se
+guardan unos segundos en el cache de Django; crear o editar una institucion
+o persona invalida esas entradas de inmediato (ver `connect_signals`).
+"""
+import hashlib
+import unicodedata
+from uuid import uuid4
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.http import JsonResponse
+
+TYPEAHEAD_CACHE_KEY = 'climas:typeahead:{kind}:{version}:{digest}'
+TYPEAHEAD_VERSION_KEY = 'climas:typeahead:{kind}:version'
+
+# typeahead kind -> model whose changes make its cached pages stale
+TYPEAHEAD_MODELS = {
+    'institutions': 'institutions.Institution',
+    'people': 'people.Person',
+}
+
+
+def normalize_search(text):
+    """Lowercase, strip accents and collapse whitespace: ' José  PÉREZ ' -> 'jose perez'."""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def typeahead_response(request, kind, search, variant=''):
+    """
+    JSON page of matches for `?q=<prefix>&page=<n>`.
+
+    `search(term, offset, limit)` returns up to `limit` dicts for the
+    normalized `term`. `variant` separates cache entries for the same term
+    (e.g. different filters).
+    """
+    term = normalize_search(request.GET.get('q', ''))
+    max_results = _setting('TYPEAHEAD_MAX_RESULTS', 20)
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except (TypeError, ValueError):
+        page = 1
+    # Deep pages of a short prefix are never useful; ask for a longer prefix instead
+    page = min(page, _setting('TYPEAHEAD_MAX_PAGES', 5))
+
+    if len(term) < _setting('TYPEAHEAD_MIN_LENGTH', 2):
+        return JsonResponse({'results': [], 'page': page, 'has_more': False})
+
+    cacheable = len(term) <= _setting('TYPEAHEAD_CACHED_PREFIX_LENGTH', 3)
+    if cacheable:
+        version = cache.get(TYPEAHEAD_VERSION_KEY.format(kind=kind), '0')
+        digest = hashlib.md5(f'{variant}|{page}|{term}'.encode()).hexdigest()
+        key = TYPEAHEAD_CACHE_KEY.format(kind=kind, version=version, digest=digest)
+        data = cache.get(key)
+        if data is not None:
+            return JsonResponse(data)
+
+    rows = search(term, (page - 1) * max_results, max_results + 1)
+    data = {
+        'results': rows[:max_results],
+        'page': page,
+        'has_more': len(rows) > max_results,
+    }
+    if cacheable:
+        cache.set(key, data, _setting('TYPEAHEAD_CACHE_TIMEOUT', 60))
+    return JsonResponse(data)
+
+
+def invalidate_typeahead(kind):
+    cache.set(TYPEAHEAD_VERSION_KEY.format(kind=kind), uuid4().hex, None)
+
+
+def connect_signals():
+    """Called from CommonConfig.ready()."""
+    for kind, model_path in TYPEAHEAD_MODELS.items():
+        def handler(sender, kind=kind, **kwargs):
+            transaction.on_commit(lambda: invalidate_typeahead(kind))
+
+        model = apps.get_model(model_path)
+        post_save.connect(handler, sender=model, weak=False, dispatch_uid=f'typeahead:{kind}:save')
+        post_delete.connect(handler, sender=model, weak=False, dispatch_uid=f'typeahead:{kind}:delete')
@@ -0,0 +1,124 @@
+"""
+Resolucion nombre -> fila para Status y Scale sin consultas por peticion.
+
+El codigo compara y asigna estados por nombre ('Enviada', 'Completada', ...).
+En lugar de `Status.objects.get(name=...)` en cada vista (o en cada fila de un
+bucle), este modulo indexa por nombre las filas que ya guarda
+`common.reference_data`, asi que comparten su cache por worker y su
+invalidacion entre workers.
+
+Uso:
+    from common.status_registry import statuses, scales
+
+    expression.status = statuses.get('Enviada')
+    Expression.objects.filter(status_id=statuses.id('Enviada'))
+    Evaluation.objects.filter(status_id__in=statuses.ids('Pendiente', 'En Progreso'))
+    expression.scale = scales.get('M')
+"""
+from django.apps import apps
+from django.db.models import Q
+
+from .reference_data import REFERENCE_TABLES, reference_data
+
+# Every status name the code relies on. `load_base_data` creates them once
+# (post_migrate); the registry creates any that are still missing on first use.
+STATUS_DEFAULTS = {
+    'Draft': {'description': None},
+    'Abierta': {'description': None},
+    'Borrador': {'description': None},
+    'Enviada': {'description': None},
+    'Aprobada': {'description': 'Evaluación autoaprobada por sistema', 'color': 'green'},
+    'Pendiente': {'description': 'Evaluación pendiente de revisión'},
+    'En Progreso': {'description': 'Evaluación en curso'},
+    'Completada': {'description': 'Evaluación completada por el evaluador'},
+    'Aprobada para Financiamiento': {
+        'description': 'Propuesta autoaprobada para financiamiento por sistema',
+        'color': 'blue',
+    },
+}
+
+
+class NameRegistry:
+    """
+    Indice por `name` sobre una tabla de `reference_data`.
+    """
+
+    def __init__(self, key, defaults=None, create_missing=False):
+        self.key = key
+        self.defaults = defaults or {}
+        self.create_missing = create_missing
+        # (reference_data rows, {name: row}); replaced as a whole
+        self._index_state = (None, {})
+
+    @property
+    def model(self):
+        return apps.get_model(REFERENCE_TABLES[self.key][0])
+
+    def _index(self):
+        rows = reference_data.get(self.key)
+        indexed_rows, by_name = self._index_state
+        if rows is not indexed_rows:
+            # reference_data reloaded (first use or another worker invalidated it)
+            by_name = {obj.name: obj for obj in rows}
+            self._index_state = (rows, by_name)
+        return by_name
+
+    def _defaults_for(self, name):
+        defaults = {'is_active': True, 'color': ''}
+        defaults.update(self.defaults.get(name, {}))
+        return defaults
+
+    def get(self, name):
+        """Return the row called `name`, creating it if allowed."""
+        obj = self._index().get(name)
+        if obj is None:
+            if not self.create_missing:
+                raise self.model.DoesNotExist(f"{self.model.__name__} '{name}' does not exist.")
+            obj, _ = self.model.objects.get_or_create(name=name, defaults=self._defaults_for(name))
+            rows, by_name = self._index_state
+            self._index_state = (rows, {**by_name, name: obj})
+        return obj
+
+    def id(self, name):
+        """Primary key for `name`, for `status_id=` filters without a join."""
+        return self.get(name).pk
+
+    def ids(self, *names):
+        """Primary keys for several names, for `status_id__in=` filters."""
+        return [self.id(name) for name in names]
+
+    def ensure_defaults(self):
+        """
+        Create every row listed in `defaults` and fill in a blank color or
+        description on existing ones. Returns how many were created.
+        """
+        # Ask the database, not the cache: this runs right after migrate.
+        existing = set(
+            self.model.objects.filter(name__in=self.defaults).values_list('name', flat=True)
+        )
+        created = 0
+        for name in self.defaults:
+            if name in existing:
+                self._backfill(name)
+                continue
+            _, was_created = self.model.objects.get_or_create(name=name, defaults=self._defaults_for(name))
+            created += was_created
+        return created
+
+    def _backfill(self, name):
+        # Rows seeded before a default existed keep the value an admin set.
+        defaults = self.defaults.get(name, {})
+        updated = 0
+        if defaults.get('color'):
+            updated += self.model.objects.filter(name=name, color='').update(color=defaults['color'])
+        if defaults.get('description'):
+            updated += self.model.objects.filter(
+                Q(description__isnull=True) | Q(description=''), name=name,
+            ).update(description=defaults['description'])
+        if updated:
+            # .update() skips the post_save hook that normally invalidates
+            reference_data.invalidate()
+
+
+statuses = NameRegistry('statuses', STATUS_DEFAULTS, create_missing=True)
+scales = NameRegistry('scales')
@@ -0,0 +1,236 @@
+"""
+Archivos generados sobre la marcha para StreamingHttpResponse.
+
+Las descargas grandes (exportaciones, paquetes ZIP) no se arman en memoria ni
+en disco: cada funcion devuelve un generador de bytes que la respuesta va
+enviando a medida que se producen, asi que la memoria del worker no depende
+del tamano del archivo.
+
+    - `csv_stream(header, rows)`: CSV en UTF-8 con BOM (Excel lo abre con
+      acentos), en bloques de filas. El texto que empieza con =, +, -, @,
+      tabulador o retorno de carro lleva un ' delante para que la hoja de
+      calculo no lo ejecute como formula (los investigadores escriben
+      titulos y comentarios).
+    - `ZipStream`: ZIP escrito hacia adelante (sin seek); cada entrada lleva
+      su descriptor de datos al final y lo ya comprimido se saca con
+      `drain()`.
+    - `xlsx_stream(sheet_name, header, rows)`: libro XLSX de una hoja con
+      cadenas en linea (sin tabla de cadenas compartidas), escrito fila a fila
+      dentro de un `ZipStream`.
+
+Las celdas admiten str, int, float, Decimal, bool y None.
+"""
+import csv
+import re
+import time
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+# Rows written between two yields
+ROWS_PER_CHUNK = 500
+
+# Leading characters that make a spreadsheet read a CSV cell as a formula
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Characters XML 1.0 does not allow (they would make the workbook unreadable)
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+class _Echo:
+    """csv.writer target that returns each line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_stream(header, rows, rows_per_chunk=ROWS_PER_CHUNK):
+    """Yield a CSV file (UTF-8 with BOM) with `header` and `rows`, a block of rows at a time."""
+    writer = csv.writer(_Echo())
+    chunk = ['\ufeff', writer.writerow(header)]
+    for row in rows:
+        chunk.append(writer.writerow([_csv_cell(value) for value in row]))
+        if len(chunk) >= rows_per_chunk:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+class _Sink:
+    """Write-only file object; what was written is taken back out with `drain()`."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStream:
+    """
+    ZIP archive written forward only. Open one entry at a time with `open()`,
+    write to it, and yield `drain()` as often as needed; `close()` returns the
+    last bytes (central directory).
+    """
+
+    def __init__(self, compression=zipfile.ZIP_DEFLATED):
+        self.compression = compression
+        self._sink = _Sink()
+        # No tell()/seek() on the sink: zipfile writes data descriptors instead
+        self._zip = zipfile.ZipFile(self._sink, 'w', compression=compression)
+
+    def open(self, name, date_time=None):
+        """Writable file object for a new entry `name` (sizes need not be known)."""
+        info = zipfile.ZipInfo(name, date_time=date_time or time.localtime()[:6])
+        info.compress_type = self.compression
+        return self._zip.open(info, 'w', force_zip64=True)
+
+    def write_file(self, name, source, chunk_size=64 * 1024, date_time=None):
+        """Copy the open binary file `source` into entry `name`, yielding the output as it is produced."""
+        with self.open(name, date_time) as entry:
+            while True:
+                data = source.read(chunk_size)
+                if not data:
+                    break
+                entry.write(data)
+                output = self.drain()
+                if output:
+                    yield output
+        yield self.drain()
+
+    def drain(self):
+        return self._sink.drain()
+
+    def close(self):
+        self._zip.close()
+        return self.drain()
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+_XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_XLSX_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    '</sheetView></sheetViews>'
+    '<sheetData>'
+)
+
+_XLSX_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def _xlsx_cell(value, style=''):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"{style}><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c{style}><v>{value}</v></c>'
+    text = escape(_XML_ILLEGAL.sub('', str(value)))
+    return f'<c t="inlineStr"{style}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values, style=''):
+    return '<row>' + ''.join(_xlsx_cell(value, style) for value in values) + '</row>'
+
+
+def xlsx_stream(sheet_name, header, rows, rows_per_chunk=ROWS_PER_CHUNK):
+    """Yield a one-sheet XLSX workbook with a bold, frozen `header` row and `rows`."""
+    archive = ZipStream()
+    sheet_name = _XML_ILLEGAL.sub('', re.sub(r'[\[\]:*?/\\]', ' ', sheet_name))[:31] or 'Hoja1'
+    for name, body in (
+        ('[Content_Types].xml', _XLSX_CONTENT_TYPES),
+        ('_rels/.rels', _XLSX_ROOT_RELS),
+        ('xl/workbook.xml', _XLSX_WORKBOOK.format(name=escape(sheet_name, {'"': '&quot;'}))),
+        ('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS),
+        ('xl/styles.xml', _XLSX_STYLES),
+    ):
+        with archive.open(name) as part:
+            part.write(body.encode())
+
+    with archive.open('xl/worksheets/sheet1.xml') as sheet:
+        chunk = [_XLSX_SHEET_HEAD, _xlsx_row(header, ' s="1"')]
+        for row in rows:
+            chunk.append(_xlsx_row(row))
+            if len(chunk) >= rows_per_chunk:
+                sheet.write(''.join(chunk).encode())
+                chunk = []
+                yield archive.drain()
+        chunk.append(_XLSX_SHEET_TAIL)
+        sheet.write(''.join(chunk).encode())
+    yield archive.close()
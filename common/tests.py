@@ -1,3 +1,152 @@
-from django.test import TestCase
+from django.http import QueryDict
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from .word_limits import EXPRESSION_LIMITS, PROPOSAL_LIMITS, count_words
+
+
+def words(n):
+    return ' '.join(['palabra'] * n)
+
+
+def post(*pairs):
+    data = QueryDict(mutable=True)
+    for key, value in pairs:
+        data.appendlist(key, value)
+    return data
+
+
+class CountWordsTests(SimpleTestCase):
+
+    def test_matches_split_with_empty_filter(self):
+        for text in ['', '   ', 'uno', ' uno  dos\ttres\n cuatro ', 'a b']:
+            self.assertEqual(count_words(text), len([w for w in text.strip().split() if w]))
+
+    def test_none_is_zero(self):
+        self.assertEqual(count_words(None), 0)
+
+
+class ExpressionFieldLimitTests(SimpleTestCase):
+    LIMITS = {
+        'project_title': 50,
+        'problem': 50,
+        'general_objective': 50,
+        'methodology': 1500,
+        'past_projects_summary': 180,
+    }
+
+    def test_every_field_limit(self):
+        for field, max_words in self.LIMITS.items():
+            with self.subTest(field=field):
+                self.assertEqual(EXPRESSION_LIMITS.validate_post(post((field, words(max_words)))), [])
+                errors = EXPRESSION_LIMITS.validate_post(post((field, words(max_words + 1))))
+                self.assertEqual(len(errors), 1)
+                self.assertIn(str(max_words), errors[0])
+
+    def test_messages(self):
+        errors = EXPRESSION_LIMITS.validate_post(post(('problem', words(51))))
+        self.assertEqual(errors, ["Descripción del Problema no debe exceder 50 palabras (51 detectadas)."])
+
+    def test_all_fields_declared(self):
+        self.assertEqual(
+            {f: l.max_words for f, l in EXPRESSION_LIMITS.fields.items()},
+            self.LIMITS,
+        )
+
+
+class ExpressionGroupLimitTests(SimpleTestCase):
+
+    def test_product_descriptions_combined(self):
+        ok = post(('product_description_0', words(300)), ('product_description_1', words(300)))
+        self.assertEqual(EXPRESSION_LIMITS.validate_post(ok), [])
+        too_many = post(('product_description_0', words(300)), ('product_description_1', words(301)))
+        self.assertEqual(
+            EXPRESSION_LIMITS.validate_post(too_many),
+            ["Las descripciones de productos combinadas exceden el límite de 600 palabras (601)."],
+        )
+
+    def test_team_roles_and_antecedents_combined(self):
+        ok = post(
+            ('team_member_role_0', words(100)),
+            ('team_member_antecedent_description_0', words(400)),
+            ('team_member_antecedent_description_0', words(400)),
+        )
+        self.assertEqual(EXPRESSION_LIMITS.validate_post(ok), [])
+        ok.appendlist('team_member_antecedent_description_0', 'una')
+        self.assertEqual(
+            EXPRESSION_LIMITS.validate_post(ok),
+            ["Los roles y antecedentes de colaboradores no deben exceder 900 palabras (901)."],
+        )
+
+    def test_antecedents_without_role_row_are_ignored(self):
+        data = post(('team_member_antecedent_description_7', words(1000)))
+        self.assertEqual(EXPRESSION_LIMITS.validate_post(data), [])
+
+    def test_budget_notes_combined(self):
+        ok = post(('budget_item_notes_0', words(60)), ('budget_item_notes_1', words(40)))
+        self.assertEqual(EXPRESSION_LIMITS.validate_post(ok), [])
+        too_many = post(('budget_item_notes_0', words(60)), ('budget_item_notes_1', words(41)))
+        self.assertEqual(
+            EXPRESSION_LIMITS.validate_post(too_many),
+            ["Las notas del presupuesto no deben superar 100 palabras en total (101)."],
+        )
+
+    def test_only_last_value_of_single_row_fields_counts(self):
+        data = post(('product_description_0', words(700)), ('product_description_0', words(10)))
+        self.assertEqual(EXPRESSION_LIMITS.validate_post(data), [])
+
+    def test_errors_in_declaration_order(self):
+        data = post(
+            ('past_projects_summary', words(181)),
+            ('budget_item_notes_0', words(101)),
+            ('project_title', words(51)),
+        )
+        errors = EXPRESSION_LIMITS.validate_post(data)
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(errors[0].startswith("El título del proyecto"))
+        self.assertTrue(errors[1].startswith("Las notas del presupuesto"))
+        self.assertTrue(errors[2].startswith("La sección de proyectos anteriores"))
+
+    def test_structured_groups(self):
+        self.assertEqual(EXPRESSION_LIMITS.validate(groups={'products': [words(600)]}), [])
+        self.assertEqual(len(EXPRESSION_LIMITS.validate(groups={'products': [words(600), 'x']})), 1)
+
+
+class ProposalLimitTests(SimpleTestCase):
+    LIMITS = {
+        'principal_research_experience': 250,
+        'summary': 250,
+        'context_problem_justification': 400,
+        'specific_objectives': 200,
+        'methodology_analytical_plan_ethics': 1500,
+        'equity_inclusion': 250,
+        'communication_strategy': 100,
+        'risk_analysis_mitigation': 200,
+        'community_description': 150,
+    }
+
+    def test_every_field_limit(self):
+        for field, max_words in self.LIMITS.items():
+            with self.subTest(field=field):
+                self.assertEqual(PROPOSAL_LIMITS.validate(fields={field: words(max_words)}), [])
+                errors = PROPOSAL_LIMITS.validate(fields={field: words(max_words + 1)})
+                label = PROPOSAL_LIMITS.fields[field].label
+                self.assertEqual(errors, [f"{label}: Máximo {max_words} palabras. Tienes {max_words + 1}."])
+
+    def test_all_fields_declared(self):
+        self.assertEqual({f: l.max_words for f, l in PROPOSAL_LIMITS.fields.items()}, self.LIMITS)
+
+    def test_unrelated_fields_are_ignored(self):
+        self.assertEqual(PROPOSAL_LIMITS.validate(fields={'duration_months': 12, 'summary': ''}), [])
+
+
+class SchemaTests(SimpleTestCase):
+
+    def test_schema_publishes_same_limits(self):
+        schema = EXPRESSION_LIMITS.schema()
+        self.assertEqual(schema['properties']['methodology']['x-maxWords'], 1500)
+        self.assertEqual(schema['x-wordGroups']['team']['x-maxWords'], 900)
+        self.assertEqual(
+            [f['pattern'] for f in schema['x-wordGroups']['team']['fields']],
+            ['^team_member_role_[^_]*$', '^team_member_antecedent_description_[^_]*$'],
+        )
+        self.assertEqual(PROPOSAL_LIMITS.schema()['properties']['summary']['x-maxWords'], 250)
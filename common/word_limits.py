@@ -0,0 +1,204 @@
+"""
+Limites de palabras declarados una sola vez por formulario.
+
+Cada formulario (expresion de interes, propuesta) es un `WordLimitSet` con
+limites por campo (`FieldLimit`) y limites por grupo de filas (`GroupLimit`,
+p. ej. todas las descripciones de productos juntas). El mismo conjunto sirve
+para:
+
+    - validar un POST completo: `EXPRESSION_LIMITS.validate_post(request.POST)`
+    - validar un fragmento ya estructurado (autosave):
+      `EXPRESSION_LIMITS.validate(fields={...}, groups={...})`
+    - publicar los limites al navegador: `EXPRESSION_LIMITS.schema()`
+
+Todas las cuentas usan `count_words()`.
+"""
+import re
+from collections import defaultdict
+
+
+def count_words(text):
+    """Number of whitespace-separated words in `text` (None counts as 0)."""
+    return len(text.split()) if text else 0
+
+
+class FieldLimit:
+    """Maximum words for a single POST field."""
+
+    def __init__(self, field, max_words, label, message):
+        self.field = field
+        self.max_words = max_words
+        self.label = label
+        self.message = message
+
+    def error(self, count):
+        return self.message.format(label=self.label, max=self.max_words, count=count)
+
+
+class IndexedField:
+    """
+    A field posted once per row as `<prefix>_<index>`. With `many=True` every
+    value posted under the key is counted (getlist), otherwise only the last.
+    """
+
+    def __init__(self, prefix, many=False):
+        self.prefix = prefix
+        self.many = many
+
+
+class GroupLimit(FieldLimit):
+    """
+    Maximum words across every row of a group. Rows are the indices posted for
+    the first source; the other sources only count for those rows.
+    """
+
+    def __init__(self, key, max_words, label, message, sources):
+        super().__init__(key, max_words, label, message)
+        self.sources = sources
+
+
+class WordLimitSet:
+    """
+    Limits for one form, checked in declaration order.
+    """
+
+    def __init__(self, name, limits):
+        self.name = name
+        self.limits = tuple(limits)
+        self.fields = {l.field: l for l in self.limits if not isinstance(l, GroupLimit)}
+        self.groups = {l.field: l for l in self.limits if isinstance(l, GroupLimit)}
+        prefixes = {s.prefix for g in self.groups.values() for s in g.sources}
+        self._indexed = re.compile(
+            r'^(%s)_([^_]*)$' % '|'.join(sorted(map(re.escape, prefixes), key=len, reverse=True))
+        ) if prefixes else None
+
+    def parse_post(self, post):
+        """
+        Single pass over `post` (a QueryDict). Returns (fields, groups):
+        {field: text} and {group_key: [texts]}.
+        """
+        fields = {}
+        indexed = defaultdict(dict)
+        for key, values in post.lists():
+            if not values:
+                continue
+            if key in self.fields:
+                fields[key] = values[-1]
+                continue
+            match = self._indexed.match(key) if self._indexed else None
+            if match:
+                indexed[match.group(1)][match.group(2)] = values
+
+        groups = {}
+        for key, group in self.groups.items():
+            anchor, *others = group.sources
+            texts = []
+            for index, values in indexed[anchor.prefix].items():
+                texts.extend(values if anchor.many else values[-1:])
+                for source in others:
+                    values = indexed[source.prefix].get(index, [])
+                    texts.extend(values if source.many else values[-1:])
+            groups[key] = texts
+        return fields, groups
+
+    def counts(self, fields=None, groups=None):
+        """{limit key: words} for the limits present in `fields` / `groups`."""
+        fields = fields or {}
+        groups = groups or {}
+        result = {}
+        for limit in self.limits:
+            if isinstance(limit, GroupLimit):
+                if limit.field in groups:
+                    result[limit.field] = sum(count_words(t) for t in groups[limit.field])
+            elif limit.field in fields:
+                result[limit.field] = count_words(fields[limit.field])
+        return result
+
+    def validate(self, fields=None, groups=None):
+        """Error messages, in declaration order. Limits with no data are skipped."""
+        counts = self.counts(fields, groups)
+        return [
+            limit.error(counts[limit.field])
+            for limit in self.limits
+            if limit.field in counts and counts[limit.field] > limit.max_words
+        ]
+
+    def validate_post(self, post):
+        return self.validate(*self.parse_post(post))
+
+    def schema(self):
+        """JSON Schema for the browser; word limits go in `x-maxWords`."""
+        properties = {
+            field: {'type': 'string', 'title': limit.label, 'x-maxWords': limit.max_words}
+            for field, limit in self.fields.items()
+        }
+        return {
+            '$schema': 'https://json-schema.org/draft/2020-12/schema',
+            'title': self.name,
+            'type': 'object',
+            'properties': properties,
+            'x-wordGroups': {
+                key: {
+                    'title': group.label,
+                    'x-maxWords': group.max_words,
+                    'fields': [
+                        {'pattern': f'^{s.prefix}_[^_]*$', 'many': s.many} for s in group.sources
+                    ],
+                }
+                for key, group in self.groups.items()
+            },
+        }
+
+
+_EXPRESSION_FIELD_MESSAGE = "{label} no debe exceder {max} palabras ({count} detectadas)."
+
+EXPRESSION_LIMITS = WordLimitSet('expression', [
+    FieldLimit(
+        'project_title', 50, "Título del proyecto",
+        "El título del proyecto no puede tener más de {max} palabras.",
+    ),
+    GroupLimit(
+        'products', 600, "Descripciones de productos",
+        "Las descripciones de productos combinadas exceden el límite de {max} palabras ({count}).",
+        sources=(IndexedField('product_description'),),
+    ),
+    GroupLimit(
+        'team', 900, "Roles y antecedentes de colaboradores",
+        "Los roles y antecedentes de colaboradores no deben exceder {max} palabras ({count}).",
+        sources=(
+            IndexedField('team_member_role'),
+            IndexedField('team_member_antecedent_description', many=True),
+        ),
+    ),
+    GroupLimit(
+        'budget_notes', 100, "Notas del presupuesto",
+        "Las notas del presupuesto no deben superar {max} palabras en total ({count}).",
+        sources=(IndexedField('budget_item_notes'),),
+    ),
+    FieldLimit('problem', 50, "Descripción del Problema", _EXPRESSION_FIELD_MESSAGE),
+    FieldLimit('general_objective', 50, "Objetivo General", _EXPRESSION_FIELD_MESSAGE),
+    FieldLimit('methodology', 1500, "Metodología", _EXPRESSION_FIELD_MESSAGE),
+    FieldLimit(
+        'past_projects_summary', 180, "Proyectos anteriores",
+        "La sección de proyectos anteriores no debe exceder {max} palabras ({count} detectadas).",
+    ),
+])
+
+_PROPOSAL_FIELD_MESSAGE = "{label}: Máximo {max} palabras. Tienes {count}."
+
+PROPOSAL_LIMITS = WordLimitSet('proposal', [
+    FieldLimit(field, max_words, label, _PROPOSAL_FIELD_MESSAGE)
+    for field, max_words, label in (
+        ('principal_research_experience', 250, "Experiencia en investigación del Investigador/a Principal"),
+        ('summary', 250, "Resumen"),
+        ('context_problem_justification', 400, "Contexto, problema y justificación"),
+        ('specific_objectives', 200, "Objetivos específicos"),
+        ('methodology_analytical_plan_ethics', 1500, "Metodología, planeamiento analítico y aspectos éticos"),
+        ('equity_inclusion', 250, "Equidad, género, interseccionalidad e inclusión"),
+        ('communication_strategy', 100, "Estrategia de comunicación"),
+        ('risk_analysis_mitigation', 200, "Riesgos y plan de mitigación"),
+        ('community_description', 150, "Descripción de la Comunidad"),
+    )
+])
+
+WORD_LIMIT_SETS = {s.name: s for s in (EXPRESSION_LIMITS, PROPOSAL_LIMITS)}
@@ -9,6 +9,7 @@ from .models import (
     EvaluationResponse,
 )
 from core.admin import CreatedByAdminMixin
+from common.keyset import CappedCountPaginator
 
 
 class TemplateItemOptionInline(admin.TabularInline):
@@ -183,21 +184,33 @@ class EvaluationAdmin(CreatedByAdminMixin, admin.ModelAdmin):
         'created_at',
         'template',
         'target_content_type',
+        'call',
     )
+    list_select_related = ('target_content_type', 'evaluator__person', 'evaluator__user', 'evaluator__role', 'status')
     search_fields = (
+        'project_title',
         'evaluator__username',
         'evaluator__person__first_name',
         'evaluator__person__first_last_name',
         'target_object_id',
     )
-    readonly_fields = ('created_at', 'updated_at', 'total_score', 'max_possible_score')
+    readonly_fields = (
+        'created_at', 'updated_at', 'total_score', 'max_possible_score',
+        'call', 'project_title', 'researcher',
+    )
     autocomplete_fields = ('evaluator', 'status', 'template')
     date_hierarchy = 'submission_datetime'
+    # Large table: no full COUNT(*) per changelist page
+    paginator = CappedCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         (None, {
             'fields': ('target_content_type', 'target_object_id', 'evaluator', 'status', 'template')
         }),
+        ('Objetivo', {
+            'fields': ('call', 'project_title', 'researcher')
+        }),
         ('Resultados', {
             'fields': ('total_score', 'max_possible_score')
         }),
@@ -213,14 +226,16 @@ class EvaluationAdmin(CreatedByAdminMixin, admin.ModelAdmin):
         }),
     )
 
-    ordering = ['-submission_datetime']
+    ordering = ['-submission_datetime', '-id']
 
     def target_display(self, obj):
         """Custom column showing Expression or Proposal title."""
+        if obj.project_title:
+            return obj.project_title
         if obj.target_content_type.model == "expression":
-            return getattr(obj.target, "project_title", f"Expresión {obj.target_object_id}")
+            return f"Expresión {obj.target_object_id}"
         elif obj.target_content_type.model == "proposal":
-            return getattr(obj.target, "title", f"Propuesta {obj.target_object_id}")
+            return f"Propuesta {obj.target_object_id}"
         return f"Objetivo {obj.target_object_id}"
     target_display.short_description = "Objetivo"
 
@@ -242,6 +257,8 @@ class EvaluationResponseAdmin(admin.ModelAdmin):
     )
     autocomplete_fields = ('evaluation', 'item')
     readonly_fields = ('created_at', 'updated_at')
+    paginator = CappedCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         (None, {
@@ -264,7 +281,7 @@ class EvaluationResponseAdmin(admin.ModelAdmin):
             'evaluation__evaluator'
         )
 
-    ordering = ['-created_at']
+    ordering = ['-created_at', '-id']
    
 
 # from django.contrib import admin
@@ -0,0 +1,250 @@
+"""
+Analisis de puntajes por convocatoria y plantilla.
+
+`analyze_scores()` carga todas las respuestas de las evaluaciones completadas
+en arreglos de NumPy y calcula de forma vectorizada:
+
+    - media y desviacion de cada evaluador sobre (puntaje / maximo del item),
+      y con ellas el puntaje normalizado (z) de cada evaluacion, para comparar
+      evaluadores severos y benevolos;
+    - media y varianza de cada item;
+    - acuerdo entre evaluadores sobre el puntaje de cada evaluacion (total /
+      maximo): ICC(1) y alfa de Krippendorff (metrica de intervalo), con los
+      objetivos que tienen dos o mas evaluaciones;
+    - desacuerdo alto: objetivos cuyas evaluaciones difieren en mas de
+      `DISAGREEMENT_GAP`.
+
+`store_analysis()` guarda el resultado en ScoreAnalysis y sus tablas hijas,
+que es lo que ve el coordinador. No cambia ninguna decision de aprobacion.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+from django.db import transaction
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from common.status_registry import statuses
+
+from .models import (
+    Evaluation,
+    EvaluationResponse,
+    EvaluationScoreStats,
+    EvaluatorScoreStats,
+    ItemScoreStats,
+    ScoreAnalysis,
+    TemplateItem,
+)
+
+# Targets whose evaluation ratios (total / max) differ by more than this are flagged
+DISAGREEMENT_GAP = 0.25
+
+
+@dataclass
+class ScoreArrays:
+    """One row per response."""
+    evaluation: np.ndarray
+    evaluator: np.ndarray
+    target: np.ndarray
+    item: np.ndarray
+    score: np.ndarray
+
+
+def load_scores(call_id, template_id):
+    """Responses of the completed evaluations of a call and template, as arrays."""
+    rows = EvaluationResponse.objects.filter(
+        evaluation__call_id=call_id,
+        evaluation__template_id=template_id,
+        evaluation__status_id=statuses.id('Completada'),
+    ).values_list(
+        'evaluation_id',
+        'evaluation__evaluator_id',
+        'evaluation__target_content_type_id',
+        'evaluation__target_object_id',
+        'item_id',
+        Cast('score', FloatField()),
+    )
+    data = np.array(list(rows), dtype=np.float64).reshape(-1, 6)
+    ids = data[:, :5].astype(np.int64)
+    return ScoreArrays(
+        evaluation=ids[:, 0],
+        evaluator=ids[:, 1],
+        # Expressions and proposals share pks: key targets on (content type, id)
+        target=(ids[:, 2] << 32) | ids[:, 3],
+        item=ids[:, 4],
+        score=data[:, 5],
+    )
+
+
+def _group_stats(index, values, size):
+    """Count, mean and population variance of `values` grouped by `index`."""
+    count = np.bincount(index, minlength=size).astype(np.float64)
+    total = np.bincount(index, weights=values, minlength=size)
+    squares = np.bincount(index, weights=values * values, minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, total / count, 0.0)
+        variance = np.where(count > 0, squares / count - mean * mean, 0.0)
+    return count, mean, np.maximum(variance, 0.0)
+
+
+def icc1(group, values):
+    """One-way random-effects ICC(1) for unbalanced groups (None if undefined)."""
+    groups, index = np.unique(group, return_inverse=True)
+    n_groups, n = len(groups), len(values)
+    if n_groups < 2 or n <= n_groups:
+        return None
+    count, mean, _ = _group_stats(index, values, n_groups)
+    grand_mean = values.mean()
+    ms_between = (count * (mean - grand_mean) ** 2).sum() / (n_groups - 1)
+    ms_within = ((values - mean[index]) ** 2).sum() / (n - n_groups)
+    k0 = (n - (count * count).sum() / n) / (n_groups - 1)
+    denominator = ms_between + (k0 - 1) * ms_within
+    if denominator == 0:
+        return None
+    return float((ms_between - ms_within) / denominator)
+
+
+def krippendorff_alpha(group, values):
+    """Krippendorff's alpha, interval metric, one value per rater and unit (None if undefined)."""
+    groups, index = np.unique(group, return_inverse=True)
+    count, _, _ = _group_stats(index, values, len(groups))
+    pairable = count[index] >= 2
+    values, index = values[pairable], index[pairable]
+    n = len(values)
+    if n < 2:
+        return None
+    sums = np.bincount(index, weights=values, minlength=len(groups))
+    squares = np.bincount(index, weights=values * values, minlength=len(groups))
+    # Sum over ordered pairs inside each unit of (v_i - v_j)^2 = 2 (m * sum(v^2) - sum(v)^2)
+    within = 2 * (count * squares - sums * sums)
+    used = count >= 2
+    observed = (within[used] / (count[used] - 1)).sum() / n
+    expected = 2 * (n * (values * values).sum() - values.sum() ** 2) / (n * (n - 1))
+    if expected == 0:
+        return None
+    return float(1 - observed / expected)
+
+
+@dataclass
+class AnalysisResult:
+    n_responses: int
+    evaluators: list  # [(evaluator_id, n_responses, mean, std)]
+    items: list  # [(item_id, n_responses, mean, variance)]
+    evaluations: list  # [(evaluation_id, ratio, normalized_score, disagreement)]
+    n_targets: int
+    icc: float
+    krippendorff_alpha: float
+
+
+def analyze_scores(arrays, item_max_scores):
+    """All statistics of one call / template. `item_max_scores` is {item_id: max_score}."""
+    items, item_index = np.unique(arrays.item, return_inverse=True)
+    evaluators, evaluator_index = np.unique(arrays.evaluator, return_inverse=True)
+    evaluations, evaluation_first, evaluation_index = np.unique(
+        arrays.evaluation, return_index=True, return_inverse=True
+    )
+
+    max_score = np.array([float(item_max_scores.get(i, 0) or 0) for i in items])[item_index]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fraction = np.where(max_score > 0, arrays.score / max_score, 0.0)
+
+    # Evaluator bias: mean / std of the fraction of the item max each evaluator gives
+    evaluator_count, evaluator_mean, evaluator_var = _group_stats(evaluator_index, fraction, len(evaluators))
+    evaluator_std = np.sqrt(evaluator_var)
+    std = evaluator_std[evaluator_index]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.where(std > 0, (fraction - evaluator_mean[evaluator_index]) / std, 0.0)
+
+    item_count, item_mean, item_var = _group_stats(item_index, arrays.score, len(items))
+
+    n_evaluations = len(evaluations)
+    _, normalized, _ = _group_stats(evaluation_index, z, n_evaluations)
+    scored = np.bincount(evaluation_index, weights=arrays.score, minlength=n_evaluations)
+    possible = np.bincount(evaluation_index, weights=max_score, minlength=n_evaluations)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = np.where(possible > 0, scored / possible, 0.0)
+
+    # Disagreement: spread of the evaluation ratios of each target
+    evaluation_target = arrays.target[evaluation_first]
+    targets, target_index = np.unique(evaluation_target, return_inverse=True)
+    high = np.full(len(targets), -np.inf)
+    low = np.full(len(targets), np.inf)
+    np.maximum.at(high, target_index, ratio)
+    np.minimum.at(low, target_index, ratio)
+    disagreement = (high - low)[target_index] > DISAGREEMENT_GAP
+    # Agreement only over targets with two or more evaluations
+    rated = np.bincount(target_index)[target_index] >= 2
+
+    return AnalysisResult(
+        n_responses=len(arrays.score),
+        evaluators=list(zip(
+            evaluators.tolist(), evaluator_count.astype(int).tolist(),
+            evaluator_mean.tolist(), evaluator_std.tolist(),
+        )),
+        items=list(zip(
+            items.tolist(), item_count.astype(int).tolist(), item_mean.tolist(), item_var.tolist(),
+        )),
+        evaluations=list(zip(
+            evaluations.tolist(), ratio.tolist(), normalized.tolist(), disagreement.tolist(),
+        )),
+        n_targets=len(targets),
+        icc=icc1(evaluation_target[rated], ratio[rated]),
+        krippendorff_alpha=krippendorff_alpha(evaluation_target, ratio),
+    )
+
+
+def store_analysis(call_id, template_id):
+    """Recompute and replace the stored ScoreAnalysis of a call and template."""
+    arrays = load_scores(call_id, template_id)
+    item_max_scores = dict(
+        TemplateItem.objects.filter(subcategory__category__template_id=template_id)
+        .values_list('pk', 'max_score')
+    )
+    result = analyze_scores(arrays, item_max_scores) if len(arrays.score) else None
+
+    with transaction.atomic():
+        analysis, _ = ScoreAnalysis.objects.update_or_create(
+            call_id=call_id,
+            template_id=template_id,
+            defaults={
+                'n_responses': result.n_responses if result else 0,
+                'n_evaluations': len(result.evaluations) if result else 0,
+                'n_evaluators': len(result.evaluators) if result else 0,
+                'n_targets': result.n_targets if result else 0,
+                'icc': result.icc if result else None,
+                'krippendorff_alpha': result.krippendorff_alpha if result else None,
+            },
+        )
+        analysis.evaluator_stats.all().delete()
+        analysis.item_stats.all().delete()
+        analysis.evaluation_stats.all().delete()
+        if result:
+            EvaluatorScoreStats.objects.bulk_create([
+                EvaluatorScoreStats(analysis=analysis, evaluator_id=pk, n_responses=n, mean=mean, std=std)
+                for pk, n, mean, std in result.evaluators
+            ], batch_size=1000)
+            ItemScoreStats.objects.bulk_create([
+                ItemScoreStats(analysis=analysis, item_id=pk, n_responses=n, mean=mean, variance=variance)
+                for pk, n, mean, variance in result.items
+            ], batch_size=1000)
+            # An evaluation belongs to one template, so to one analysis
+            EvaluationScoreStats.objects.filter(
+                evaluation_id__in=[row[0] for row in result.evaluations]
+            ).delete()
+            EvaluationScoreStats.objects.bulk_create([
+                EvaluationScoreStats(
+                    analysis=analysis, evaluation_id=pk, ratio=ratio,
+                    normalized_score=normalized, disagreement=flag,
+                )
+                for pk, ratio, normalized, flag in result.evaluations
+            ], batch_size=1000)
+    return analysis
+
+
+def store_call_analyses(call_id):
+    """store_analysis() for every template used by the call's evaluations."""
+    template_ids = (
+        Evaluation.objects.filter(call_id=call_id)
+        .values_list('template_id', flat=True).distinct().order_by('template_id')
+    )
+    return [store_analysis(call_id, template_id) for template_id in template_ids]
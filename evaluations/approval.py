@@ -0,0 +1,252 @@
+"""
+Aprobacion automatica de expresiones y propuestas.
+
+Una expresion (o propuesta) se aprueba cuando tiene al menos
+`Call.required_evaluations` evaluaciones completadas y positivas; una
+evaluacion es positiva si alcanza `Call.approval_threshold` del puntaje
+maximo. Al aprobar:
+
+    - todas sus evaluaciones quedan validadas;
+    - la expresion pasa a 'Aprobada' (la propuesta a 'Aprobada para
+      Financiamiento');
+    - cada expresion aprobada abre su propuesta en borrador, asignada a los
+      mismos evaluadores.
+
+Concurrencia:
+    La decision se toma con la fila de la expresion bloqueada
+    (`select_for_update`; una Propuesta comparte pk con su Expresion), y una
+    sola consulta agregada cuenta las evaluaciones positivas. Django usa READ
+    COMMITTED en MySQL, asi que quien espera el bloqueo ve la evaluacion que
+    el otro acaba de confirmar. `submit_evaluation` toma el mismo bloqueo
+    antes de escribir, de modo que todos bloquean en el mismo orden.
+    Repetir la aprobacion no hace nada: los objetivos ya aprobados se omiten.
+
+`approve_targets()` trabaja sobre un conjunto de objetivos; `sweep_call()` lo
+usa para revisar de una vez todos los objetivos pendientes de una
+convocatoria (dias de cierre, comando `approve_evaluated_targets`).
+"""
+from collections import Counter
+from dataclasses import dataclass
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from calls.models import Call
+from common import counters
+from common.status_registry import statuses
+from expressions.models import Expression
+from proposals.models import Proposal
+
+from .models import POSITIVE_SCORE_RATIO, Evaluation
+
+DEFAULT_REQUIRED_EVALUATIONS = 2
+
+# Status a target gets when approved, and statuses that mean "already approved"
+APPROVED_STATUS = {
+    'expression': 'Aprobada',
+    'proposal': 'Aprobada para Financiamiento',
+}
+DONE_STATUSES = {
+    'expression': ('Aprobada', 'Aprobada para Financiamiento'),
+    'proposal': ('Aprobada para Financiamiento',),
+}
+TARGET_MODELS = {'expression': Expression, 'proposal': Proposal}
+
+# Targets locked per transaction by sweep_call()
+SWEEP_BATCH_SIZE = 200
+
+
+@dataclass(frozen=True)
+class ApprovalRules:
+    threshold: object = POSITIVE_SCORE_RATIO
+    required_evaluations: int = DEFAULT_REQUIRED_EVALUATIONS
+
+
+def rules_for_calls(call_ids):
+    """{call_id: ApprovalRules} (one query). Unknown calls get the defaults."""
+    rules = {
+        row['pk']: ApprovalRules(row['approval_threshold'], row['required_evaluations'])
+        for row in Call.objects.filter(pk__in=set(call_ids) - {None}).values(
+            'pk', 'approval_threshold', 'required_evaluations'
+        )
+    }
+    return {call_id: rules.get(call_id, ApprovalRules()) for call_id in call_ids}
+
+
+def rules_for_call(call_id):
+    return rules_for_calls([call_id])[call_id]
+
+
+def lock_targets(target_ids):
+    """
+    Lock the Expression rows of `target_ids` (also the parent row of a
+    Proposal) until the current transaction ends. Returns {pk: call_id}.
+    """
+    return dict(
+        Expression.objects.select_for_update()
+        .filter(pk__in=target_ids)
+        .order_by('pk')
+        .values_list('pk', 'call_id')
+    )
+
+
+def approve_targets(target_type, target_ids):
+    """
+    Approve every target in `target_ids` that has enough positive evaluations.
+    Returns the ids approved by this call (already-approved targets are skipped).
+    """
+    content_type = ContentType.objects.get_for_model(TARGET_MODELS[target_type])
+    with transaction.atomic():
+        locked = lock_targets(target_ids)
+        pending = Expression.objects.filter(pk__in=locked).exclude(
+            status_id__in=statuses.ids(*DONE_STATUSES[target_type])
+        )
+        if target_type == 'proposal':
+            pending = pending.filter(proposal__isnull=False)
+        # {pk: current status}, for the counter deltas below
+        pending = dict(pending.values_list('pk', 'status_id'))
+        if not pending:
+            return []
+
+        positives = dict(
+            Evaluation.objects.filter(
+                target_content_type=content_type,
+                target_object_id__in=pending,
+            ).values('target_object_id').annotate(
+                positive=Count('pk', filter=Q(status_id=statuses.id('Completada'), is_positive=True))
+            ).values_list('target_object_id', 'positive')
+        )
+        rules = rules_for_calls({locked[pk] for pk in pending})
+        approved = sorted(
+            pk for pk in pending
+            if positives.get(pk, 0) >= rules[locked[pk]].required_evaluations
+        )
+        if not approved:
+            return []
+
+        Evaluation.objects.filter(
+            target_content_type=content_type,
+            target_object_id__in=approved,
+        ).update(is_validated=True)
+
+        approved_status = statuses.get(APPROVED_STATUS[target_type])
+        # The UPDATEs below send no signals: move exactly these rows in the counters
+        deltas = Counter()
+        for pk in approved:
+            deltas[counters.key(counters.EXPRESSIONS, locked[pk], pending[pk])] -= 1
+            deltas[counters.key(counters.EXPRESSIONS, locked[pk], approved_status.pk)] += 1
+        Expression.objects.filter(pk__in=approved).update(
+            status=approved_status, updated_at=timezone.now()
+        )
+        if target_type == 'proposal':
+            for pk, status_id in Proposal.objects.filter(pk__in=approved).values_list('pk', 'proposal_status_id'):
+                deltas[counters.key(counters.PROPOSALS, locked[pk], status_id)] -= 1
+                deltas[counters.key(counters.PROPOSALS, locked[pk], approved_status.pk)] += 1
+            Proposal.objects.filter(pk__in=approved).update(proposal_status=approved_status)
+        counters.apply_deltas(deltas)
+        if target_type == 'expression':
+            open_proposals(approved)
+    return approved
+
+
+def approve_if_ready(target_id, target_type):
+    """Approve one target if it qualifies. True if it was approved now."""
+    return bool(approve_targets(target_type, [target_id]))
+
+
+def open_proposals(expression_ids):
+    """
+    Create the draft Proposal of each approved expression that has none yet and
+    assign it to the evaluators of the expression (same template).
+    """
+    existing = set(Proposal.objects.filter(pk__in=expression_ids).values_list('pk', flat=True))
+    expressions = list(Expression.objects.filter(pk__in=expression_ids).exclude(pk__in=existing))
+    if not expressions:
+        return []
+
+    draft_status = statuses.get('Borrador')
+    for expression in expressions:
+        data = expression.__dict__.copy()
+        data.pop("id", None)
+        data.pop("_state", None)
+        Proposal(
+            expression_ptr=expression,
+            **data,
+            principal_research_experience="",
+            community_description="",
+            duration_months=12,
+            summary="",
+            context_problem_justification="",
+            methodology_analytical_plan_ethics="",
+            equity_inclusion="",
+            communication_strategy="",
+            risk_analysis_mitigation="",
+            proposal_status=draft_status,
+        ).save()
+
+    # Same evaluators, and the template of the first expression evaluation
+    assignments = {}
+    templates = {}
+    for target_id, evaluator_id, template_id in Evaluation.objects.filter(
+        target_content_type=ContentType.objects.get_for_model(Expression),
+        target_object_id__in=[e.pk for e in expressions],
+    ).order_by('pk').values_list('target_object_id', 'evaluator_id', 'template_id'):
+        templates.setdefault(target_id, template_id)
+        assignments.setdefault(target_id, []).append(evaluator_id)
+
+    proposal_type = ContentType.objects.get_for_model(Proposal)
+    pending_status = statuses.get('Pendiente')
+    # The proposals are new, so none of these pairs exists yet
+    evaluations = [
+        Evaluation(
+            target_content_type=proposal_type,
+            target_object_id=expression.pk,
+            evaluator_id=evaluator_id,
+            status=pending_status,
+            template_id=templates[expression.pk],
+            created_by_id=expression.created_by_id,
+            expression_id=expression.pk,
+            call_id=expression.call_id,
+            project_title=expression.project_title,
+            researcher_id=expression.user_id,
+        )
+        for expression in expressions
+        for evaluator_id in assignments.get(expression.pk, [])
+    ]
+    Evaluation.objects.bulk_create(evaluations, ignore_conflicts=True)
+    # bulk_create sends no signals (the Proposal saves above do)
+    counters.apply_deltas(Counter(
+        counters.key(counters.PROPOSAL_EVALUATIONS, evaluation.call_id, pending_status.pk)
+        for evaluation in evaluations
+    ))
+    return [e.pk for e in expressions]
+
+
+def sweep_call(call_id, target_type='expression', batch_size=SWEEP_BATCH_SIZE):
+    """
+    Approve every pending target of `call_id` that qualifies. One grouped query
+    finds the candidates; each batch is then decided under its own lock.
+    Returns the approved ids.
+    """
+    rules = rules_for_call(call_id)
+    content_type = ContentType.objects.get_for_model(TARGET_MODELS[target_type])
+    candidates = list(
+        Evaluation.objects.filter(
+            call_id=call_id,
+            target_content_type=content_type,
+            status_id=statuses.id('Completada'),
+            is_positive=True,
+        ).exclude(
+            expression__status_id__in=statuses.ids(*DONE_STATUSES[target_type])
+        ).values('target_object_id').annotate(
+            positive=Count('pk')
+        ).filter(
+            positive__gte=rules.required_evaluations
+        ).order_by('target_object_id').values_list('target_object_id', flat=True)
+    )
+    approved = []
+    for start in range(0, len(candidates), batch_size):
+        approved += approve_targets(target_type, candidates[start:start + batch_size])
+    return approved
@@ -0,0 +1,333 @@
+"""
+Asignacion automatica de evaluadores para una convocatoria.
+
+`assign_call()` reparte cada expresion (o propuesta) enviada de una
+convocatoria entre N evaluadores:
+
+    - equilibra la carga: cada cupo va al evaluador elegible con menos
+      evaluaciones abiertas;
+    - respeta `CustomUser.max_open_evaluations` (evaluaciones pendientes o en
+      progreso, contando las de otras convocatorias);
+    - evita conflictos de interes: el evaluador no puede ser el investigador,
+      ni formar parte del equipo, ni estar vinculado (como representante o
+      miembro de equipo) a la institucion principal, aliada o del equipo;
+    - prefiere evaluadores con antecedentes o evaluaciones previas en el eje
+      tematico del objetivo.
+
+El plan se calcula en memoria (`plan_assignments`, voraz con reparacion: se
+atienden primero los objetivos con menos evaluadores elegibles, y si a uno le
+faltan cupos se libera un evaluador moviendo una de sus asignaciones nuevas a
+otro con capacidad). Cargar los datos cuesta un numero fijo de consultas y
+todas las evaluaciones se escriben con un solo INSERT.
+"""
+import heapq
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, Q
+
+from accounts.models import CustomUser
+from calls.models import Call
+from common import counters
+from common.status_registry import statuses
+from expressions.models import Expression
+from institutions.models import Institution
+from project_team.models import (
+    ExpressionInvestigatorThematicAntecedent,
+    ExpressionTeamMember,
+    ProposalInvestigatorThematicAntecedent,
+    ProposalTeamMember,
+)
+from proposals.models import Proposal
+
+from .models import Evaluation, EvaluationTemplate
+
+# How many evaluations of load a thematic-axis match is worth
+THEMATIC_FIT_WEIGHT = 2
+
+TARGET_MODELS = {'expression': Expression, 'proposal': Proposal}
+
+
+@dataclass
+class Candidate:
+    """An evaluator as seen by the planner."""
+    id: int
+    person_id: int = None
+    capacity: int = None  # max open evaluations, None = no limit
+    load: int = 0  # open evaluations before this run
+    institutions: set = field(default_factory=set)
+    axes: set = field(default_factory=set)
+
+
+@dataclass
+class Target:
+    """An expression or proposal waiting for evaluators."""
+    id: int
+    researcher_id: int = None
+    project_title: str = ''
+    thematic_axis_id: int = None
+    persons: set = field(default_factory=set)
+    institutions: set = field(default_factory=set)
+    assigned: set = field(default_factory=set)  # evaluators it already has
+    wanted: int = None  # evaluators it should end up with, overrides per_target
+
+
+@dataclass
+class AssignmentPlan:
+    pairs: list  # [(target_id, evaluator_id)] to create
+    short: dict  # {target_id: evaluators still missing}
+
+
+def has_conflict(candidate, target):
+    return (
+        candidate.id == target.researcher_id
+        or candidate.person_id in target.persons
+        or not candidate.institutions.isdisjoint(target.institutions)
+    )
+
+
+def plan_assignments(targets, candidates, per_target):
+    """Pick evaluators so every target reaches `per_target`. No queries."""
+    targets_by_id = {t.id: t for t in targets}
+    load = {c.id: c.load for c in candidates}
+    spare = {c.id: None if c.capacity is None else c.capacity - c.load for c in candidates}
+    eligible = {
+        t.id: [c for c in candidates if c.id not in t.assigned and not has_conflict(c, t)]
+        for t in targets
+    }
+    eligible_ids = {t_id: {c.id for c in pool} for t_id, pool in eligible.items()}
+    new = defaultdict(set)  # target id -> evaluators added by this plan
+    owned = defaultdict(list)  # evaluator id -> targets added by this plan
+
+    def has_room(c_id):
+        return spare[c_id] is None or spare[c_id] > 0
+
+    def cost(c, t):
+        return load[c.id] - (THEMATIC_FIT_WEIGHT if t.thematic_axis_id in c.axes else 0), c.id
+
+    def take(t_id, c_id):
+        new[t_id].add(c_id)
+        owned[c_id].append(t_id)
+        load[c_id] += 1
+        if spare[c_id] is not None:
+            spare[c_id] -= 1
+
+    def release(t_id, c_id):
+        new[t_id].discard(c_id)
+        owned[c_id].remove(t_id)
+        load[c_id] -= 1
+        if spare[c_id] is not None:
+            spare[c_id] += 1
+
+    def repair(t):
+        """
+        Free an eligible evaluator of `t` that is out of capacity by handing one
+        of its new assignments to an evaluator that still has room.
+        """
+        with_room = [c for c in candidates if has_room(c.id)]
+        if not with_room:
+            return False
+        for busy in eligible[t.id]:
+            if busy.id in new[t.id] or has_room(busy.id):
+                continue
+            for other_id in owned[busy.id]:
+                other = targets_by_id[other_id]
+                spares = [
+                    c for c in with_room
+                    if c.id in eligible_ids[other_id] and c.id not in new[other_id]
+                ]
+                if spares:
+                    replacement = min(spares, key=lambda c: cost(c, other))
+                    release(other_id, busy.id)
+                    take(other_id, replacement.id)
+                    take(t.id, busy.id)
+                    return True
+        return False
+
+    short = {}
+    # Most constrained targets first
+    for t in sorted(targets, key=lambda t: (len(eligible[t.id]), t.id)):
+        need = (t.wanted or per_target) - len(t.assigned)
+        if need <= 0:
+            continue
+        pool = [c for c in eligible[t.id] if has_room(c.id)]
+        for c in heapq.nsmallest(need, pool, key=lambda c: cost(c, t)):
+            take(t.id, c.id)
+        missing = need - len(new[t.id])
+        while missing and repair(t):
+            missing -= 1
+        if missing:
+            short[t.id] = missing
+
+    pairs = [(t.id, c_id) for t in targets for c_id in sorted(new[t.id])]
+    return AssignmentPlan(pairs=pairs, short=short)
+
+
+def load_targets(call_id, target_type, ids=None):
+    """
+    Submitted targets of the call (only `ids`, if given) with their people and
+    institutions ({id: Target}).
+    """
+    if target_type == 'proposal':
+        queryset = Proposal.objects.filter(call_id=call_id, proposal_status_id=statuses.id('Enviada'))
+    else:
+        queryset = Expression.objects.filter(call_id=call_id, status_id=statuses.id('Enviada'))
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    if target_type == 'proposal':
+        team = ProposalTeamMember.objects.filter(proposal__in=queryset).values_list(
+            'proposal_id', 'person_id', 'institution_id'
+        )
+    else:
+        team = ExpressionTeamMember.objects.filter(expression__in=queryset).values_list(
+            'expression_id', 'person_id', 'institution_id'
+        )
+
+    targets = {}
+    for pk, user_id, person_id, institution_id, axis_id, title in queryset.values_list(
+        'pk', 'user_id', 'user__person_id', 'primary_institution_id', 'thematic_axis_id', 'project_title'
+    ):
+        targets[pk] = Target(
+            id=pk,
+            researcher_id=user_id,
+            project_title=title,
+            thematic_axis_id=axis_id,
+            persons={person_id} - {None},
+            institutions={institution_id} - {None},
+        )
+    if not targets:
+        return targets
+
+    for target_id, person_id, institution_id in team:
+        targets[target_id].persons.add(person_id)
+        if institution_id:
+            targets[target_id].institutions.add(institution_id)
+    if target_type == 'proposal':
+        for target_id, institution_id in Proposal.partner_institutions.through.objects.filter(
+            proposal_id__in=targets
+        ).values_list('proposal_id', 'institution_id'):
+            targets[target_id].institutions.add(institution_id)
+
+    content_type = ContentType.objects.get_for_model(TARGET_MODELS[target_type])
+    for target_id, evaluator_id in Evaluation.objects.filter(
+        target_content_type=content_type, target_object_id__in=targets
+    ).values_list('target_object_id', 'evaluator_id'):
+        targets[target_id].assigned.add(evaluator_id)
+    return targets
+
+
+def load_candidates():
+    """Active evaluators with their workload, affiliations and thematic axes."""
+    candidates = {
+        pk: Candidate(id=pk, person_id=person_id, capacity=capacity)
+        for pk, person_id, capacity in CustomUser.objects.filter(
+            role__name='Evaluator', role__is_active=True
+        ).values_list('pk', 'person_id', 'max_open_evaluations')
+    }
+    if not candidates:
+        return candidates
+
+    for evaluator_id, open_count in Evaluation.objects.filter(
+        evaluator_id__in=candidates,
+        status_id__in=statuses.ids('Pendiente', 'En Progreso'),
+    ).values('evaluator_id').annotate(n=Count('pk')).values_list('evaluator_id', 'n'):
+        candidates[evaluator_id].load = open_count
+
+    by_person = defaultdict(list)
+    for c in candidates.values():
+        if c.person_id:
+            by_person[c.person_id].append(c)
+
+    affiliations = []
+    for pk, legal_id, admin_id in Institution.objects.filter(
+        Q(legal_representative_id__in=by_person) | Q(administrative_representative_id__in=by_person)
+    ).values_list('pk', 'legal_representative_id', 'administrative_representative_id'):
+        affiliations += [(legal_id, pk), (admin_id, pk)]
+    for model in (ExpressionTeamMember, ProposalTeamMember):
+        affiliations += model.objects.filter(
+            person_id__in=by_person, institution__isnull=False
+        ).values_list('person_id', 'institution_id').distinct()
+    for person_id, institution_id in affiliations:
+        for c in by_person.get(person_id, ()):
+            c.institutions.add(institution_id)
+
+    axes = []
+    for model in (ExpressionInvestigatorThematicAntecedent, ProposalInvestigatorThematicAntecedent):
+        axes += model.objects.filter(
+            team_member__person_id__in=by_person
+        ).values_list('team_member__person_id', 'thematic_axis_id').distinct()
+    for person_id, axis_id in axes:
+        for c in by_person.get(person_id, ()):
+            c.axes.add(axis_id)
+    for evaluator_id, axis_id in Evaluation.objects.filter(
+        evaluator_id__in=candidates,
+        status_id=statuses.id('Completada'),
+        expression__thematic_axis__isnull=False,
+    ).values_list('evaluator_id', 'expression__thematic_axis_id').distinct():
+        candidates[evaluator_id].axes.add(axis_id)
+    return candidates
+
+
+def default_template(call_id, target_type):
+    """First template of the call that applies to `target_type`, or None."""
+    applies = {'applies_to_proposal' if target_type == 'proposal' else 'applies_to_expression': True}
+    return EvaluationTemplate.objects.filter(calls=call_id, **applies).order_by('pk').first()
+
+
+def assign_call(call_id, target_type, per_target, template=None, created_by=None, dry_run=False):
+    """
+    Assign evaluators to every submitted target of the call and create the
+    pending evaluations in one INSERT. Returns the AssignmentPlan.
+    Raises ValueError if the call has no template for `target_type`.
+    """
+    template = template or default_template(call_id, target_type)
+    if template is None:
+        raise ValueError("La convocatoria no tiene una plantilla de evaluación para este tipo de objetivo.")
+
+    with transaction.atomic():
+        # One run per call at a time
+        Call.objects.select_for_update().filter(pk=call_id).first()
+        targets = load_targets(call_id, target_type)
+        plan = plan_assignments(list(targets.values()), list(load_candidates().values()), per_target)
+        if dry_run or not plan.pairs:
+            return plan
+
+        create_evaluations(plan.pairs, targets, target_type, call_id, {t: template for t in targets}, created_by)
+    return plan
+
+
+def create_evaluations(pairs, targets, target_type, call_id, templates, created_by=None):
+    """
+    Insert a pending Evaluation per (target id, evaluator id) pair with one
+    INSERT. `targets` is {id: Target}, `templates` is {target id: template}.
+    Pairs that already have an evaluation are skipped.
+    """
+    content_type = ContentType.objects.get_for_model(TARGET_MODELS[target_type])
+    pending_status = statuses.get('Pendiente')
+    existing = set(Evaluation.objects.filter(
+        target_content_type=content_type,
+        target_object_id__in={target_id for target_id, _ in pairs},
+    ).values_list('target_object_id', 'evaluator_id'))
+    pairs = [pair for pair in pairs if pair not in existing]
+    Evaluation.objects.bulk_create([
+        Evaluation(
+            target_content_type=content_type,
+            target_object_id=target_id,
+            evaluator_id=evaluator_id,
+            status=pending_status,
+            template=templates[target_id],
+            max_possible_score=templates[target_id].total_max_score,
+            created_by=created_by,
+            # Denormalized target fields (bulk_create skips save())
+            expression_id=target_id,
+            call_id=call_id,
+            project_title=targets[target_id].project_title,
+            researcher_id=targets[target_id].researcher_id,
+        )
+        for target_id, evaluator_id in pairs
+    ], batch_size=1000, ignore_conflicts=True)
+    # bulk_create sends no signals: add the new rows to the counters
+    kind = counters.EVALUATION_KINDS[target_type]
+    counters.apply_deltas({counters.key(kind, call_id, pending_status.pk): len(pairs)})
@@ -0,0 +1,223 @@
+"""
+Plantillas de evaluacion compiladas y cacheadas por id.
+
+El formulario del evaluador, la pagina de detalle de la plantilla y el envio
+de evaluaciones (`scoring`) necesitan el mismo arbol:
+
+    plantilla -> categorias -> subcategorias -> items -> opciones
+
+ya ordenado, con el puntaje maximo de cada item y el total. Las plantillas casi
+nunca cambian, asi que el arbol se arma una vez (cuatro consultas) como datos
+simples inmutables y se guarda en el cache de Django.
+
+Consistencia:
+    Cada plantilla tiene una marca de version en el cache. Los cambios sobre
+    la plantilla, sus categorias, subcategorias, items u opciones la cambian al
+    hacer commit (ver evaluations/signals.py). El arbol se guarda bajo su
+    version, asi que una version vieja nunca se vuelve a leer; ademas cada
+    worker guarda en memoria el ultimo arbol de cada plantilla y solo consulta
+    la marca antes de usarlo.
+
+Uso:
+    from evaluations.compiled_templates import compiled_templates
+
+    compiled = compiled_templates.get(template_id)
+    compiled.categories       # arbol ordenado para las paginas
+    compiled.items            # items en orden de formulario
+    compiled.total_max_score
+"""
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+from uuid import uuid4
+
+from django.core.cache import cache
+
+from core.choices import FIELD_TYPE_CHOICES
+
+from .models import EvaluationTemplate, TemplateCategory, TemplateItem, TemplateItemOption, TemplateSubcategory
+
+# Bump when the compiled classes change so older pickles are not read back
+FORMAT_VERSION = 1
+CACHE_KEY_PREFIX = f'climas:evaluation_template:f{FORMAT_VERSION}'
+# Old versions are never read again; let them expire
+CACHE_TIMEOUT = 60 * 60 * 24
+
+FIELD_TYPE_LABELS = dict(FIELD_TYPE_CHOICES)
+
+
+@dataclass(frozen=True)
+class CompiledOption:
+    id: int
+    display_text: str
+    score: Decimal
+
+
+@dataclass(frozen=True)
+class CompiledItem:
+    id: int
+    subcategory_id: int
+    question: str
+    field_type: str
+    source_model: str
+    max_score: Decimal
+    order: int
+    options: tuple
+
+    def get_field_type_display(self):
+        return FIELD_TYPE_LABELS.get(self.field_type, self.field_type)
+
+    def option(self, option_id):
+        """The option with `option_id`, or None."""
+        return next((opt for opt in self.options if opt.id == option_id), None)
+
+
+@dataclass(frozen=True)
+class CompiledSubcategory:
+    id: int
+    name: str
+    order: int
+    items: tuple
+
+
+@dataclass(frozen=True)
+class CompiledCategory:
+    id: int
+    name: str
+    order: int
+    subcategories: tuple
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    id: int
+    name: str
+    description: str
+    version: str
+    categories: tuple
+    total_max_score: Decimal
+
+    @property
+    def items(self):
+        """Every item in form order (category, subcategory, item)."""
+        return tuple(
+            item
+            for category in self.categories
+            for subcategory in category.subcategories
+            for item in subcategory.items
+        )
+
+
+def compile_template(template_id, version=''):
+    """Build the CompiledTemplate of `template_id` (four queries), or None if it does not exist."""
+    template = EvaluationTemplate.objects.filter(pk=template_id).values('name', 'description').first()
+    if template is None:
+        return None
+
+    options = defaultdict(list)
+    for row in TemplateItemOption.objects.filter(
+        item__subcategory__category__template_id=template_id
+    ).order_by('item_id', 'id').values('id', 'item_id', 'display_text', 'score'):
+        options[row['item_id']].append(
+            CompiledOption(id=row['id'], display_text=row['display_text'], score=row['score'])
+        )
+
+    items = defaultdict(list)
+    for row in TemplateItem.objects.filter(
+        subcategory__category__template_id=template_id
+    ).order_by('order', 'id').values(
+        'id', 'subcategory_id', 'question', 'field_type', 'source_model', 'max_score', 'order'
+    ):
+        items[row['subcategory_id']].append(CompiledItem(options=tuple(options[row['id']]), **row))
+
+    subcategories = defaultdict(list)
+    for row in TemplateSubcategory.objects.filter(
+        category__template_id=template_id
+    ).order_by('order', 'id').values('id', 'category_id', 'name', 'order'):
+        subcategories[row['category_id']].append(CompiledSubcategory(
+            id=row['id'], name=row['name'], order=row['order'], items=tuple(items[row['id']]),
+        ))
+
+    categories = tuple(
+        CompiledCategory(
+            id=row['id'], name=row['name'], order=row['order'], subcategories=tuple(subcategories[row['id']]),
+        )
+        for row in TemplateCategory.objects.filter(
+            template_id=template_id
+        ).order_by('order', 'id').values('id', 'name', 'order')
+    )
+
+    return CompiledTemplate(
+        id=template_id,
+        name=template['name'],
+        description=template['description'],
+        version=version,
+        categories=categories,
+        total_max_score=sum(
+            (item.max_score for subcategory_items in items.values() for item in subcategory_items),
+            Decimal('0'),
+        ),
+    )
+
+
+class CompiledTemplates:
+    """
+    Cache de plantillas compiladas: en memoria del proceso y en el cache de
+    Django, invalidado por version de cada plantilla. El diccionario local se
+    reemplaza entero en cada escritura (los hilos del worker lo comparten).
+    """
+
+    def __init__(self):
+        self._local = {}
+        self._lock = threading.Lock()
+
+    def _store(self, template_id, compiled):
+        with self._lock:
+            local = dict(self._local)
+            if compiled is None:
+                local.pop(template_id, None)
+            else:
+                local[template_id] = compiled
+            self._local = local
+
+    def _version_key(self, template_id):
+        return f'{CACHE_KEY_PREFIX}:{template_id}:version'
+
+    def _tree_key(self, template_id, version):
+        return f'{CACHE_KEY_PREFIX}:{template_id}:{version}'
+
+    def _shared_version(self, template_id):
+        key = self._version_key(template_id)
+        version = cache.get(key)
+        if version is None:
+            # First worker to get here seeds the stamp; the rest read it back.
+            cache.add(key, uuid4().hex, None)
+            version = cache.get(key)
+        return version
+
+    def get(self, template_id):
+        """The CompiledTemplate of `template_id`, or None if the template does not exist."""
+        version = self._shared_version(template_id)
+        compiled = self._local.get(template_id)
+        if compiled is not None and compiled.version == version:
+            return compiled
+
+        key = self._tree_key(template_id, version)
+        compiled = cache.get(key)
+        if compiled is None:
+            compiled = compile_template(template_id, version)
+            if compiled is None:
+                return None
+            cache.set(key, compiled, CACHE_TIMEOUT)
+        self._store(template_id, compiled)
+        return compiled
+
+    def invalidate(self, template_ids):
+        """Publish a new version of each template so every worker recompiles it."""
+        for template_id in template_ids:
+            cache.set(self._version_key(template_id), uuid4().hex, None)
+            self._store(template_id, None)
+
+
+compiled_templates = CompiledTemplates()
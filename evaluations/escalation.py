@@ -0,0 +1,152 @@
+"""
+Escalamiento a un evaluador adicional cuando las evaluaciones no coinciden.
+
+Un objetivo (expresion o propuesta) esta en disputa cuando todas sus
+evaluaciones estan completadas, son al menos dos, y segun las reglas de su
+convocatoria:
+
+    - hay evaluaciones positivas y negativas (`Call.escalate_on_split`), o
+    - sus puntajes (total / maximo) difieren mas que
+      `Call.escalation_score_gap`;
+
+y todavia no llega a `Call.max_evaluations` evaluadores. Entonces se le asigna
+un evaluador mas, elegido como en la asignacion automatica (el de menor carga,
+sin conflictos de interes, ver evaluations/assignment.py), con la misma
+plantilla.
+
+`submit_evaluation()` revisa el objetivo despues de cada envio con una sola
+consulta agregada y con la fila del objetivo bloqueada, asi que dos envios
+simultaneos no asignan dos evaluadores extra. `escalate_call()` (comando
+`escalate_evaluations`) revisa una convocatoria completa despues de cargas
+masivas.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, FloatField, Max, Min, Q
+from django.db.models.functions import Cast
+
+from calls.models import Call
+from common.status_registry import statuses
+
+from .approval import DONE_STATUSES, SWEEP_BATCH_SIZE, lock_targets
+from .assignment import TARGET_MODELS, create_evaluations, load_candidates, load_targets, plan_assignments
+from .models import Evaluation, EvaluationTemplate
+
+
+@dataclass(frozen=True)
+class EscalationRules:
+    score_gap: object = Decimal('0.25')  # None = no gap rule
+    on_split: bool = True
+    max_evaluations: int = 3
+
+
+def rules_for_calls(call_ids):
+    """{call_id: EscalationRules} (one query). Unknown calls get the defaults."""
+    rules = {
+        row['pk']: EscalationRules(row['escalation_score_gap'], row['escalate_on_split'], row['max_evaluations'])
+        for row in Call.objects.filter(pk__in=set(call_ids) - {None}).values(
+            'pk', 'escalation_score_gap', 'escalate_on_split', 'max_evaluations'
+        )
+    }
+    return {call_id: rules.get(call_id, EscalationRules()) for call_id in call_ids}
+
+
+def _spread(evaluations):
+    """Per target: call, evaluation counts and min / max score ratio (one grouped query)."""
+    completed_id = statuses.id('Completada')
+    completed = Q(status_id=completed_id, total_score__isnull=False, max_possible_score__gt=0)
+    ratio = Cast('total_score', FloatField()) / Cast('max_possible_score', FloatField())
+    return evaluations.values('target_object_id').annotate(
+        call_id=Max('call_id'),
+        assigned=Count('pk'),
+        open=Count('pk', filter=~Q(status_id=completed_id)),
+        completed=Count('pk', filter=completed),
+        positive=Count('pk', filter=completed & Q(is_positive=True)),
+        low=Min(ratio, filter=completed),
+        high=Max(ratio, filter=completed),
+    ).order_by()
+
+
+def is_disputed(row, rules):
+    if row['open'] or row['completed'] < 2 or row['assigned'] >= rules.max_evaluations:
+        return False
+    split = rules.on_split and 0 < row['positive'] < row['completed']
+    gap = rules.score_gap is not None and row['high'] - row['low'] > float(rules.score_gap)
+    return split or gap
+
+
+def disputed_targets(target_type, evaluations):
+    """{target_id: call_id} of the disputed, not yet approved targets among `evaluations`."""
+    rows = list(_spread(
+        evaluations.filter(
+            target_content_type=ContentType.objects.get_for_model(TARGET_MODELS[target_type])
+        ).exclude(
+            expression__status_id__in=statuses.ids(*DONE_STATUSES[target_type])
+        )
+    ))
+    rules = rules_for_calls({row['call_id'] for row in rows})
+    return {
+        row['target_object_id']: row['call_id']
+        for row in rows
+        if row['call_id'] is not None and is_disputed(row, rules[row['call_id']])
+    }
+
+
+def escalate_targets(target_type, target_ids, created_by=None):
+    """
+    Assign one more evaluator to every disputed target in `target_ids`.
+    Returns the (target_id, evaluator_id) pairs created.
+    """
+    with transaction.atomic():
+        lock_targets(target_ids)
+        disputed = disputed_targets(target_type, Evaluation.objects.filter(target_object_id__in=target_ids))
+        if not disputed:
+            return []
+
+        # The extra evaluator uses the template of the target's first evaluation
+        first_template = {}
+        for target_id, template_id in Evaluation.objects.filter(
+            target_content_type=ContentType.objects.get_for_model(TARGET_MODELS[target_type]),
+            target_object_id__in=disputed,
+        ).order_by('pk').values_list('target_object_id', 'template_id'):
+            first_template.setdefault(target_id, template_id)
+        template_objects = EvaluationTemplate.objects.in_bulk(set(first_template.values()))
+        templates = {target_id: template_objects[pk] for target_id, pk in first_template.items()}
+
+        by_call = defaultdict(list)
+        for target_id, call_id in disputed.items():
+            by_call[call_id].append(target_id)
+
+        candidates = load_candidates()
+        created = []
+        for call_id, ids in sorted(by_call.items()):
+            targets = load_targets(call_id, target_type, ids)
+            for target in targets.values():
+                target.wanted = len(target.assigned) + 1
+            plan = plan_assignments(list(targets.values()), list(candidates.values()), per_target=0)
+            create_evaluations(plan.pairs, targets, target_type, call_id, templates, created_by)
+            for _, evaluator_id in plan.pairs:
+                candidates[evaluator_id].load += 1
+            created += plan.pairs
+    return created
+
+
+def escalate_if_needed(target_id, target_type):
+    """Escalate one target if its evaluations disagree. True if an evaluator was added."""
+    return bool(escalate_targets(target_type, [target_id]))
+
+
+def escalate_call(call_id, target_type='expression', batch_size=SWEEP_BATCH_SIZE):
+    """
+    Escalate every disputed target of a call. One grouped query finds them;
+    each batch is then re-checked under its own lock. Returns the pairs created.
+    """
+    target_ids = sorted(disputed_targets(target_type, Evaluation.objects.filter(call_id=call_id)))
+    created = []
+    for start in range(0, len(target_ids), batch_size):
+        created += escalate_targets(target_type, target_ids[start:start + batch_size])
+    return created
@@ -0,0 +1,193 @@
+"""
+Exportacion de evaluaciones y puntajes de una convocatoria (CSV o XLSX).
+
+Dos niveles:
+    - `evaluations`: una fila por evaluacion (objetivo, convocatoria,
+      evaluador, plantilla, estado, puntaje total y normalizado...);
+    - `responses`: una fila por respuesta (EvaluationResponse) con el item,
+      su puntaje, el maximo del item, el puntaje normalizado y el comentario.
+
+Las filas se leen por lotes de llave primaria (`pk > ultima`) en lugar de
+`QuerySet.iterator()`: con MySQL el driver trae todo el resultado a memoria
+antes de entregar la primera fila. Los nombres (evaluadores, investigadores,
+plantillas, estados, items) se resuelven una vez por lote con una consulta
+por tabla, solo para los ids que aun no se vieron.
+
+El archivo se genera mientras se envia (common/streaming.py), asi que la
+memoria no crece con el numero de filas. El comando `export_evaluations`
+escribe el mismo archivo a disco para exportaciones muy grandes.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from calls.models import Call
+from common.models import Status
+from common.streaming import csv_stream, xlsx_stream
+from expressions.models import Expression
+from proposals.models import Proposal
+
+from .models import Evaluation, EvaluationResponse, EvaluationTemplate, TemplateItem
+
+EXPORT_BATCH_SIZE = 2000
+RESPONSES_PER_EVALUATION = 20
+
+LEVELS = ('evaluations', 'responses')
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+EVALUATION_HEADER = (
+    'ID evaluación', 'Tipo', 'ID objetivo', 'Proyecto', 'ID convocatoria', 'Convocatoria',
+    'Investigador', 'Evaluador', 'Correo evaluador', 'Plantilla', 'Estado',
+    'Puntaje total', 'Puntaje máximo', 'Puntaje normalizado', 'Positiva', 'Validada',
+    'Fecha de envío', 'Notas del coordinador',
+)
+
+RESPONSE_HEADER = (
+    'ID evaluación', 'Tipo', 'ID objetivo', 'Proyecto', 'Convocatoria', 'Evaluador',
+    'ID ítem', 'Ítem', 'Puntaje', 'Puntaje máximo del ítem', 'Puntaje normalizado', 'Comentario',
+)
+
+
+class _Labels:
+    """id -> label, loaded with one query per batch for the ids not seen yet."""
+
+    def __init__(self, load):
+        self._load = load
+        self._labels = {}
+
+    def resolve(self, ids):
+        missing = {pk for pk in ids if pk is not None and pk not in self._labels}
+        if missing:
+            self._labels.update(self._load(missing))
+            # Deleted rows: do not ask again
+            self._labels.update((pk, '') for pk in missing if pk not in self._labels)
+
+    def __getitem__(self, pk):
+        return self._labels.get(pk, '')
+
+
+def _people(ids):
+    return {
+        pk: (f'{first} {last}' if first else username, email or '')
+        for pk, first, last, username, email in CustomUser.objects.filter(pk__in=ids).values_list(
+            'pk', 'person__first_name', 'person__first_last_name', 'user__username', 'user__email'
+        )
+    }
+
+
+def _names(model, field):
+    def load(ids):
+        return dict(model.objects.filter(pk__in=ids).values_list('pk', field))
+    return load
+
+
+def _items(ids):
+    return {
+        pk: (question, max_score)
+        for pk, question, max_score in TemplateItem.objects.filter(pk__in=ids).values_list(
+            'pk', 'question', 'max_score'
+        )
+    }
+
+
+def _target_labels():
+    return {
+        ContentType.objects.get_for_model(Expression).id: 'Expresión',
+        ContentType.objects.get_for_model(Proposal).id: 'Propuesta',
+    }
+
+
+def _batches(queryset, fields, batch_size):
+    """Rows of `queryset` as value tuples (pk first), `batch_size` at a time in pk order."""
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', *fields)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1][0]
+
+
+def _ratio(score, maximum):
+    if score is None or not maximum:
+        return None
+    return round(float(score) / float(maximum), 4)
+
+
+def _datetime(value):
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M') if value else ''
+
+
+def evaluation_rows(call_id, batch_size=EXPORT_BATCH_SIZE):
+    """One row per evaluation of `call_id` (see EVALUATION_HEADER)."""
+    targets = _target_labels()
+    people = _Labels(_people)
+    templates = _Labels(_names(EvaluationTemplate, 'name'))
+    status_names = _Labels(_names(Status, 'name'))
+    call_title = Call.objects.filter(pk=call_id).values_list('title', flat=True).first() or ''
+    fields = (
+        'target_content_type_id', 'target_object_id', 'project_title', 'researcher_id', 'evaluator_id',
+        'template_id', 'status_id', 'total_score', 'max_possible_score', 'is_positive', 'is_validated',
+        'submission_datetime', 'coordinator_notes',
+    )
+    for batch in _batches(Evaluation.objects.filter(call_id=call_id), fields, batch_size):
+        people.resolve(pk for row in batch for pk in (row[4], row[5]))
+        templates.resolve(row[6] for row in batch)
+        status_names.resolve(row[7] for row in batch)
+        for (pk, content_type_id, target_id, title, researcher_id, evaluator_id, template_id, status_id,
+             total, maximum, positive, validated, submitted, notes) in batch:
+            evaluator_name, evaluator_email = people[evaluator_id] or ('', '')
+            yield (
+                pk, targets.get(content_type_id, ''), target_id, title, call_id, call_title,
+                (people[researcher_id] or ('',))[0], evaluator_name, evaluator_email,
+                templates[template_id], status_names[status_id],
+                total, maximum, _ratio(total, maximum), positive, validated,
+                _datetime(submitted), notes,
+            )
+
+
+def response_rows(call_id, batch_size=EXPORT_BATCH_SIZE):
+    """One row per EvaluationResponse of the evaluations of `call_id` (see RESPONSE_HEADER)."""
+    targets = _target_labels()
+    people = _Labels(_people)
+    items = _Labels(_items)
+    call_title = Call.objects.filter(pk=call_id).values_list('title', flat=True).first() or ''
+    fields = ('target_content_type_id', 'target_object_id', 'project_title', 'evaluator_id')
+    # Walk the call's evaluations (indexed by call) and read their responses;
+    # a template has a few dozen items, so keep about `batch_size` responses per batch
+    evaluation_batch = max(batch_size // RESPONSES_PER_EVALUATION, 1)
+    for evaluations in _batches(Evaluation.objects.filter(call_id=call_id), fields, evaluation_batch):
+        people.resolve(row[4] for row in evaluations)
+        by_id = {row[0]: row for row in evaluations}
+        responses = list(
+            EvaluationResponse.objects.filter(evaluation_id__in=by_id).order_by('evaluation_id', 'pk').values_list(
+                'evaluation_id', 'item_id', 'score', 'comment'
+            )
+        )
+        items.resolve(row[1] for row in responses)
+        for evaluation_id, item_id, score, comment in responses:
+            _, content_type_id, target_id, title, evaluator_id = by_id[evaluation_id]
+            question, item_max = items[item_id] or ('', None)
+            yield (
+                evaluation_id, targets.get(content_type_id, ''), target_id, title, call_title,
+                (people[evaluator_id] or ('',))[0], item_id, question,
+                score, item_max, _ratio(score, item_max), comment,
+            )
+
+
+def export_stream(call_id, level='evaluations', file_format='csv', batch_size=EXPORT_BATCH_SIZE):
+    """Generator of the export file chunks (str for CSV, bytes for XLSX)."""
+    if level == 'responses':
+        header, rows, sheet = RESPONSE_HEADER, response_rows(call_id, batch_size), 'Respuestas'
+    else:
+        header, rows, sheet = EVALUATION_HEADER, evaluation_rows(call_id, batch_size), 'Evaluaciones'
+    if file_format == 'xlsx':
+        return xlsx_stream(sheet, header, rows)
+    return csv_stream(header, rows)
+
+
+def export_filename(call_id, level, file_format):
+    return f'convocatoria_{call_id}_{level}_{timezone.localdate():%Y%m%d}.{file_format}'
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from calls.models import Call
+from evaluations.assignment import TARGET_MODELS, assign_call
+
+
+class Command(BaseCommand):
+    help = "Assign evaluators to every submitted expression/proposal of a call (balanced, without conflicts of interest)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--call', type=int, required=True, help="Call id")
+        parser.add_argument('--type', choices=sorted(TARGET_MODELS), default='expression')
+        parser.add_argument('--per-target', type=int, help="Evaluators per target (default: the call's required_evaluations)")
+        parser.add_argument('--dry-run', action='store_true', help="Plan only, create nothing")
+
+    def handle(self, *args, **options):
+        call = Call.objects.filter(pk=options['call']).first()
+        if call is None:
+            raise CommandError(f"Call {options['call']} does not exist.")
+        per_target = options['per_target'] or call.required_evaluations
+        try:
+            plan = assign_call(call.pk, options['type'], per_target, dry_run=options['dry_run'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        verb = "would be created" if options['dry_run'] else "created"
+        self.stdout.write(self.style.SUCCESS(f"{len(plan.pairs)} evaluations {verb}."))
+        if plan.short:
+            self.stdout.write(self.style.WARNING(
+                f"{len(plan.short)} {options['type']}s are short of evaluators: "
+                + ", ".join(f"{pk} (-{n})" for pk, n in sorted(plan.short.items()))
+            ))
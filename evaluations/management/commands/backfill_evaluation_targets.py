@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+from evaluations.models import Evaluation
+from expressions.models import Expression
+
+
+class Command(BaseCommand):
+    help = "Fill Evaluation.expression / call / project_title / researcher from each evaluation's target (safe to repeat)"
+
+    def handle(self, *args, **options):
+        target = Expression.objects.filter(pk=OuterRef('target_object_id'))
+        updated = Evaluation.objects.update(
+            expression_id=Subquery(target.values('pk')[:1]),
+            call_id=Subquery(target.values('call_id')[:1]),
+            # Evaluations whose target no longer exists get an empty title
+            project_title=Coalesce(
+                Subquery(target.values('project_title')[:1]), Value(''), output_field=TextField()
+            ),
+            researcher_id=Subquery(target.values('user_id')[:1]),
+        )
+        self.stdout.write(self.style.SUCCESS(f"{updated} evaluations updated."))
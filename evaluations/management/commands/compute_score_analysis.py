@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from calls.models import Call
+from evaluations.analytics import store_call_analyses
+
+
+class Command(BaseCommand):
+    help = "Recompute the score analysis (evaluator bias, item statistics, inter-rater agreement) of one or all calls"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--call', type=int, help="Call id (default: every call)")
+
+    def handle(self, *args, **options):
+        calls = Call.objects.order_by('pk')
+        if options['call']:
+            calls = calls.filter(pk=options['call'])
+            if not calls.exists():
+                raise CommandError(f"Call {options['call']} does not exist.")
+        for call_id in calls.values_list('pk', flat=True):
+            analyses = store_call_analyses(call_id)
+            self.stdout.write(f"Call {call_id}: {len(analyses)} template(s) analysed.")
+        self.stdout.write(self.style.SUCCESS("Done."))
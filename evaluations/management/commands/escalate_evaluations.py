@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from calls.models import Call
+from evaluations.escalation import TARGET_MODELS, escalate_call
+
+
+class Command(BaseCommand):
+    help = "Assign an extra evaluator to every target of a call whose evaluations disagree (safe to repeat)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--call', type=int, required=True, help="Call id")
+        parser.add_argument('--type', choices=sorted(TARGET_MODELS), default='expression')
+
+    def handle(self, *args, **options):
+        if not Call.objects.filter(pk=options['call']).exists():
+            raise CommandError(f"Call {options['call']} does not exist.")
+        created = escalate_call(options['call'], options['type'])
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} {options['type']}s escalated."))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from calls.models import Call
+from evaluations.export import EXPORT_BATCH_SIZE, FORMATS, LEVELS, export_filename, export_stream
+
+
+class Command(BaseCommand):
+    help = "Export the evaluations (or item responses) of a call to a CSV or XLSX file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--call', type=int, required=True, help="Call id")
+        parser.add_argument('--level', choices=LEVELS, default='evaluations')
+        parser.add_argument('--format', dest='file_format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', help="File path (default: convocatoria_<id>_<level>_<date>.<format>)")
+        parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        call_id, level, file_format = options['call'], options['level'], options['file_format']
+        if not Call.objects.filter(pk=call_id).exists():
+            raise CommandError(f"Call {call_id} does not exist.")
+        path = options['output'] or export_filename(call_id, level, file_format)
+        size = 0
+        with open(path, 'wb') as output:
+            for chunk in export_stream(call_id, level, file_format, options['batch_size']):
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                output.write(chunk)
+                size += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"{path} written ({size} bytes)."))
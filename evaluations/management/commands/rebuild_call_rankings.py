@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from evaluations.ranking import rebuild_rankings
+
+
+class Command(BaseCommand):
+    help = "Rebuild the CallRanking table from the completed evaluations (safe to repeat)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--call', type=int, help="Call id (default: every call)")
+
+    def handle(self, *args, **options):
+        rows = rebuild_rankings(options['call'])
+        self.stdout.write(self.style.SUCCESS(f"{rows} ranking rows rebuilt."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from evaluations.models import EvaluationTemplate
+
+
+class Command(BaseCommand):
+    help = "Store each template's total max score and recompute max_possible_score / is_positive of its evaluations"
+
+    def handle(self, *args, **options):
+        for template in EvaluationTemplate.objects.order_by('pk'):
+            with transaction.atomic():
+                updated = template.update_evaluations()
+            self.stdout.write(
+                f"{template.name}: total {template.total_max_score}, {updated} evaluations updated."
+            )
+        self.stdout.write(self.style.SUCCESS("Done."))
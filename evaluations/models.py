@@ -5,10 +5,24 @@ from core.choices import FIELD_TYPE_CHOICES, SOURCE_MODEL_CHOICES
 from expressions.models import Expression
 from accounts.models import CustomUser
 from common.models import Status
+from common.reference_data import reference_data
 from calls.models import Call
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Case, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from common.status_registry import statuses
 from decimal import Decimal
 
+# An evaluation is positive when total_score >= max_possible_score * ratio.
+# Default for calls without their own Call.approval_threshold.
+POSITIVE_SCORE_RATIO = Decimal("0.7")
+
+# Evaluation columns copied from its target (see Evaluation.sync_target_fields)
+TARGET_FIELDS = ('expression', 'call', 'project_title', 'researcher')
+
 class EvaluationTemplate(TimestampMixin, CreatedByMixin, models.Model):
     name = models.CharField(
         max_length=100,
@@ -43,6 +57,15 @@ class EvaluationTemplate(TimestampMixin, CreatedByMixin, models.Model):
         verbose_name="Convocatorias Aplicables"
     )
 
+    # Sum of every item's max_score, kept up to date by update_evaluations()
+    total_max_score = models.DecimalField(
+        max_digits=7,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        verbose_name="Puntuación Máxima Total"
+    )
+
     class Meta:
         db_table = 'evaluation_template'
         verbose_name = "Plantilla de Evaluacion"
@@ -52,37 +75,52 @@ class EvaluationTemplate(TimestampMixin, CreatedByMixin, models.Model):
     def __str__(self):
         return self.name
     
-    def get_total_max_score(self):
+    def calculate_total_max_score(self):
         """Calculate the sum of max_score from all items."""
         return self.categories.aggregate(
             total=models.Sum('subcategories__items__max_score')
-        )['total'] or 0
+        )['total'] or Decimal("0")
+
+    def get_total_max_score(self):
+        """Stored sum of max_score from all items."""
+        return self.total_max_score
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
         # Recalculate max_possible_score for all evaluations using this template
-        self.update_evaluations()
+        # (once, when the surrounding transaction commits)
+        from .signals import schedule_template_recompute
+        schedule_template_recompute(self.pk)
 
     def update_evaluations(self):
-        """Recalculate max_possible_score and re-evaluate is_positive for all related evaluations."""
-        new_total = self.get_total_max_score()
-
-        # If there are no items, set to 0
-        if new_total is None:
-            new_total = 0
-
-        # Grab all evaluations tied to this template
-        evaluations = Evaluation.objects.filter(template=self).select_related("status")
-
-        for evaluation in evaluations:
-            evaluation.max_possible_score = new_total
-
-            # Only recalc is_positive if evaluation is completed and has a score
-            if evaluation.status.name == "Completada" and evaluation.total_score is not None:
-                ratio = Decimal(str(evaluation.total_score)) / Decimal(str(new_total)) if new_total > 0 else Decimal("0")
-                evaluation.is_positive = ratio >= Decimal("0.7")
-
-            evaluation.save(update_fields=["max_possible_score", "is_positive"])
+        """
+        Store the new total and recalculate max_possible_score / is_positive for
+        all related evaluations with one UPDATE.
+        """
+        new_total = self.calculate_total_max_score()
+        self.total_max_score = new_total
+        EvaluationTemplate.objects.filter(pk=self.pk).update(total_max_score=new_total)
+
+        # is_positive only changes for completed evaluations that have a score
+        keep = ~Q(status_id=statuses.id("Completada")) | Q(total_score__isnull=True)
+        whens = [When(keep, then=F("is_positive"))]
+        if new_total > 0:
+            # Threshold of the evaluation's call (Call.approval_threshold)
+            threshold = Coalesce(
+                Subquery(Call.objects.filter(pk=OuterRef("call_id")).values("approval_threshold")[:1]),
+                Value(POSITIVE_SCORE_RATIO),
+                output_field=models.DecimalField(),
+            )
+            whens.append(When(total_score__gte=Value(new_total) * threshold, then=Value(True)))
+
+        updated = Evaluation.objects.filter(template=self).update(
+            max_possible_score=new_total,
+            is_positive=Case(*whens, default=Value(False), output_field=models.BooleanField()),
+        )
+        # Normalized scores changed: move the targets in their call rankings
+        from .ranking import refresh_template_rankings
+        refresh_template_rankings(self.pk)
+        return updated
             
     # def update_evaluations(self):
     #     """Update all Evaluation objects using this template with new max_possible_score."""
@@ -228,8 +266,11 @@ class TemplateItem(TimestampMixin, models.Model):
             try:
                 app_label, model_name = self.source_model.split('.')
                 model = apps.get_model(app_label, model_name)
+                rows = reference_data.for_model_path(self.source_model)
                 for field in ['name', 'title', 'code', 'label', 'description']:
                     if hasattr(model, field):
+                        if rows is not None:
+                            return [(obj.pk, getattr(obj, field)) for obj in rows]
                         return list(model.objects.values_list('id', field))
                 return [(obj.pk, str(obj)) for obj in model.objects.all()[:50]]
             except Exception:
@@ -241,10 +282,13 @@ class TemplateItem(TimestampMixin, models.Model):
             try:
                 app_label, model_name = self.source_model.split('.')
                 model = apps.get_model(app_label, model_name)
+                rows = reference_data.for_model_path(self.source_model)
                 
                 # Try common field names
                 for field in ['name', 'title', 'code', 'label', 'description']:
                     if hasattr(model, field):
+                        if rows is not None:
+                            return [getattr(obj, field) for obj in rows]
                         return list(model.objects.values_list(field, flat=True))
                 
                 # Fallback to str representation
@@ -287,6 +331,35 @@ class TemplateItemOption(TimestampMixin, models.Model):
     def __str__(self):
         return f"{self.display_text}: {self.score}"
 
+# Relations joined when loading evaluation targets in bulk (see EvaluationQuerySet)
+TARGET_SELECT_RELATED = ('user__person', 'user__user', 'call', 'status')
+
+
+def target_prefetch():
+    """
+    GenericPrefetch for `Evaluation.target`: one query per target type
+    (Expression, Proposal), each with TARGET_SELECT_RELATED joined.
+    """
+    Proposal = apps.get_model('proposals', 'Proposal')
+    return GenericPrefetch('target', [
+        Expression.objects.select_related(*TARGET_SELECT_RELATED),
+        Proposal.objects.select_related(*TARGET_SELECT_RELATED, 'proposal_status'),
+    ])
+
+
+class EvaluationQuerySet(models.QuerySet):
+
+    def with_targets(self):
+        """
+        Load each evaluation's target in bulk instead of one GenericForeignKey
+        lookup per row: `Evaluation.objects.filter(...).with_targets()`.
+
+        Only for code that reads `evaluation.target`; list pages and exports
+        use the copied call / project_title / researcher columns instead.
+        """
+        return self.prefetch_related(target_prefetch())
+
+
 class Evaluation(TimestampMixin, CreatedByMixin, models.Model):
     """
     Evaluación realizada por un evaluador.
@@ -304,6 +377,44 @@ class Evaluation(TimestampMixin, CreatedByMixin, models.Model):
     target_object_id = models.PositiveIntegerField(verbose_name="ID del Objetivo")
     target = GenericForeignKey('target_content_type', 'target_object_id')
 
+    # Copied from the target so lists can join instead of resolving `target`
+    # per row. A Proposal shares its pk with its Expression, so `expression`
+    # is the same row for both target types. Filled by save() and kept in sync
+    # by evaluations.signals when the target is saved.
+    expression = models.ForeignKey(
+        'expressions.Expression',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='target_evaluations',
+        verbose_name="Expresión"
+    )
+    call = models.ForeignKey(
+        'calls.Call',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='evaluations',
+        verbose_name="Convocatoria"
+    )
+    project_title = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name="Título del Proyecto"
+    )
+    researcher = models.ForeignKey(
+        'accounts.CustomUser',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='received_evaluations',
+        verbose_name="Investigador"
+    )
+
     evaluator = models.ForeignKey(
         'accounts.CustomUser',
         on_delete=models.PROTECT,
@@ -356,20 +467,48 @@ class Evaluation(TimestampMixin, CreatedByMixin, models.Model):
         verbose_name="Notas del coordinador"
     )
 
+    objects = EvaluationQuerySet.as_manager()
+
     class Meta:
         unique_together = ('target_content_type', 'target_object_id', 'evaluator')
         db_table = 'evaluation'
         verbose_name = "Evaluación"
         verbose_name_plural = "Evaluaciones"
         ordering = ['-submission_datetime']
+        # Keyset pagination orderings (see common/keyset.py)
+        indexes = [
+            models.Index(fields=['submission_datetime', 'id'], name='evaluation_submitted_idx'),
+            models.Index(fields=['created_at', 'id'], name='evaluation_created_idx'),
+            models.Index(fields=['evaluator', 'created_at', 'id'], name='evaluation_evaluator_idx'),
+        ]
 
     def __str__(self):
-        if self.target_content_type.model == "expression":
-            return f"Evaluación de la expresión '{self.target.project_title}' por {self.evaluator}"
-        elif self.target_content_type.model == "proposal":
-            return f"Evaluación de la propuesta '{self.target.title}' por {self.evaluator}"
+        kind = ContentType.objects.get_for_id(self.target_content_type_id).model
+        if kind == "expression":
+            return f"Evaluación de la expresión '{self.project_title}' por {self.evaluator}"
+        elif kind == "proposal":
+            return f"Evaluación de la propuesta '{self.project_title}' por {self.evaluator}"
         return f"Evaluación (sin objetivo) por {self.evaluator}"
-    
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'target_object_id' in update_fields:
+            if self.expression_id != self.target_object_id:
+                self.sync_target_fields()
+                if update_fields is not None:
+                    kwargs['update_fields'] = set(update_fields) | set(TARGET_FIELDS)
+        super().save(*args, **kwargs)
+
+    def sync_target_fields(self):
+        """Copy call, title and researcher from the target (one query)."""
+        row = Expression.objects.filter(pk=self.target_object_id).values(
+            'pk', 'call_id', 'project_title', 'user_id'
+        ).first() or {}
+        self.expression_id = row.get('pk')
+        self.call_id = row.get('call_id')
+        self.project_title = row.get('project_title') or ''
+        self.researcher_id = row.get('user_id')
+
     @property
     def target_object(self):
         """Helper to get the actual Expression or Proposal object."""
@@ -382,20 +521,10 @@ class Evaluation(TimestampMixin, CreatedByMixin, models.Model):
     #     model_class = content_type.model_class()
     #     return model_class._default_manager.get(pk=self.target_object_id)
 
-    @property
-    def project_title(self):
-        """Shortcut to access project_title regardless of target type."""
-        return getattr(self.target, 'project_title', None)
-
-    @property
-    def call(self):
-        """Shortcut to access call via target."""
-        return getattr(self.target, 'call', None)
-
     @property
     def user(self):
-        """Shortcut to access user via target."""
-        return getattr(self.target, 'user', None)
+        """Researcher who submitted the target."""
+        return self.researcher
 
 class EvaluationResponse(models.Model):
     """
@@ -434,10 +563,193 @@ class EvaluationResponse(models.Model):
         unique_together = ('evaluation', 'item')
         verbose_name = "Respuesta de Evaluación"
         verbose_name_plural = "Respuestas de Evaluación"
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='evaluation_resp_created_idx'),
+        ]
 
     def __str__(self):
         return f"Respuesta: {self.score} por {self.evaluator}"
 
+
+class ReviewSnapshot(models.Model):
+    """
+    Copia congelada de una Expresión o Propuesta tal como fue enviada.
+    Los evaluadores ven esta copia (ver evaluations/review_bundle.py).
+    """
+    target_content_type = models.ForeignKey(
+        'contenttypes.ContentType',
+        on_delete=models.CASCADE,
+        verbose_name="Tipo de Objetivo"
+    )
+    target_object_id = models.PositiveIntegerField(verbose_name="ID del Objetivo")
+    target = GenericForeignKey('target_content_type', 'target_object_id')
+
+    data = models.JSONField(encoder=DjangoJSONEncoder, verbose_name="Contenido")
+    submitted_at = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Envío")
+    captured_at = models.DateTimeField(auto_now=True, verbose_name="Capturado")
+
+    class Meta:
+        unique_together = ('target_content_type', 'target_object_id')
+        db_table = 'review_snapshot'
+        verbose_name = "Copia para Revisión"
+        verbose_name_plural = "Copias para Revisión"
+
+    def __str__(self):
+        return f"Copia de {self.target_content_type.model} #{self.target_object_id}"
+
+
+class CallRanking(models.Model):
+    """
+    Posición de una Expresión o Propuesta dentro de su convocatoria según sus
+    evaluaciones completadas (ver evaluations/ranking.py).
+    """
+    call = models.ForeignKey(
+        Call,
+        on_delete=models.CASCADE,
+        related_name='rankings',
+        verbose_name="Convocatoria"
+    )
+    target_content_type = models.ForeignKey(
+        'contenttypes.ContentType',
+        on_delete=models.CASCADE,
+        verbose_name="Tipo de Objetivo"
+    )
+    target_object_id = models.PositiveIntegerField(verbose_name="ID del Objetivo")
+    target = GenericForeignKey('target_content_type', 'target_object_id')
+
+    project_title = models.TextField(default='', verbose_name="Título del Proyecto")
+    evaluation_count = models.PositiveIntegerField(default=0, verbose_name="Evaluaciones Completadas")
+    positive_count = models.PositiveIntegerField(default=0, verbose_name="Evaluaciones Positivas")
+    # Normalized score of an evaluation = total_score / max_possible_score
+    mean_score = models.FloatField(default=0, verbose_name="Puntaje Promedio")
+    min_score = models.FloatField(default=0, verbose_name="Puntaje Mínimo")
+    max_score = models.FloatField(default=0, verbose_name="Puntaje Máximo")
+    rank = models.PositiveIntegerField(null=True, blank=True, verbose_name="Posición")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Actualizado")
+
+    class Meta:
+        unique_together = ('target_content_type', 'target_object_id')
+        indexes = [
+            models.Index(fields=['call', 'target_content_type', 'rank'], name='call_ranking_rank_idx'),
+        ]
+        db_table = 'call_ranking'
+        verbose_name = "Ranking de Convocatoria"
+        verbose_name_plural = "Rankings de Convocatoria"
+
+    def __str__(self):
+        return f"#{self.rank} {self.project_title}"
+
+
+class ScoreAnalysis(models.Model):
+    """
+    Estadísticas de puntajes de una convocatoria y plantilla: acuerdo entre
+    evaluadores y totales. Se recalcula completa (ver evaluations/analytics.py).
+    """
+    call = models.ForeignKey(
+        Call,
+        on_delete=models.CASCADE,
+        related_name='score_analyses',
+        verbose_name="Convocatoria"
+    )
+    template = models.ForeignKey(
+        EvaluationTemplate,
+        on_delete=models.CASCADE,
+        related_name='score_analyses',
+        verbose_name="Plantilla de Evaluación"
+    )
+    n_responses = models.PositiveIntegerField(default=0, verbose_name="Respuestas")
+    n_evaluations = models.PositiveIntegerField(default=0, verbose_name="Evaluaciones")
+    n_evaluators = models.PositiveIntegerField(default=0, verbose_name="Evaluadores")
+    n_targets = models.PositiveIntegerField(default=0, verbose_name="Objetivos Evaluados")
+    # Agreement on the evaluation ratio (total / max) of targets with 2+ evaluations
+    icc = models.FloatField(null=True, blank=True, verbose_name="ICC(1)")
+    krippendorff_alpha = models.FloatField(null=True, blank=True, verbose_name="Alfa de Krippendorff")
+    computed_at = models.DateTimeField(auto_now=True, verbose_name="Calculado")
+
+    class Meta:
+        unique_together = ('call', 'template')
+        db_table = 'score_analysis'
+        verbose_name = "Análisis de Puntajes"
+        verbose_name_plural = "Análisis de Puntajes"
+
+    def __str__(self):
+        return f"Análisis {self.call_id} / {self.template_id}"
+
+
+class EvaluatorScoreStats(models.Model):
+    """Media y desviación de un evaluador (puntaje / máximo del ítem) en un análisis."""
+    analysis = models.ForeignKey(
+        ScoreAnalysis,
+        on_delete=models.CASCADE,
+        related_name='evaluator_stats',
+        verbose_name="Análisis"
+    )
+    evaluator = models.ForeignKey(
+        'accounts.CustomUser',
+        on_delete=models.CASCADE,
+        related_name='score_stats',
+        verbose_name="Evaluador"
+    )
+    n_responses = models.PositiveIntegerField(verbose_name="Respuestas")
+    mean = models.FloatField(verbose_name="Media")
+    std = models.FloatField(verbose_name="Desviación Estándar")
+
+    class Meta:
+        unique_together = ('analysis', 'evaluator')
+        db_table = 'evaluator_score_stats'
+        verbose_name = "Estadística de Evaluador"
+        verbose_name_plural = "Estadísticas de Evaluadores"
+
+
+class ItemScoreStats(models.Model):
+    """Media y varianza de los puntajes de un ítem en un análisis."""
+    analysis = models.ForeignKey(
+        ScoreAnalysis,
+        on_delete=models.CASCADE,
+        related_name='item_stats',
+        verbose_name="Análisis"
+    )
+    item = models.ForeignKey(
+        TemplateItem,
+        on_delete=models.CASCADE,
+        related_name='score_stats',
+        verbose_name="Ítem"
+    )
+    n_responses = models.PositiveIntegerField(verbose_name="Respuestas")
+    mean = models.FloatField(verbose_name="Media")
+    variance = models.FloatField(verbose_name="Varianza")
+
+    class Meta:
+        unique_together = ('analysis', 'item')
+        db_table = 'item_score_stats'
+        verbose_name = "Estadística de Ítem"
+        verbose_name_plural = "Estadísticas de Ítems"
+
+
+class EvaluationScoreStats(models.Model):
+    """Puntaje normalizado de una evaluación y si su objetivo tiene desacuerdo alto."""
+    analysis = models.ForeignKey(
+        ScoreAnalysis,
+        on_delete=models.CASCADE,
+        related_name='evaluation_stats',
+        verbose_name="Análisis"
+    )
+    evaluation = models.OneToOneField(
+        Evaluation,
+        on_delete=models.CASCADE,
+        related_name='score_stats',
+        verbose_name="Evaluación"
+    )
+    ratio = models.FloatField(verbose_name="Puntaje / Máximo")
+    # Mean z-score of the evaluation's answers against its evaluator's mean / std
+    normalized_score = models.FloatField(verbose_name="Puntaje Normalizado (z)")
+    disagreement = models.BooleanField(default=False, verbose_name="Desacuerdo Alto")
+
+    class Meta:
+        db_table = 'evaluation_score_stats'
+        verbose_name = "Estadística de Evaluación"
+        verbose_name_plural = "Estadísticas de Evaluaciones"
+
 # class Evaluation(TimestampMixin, CreatedByMixin, models.Model):
 #     """
 #     Representa la evaluacion hecha por un revisor a 
@@ -0,0 +1,189 @@
+"""
+Ranking de expresiones y propuestas por convocatoria.
+
+`CallRanking` guarda una fila por objetivo con sus evaluaciones completadas:
+cantidad, positivas y promedio / minimo / maximo del puntaje normalizado
+(total_score / max_possible_score), mas su posicion dentro de la convocatoria
+y el tipo de objetivo. Las consultas de ranking leen solo esta tabla por el
+indice (call, target_content_type, rank).
+
+Se actualiza por partes:
+
+    - al completar o borrar una evaluacion se recalcula su objetivo
+      (evaluations/signals.py, una vez por transaccion);
+    - al cambiar el puntaje maximo de una plantilla se recalculan los
+      objetivos evaluados con ella (EvaluationTemplate.update_evaluations);
+
+y despues se renumeran solo las filas de esa convocatoria cuya posicion
+cambio. `rebuild_rankings()` (comando `rebuild_call_rankings`) reconstruye
+todo desde cero.
+
+Cada actualizacion bloquea primero las filas Call de las convocatorias que
+toca (en orden de pk), asi dos refrescos de la misma convocatoria no
+renumeran a la vez: el segundo espera y lee las posiciones que dejo el
+primero (READ COMMITTED), sin rangos repetidos ni huecos.
+"""
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import connection, transaction
+from django.db.models import Avg, Count, FloatField, Max, Min, Q
+from django.db.models.functions import Cast
+
+from calls.models import Call
+from common.status_registry import statuses
+
+from .models import CallRanking, Evaluation
+
+RANKING_PAGE_SIZE = 50
+
+# Best first; ties keep a stable order
+RANK_ORDER = ('-mean_score', '-positive_count', '-evaluation_count', 'target_object_id')
+
+STAT_FIELDS = (
+    'call', 'project_title', 'evaluation_count', 'positive_count',
+    'mean_score', 'min_score', 'max_score', 'updated_at',
+)
+
+
+def _target_filter(targets):
+    """Q matching (content type id, object id) pairs, one IN per content type."""
+    by_type = defaultdict(set)
+    for content_type_id, object_id in targets:
+        by_type[content_type_id].add(object_id)
+    return reduce(or_, (
+        Q(target_content_type_id=content_type_id, target_object_id__in=ids)
+        for content_type_id, ids in by_type.items()
+    ))
+
+
+def _aggregate(evaluations):
+    """Ranking values per target of the completed `evaluations`."""
+    ratio = Cast('total_score', FloatField()) / Cast('max_possible_score', FloatField())
+    return evaluations.filter(
+        status_id=statuses.id('Completada'),
+        total_score__isnull=False,
+        max_possible_score__gt=0,
+    ).values('target_content_type_id', 'target_object_id').annotate(
+        call_id=Max('call_id'),
+        title=Max('project_title'),
+        n=Count('pk'),
+        positive=Count('pk', filter=Q(is_positive=True)),
+        mean=Avg(ratio),
+        low=Min(ratio),
+        high=Max(ratio),
+    ).order_by()
+
+
+def _ranking_rows(aggregates):
+    return [
+        CallRanking(
+            call_id=row['call_id'],
+            target_content_type_id=row['target_content_type_id'],
+            target_object_id=row['target_object_id'],
+            project_title=row['title'] or '',
+            evaluation_count=row['n'],
+            positive_count=row['positive'],
+            mean_score=row['mean'],
+            min_score=row['low'],
+            max_score=row['high'],
+        )
+        for row in aggregates
+        if row['call_id'] is not None
+    ]
+
+
+def _lock_calls(call_ids):
+    """Lock the Call rows of `call_ids` in pk order: one ranking writer per call at a time."""
+    call_ids = sorted({pk for pk in call_ids if pk is not None})
+    if call_ids:
+        list(Call.objects.select_for_update().filter(pk__in=call_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def rerank(call_id, content_type_id):
+    """
+    Renumber the rows of one call and target type; only moved rows are written.
+    Call it inside the transaction that holds the call lock (see _lock_calls).
+    """
+    # RANK_ORDER ends with the target id, so the lock order is stable
+    rows = CallRanking.objects.select_for_update().filter(
+        call_id=call_id, target_content_type_id=content_type_id
+    ).order_by(*RANK_ORDER).values_list('pk', 'rank')
+    moved = [
+        CallRanking(pk=pk, rank=position)
+        for position, (pk, rank) in enumerate(rows, start=1)
+        if rank != position
+    ]
+    CallRanking.objects.bulk_update(moved, ['rank'], batch_size=500)
+    return len(moved)
+
+
+def refresh_rankings(targets):
+    """Recompute the ranking rows of `targets` ((content type id, object id) pairs) and rerank."""
+    targets = set(targets)
+    if not targets:
+        return
+    match = _target_filter(targets)
+    with transaction.atomic():
+        _lock_calls(
+            set(CallRanking.objects.filter(match).values_list('call_id', flat=True))
+            | set(Evaluation.objects.filter(match).values_list('call_id', flat=True).distinct())
+        )
+        groups = set(CallRanking.objects.filter(match).values_list('call_id', 'target_content_type_id'))
+        rows = _ranking_rows(_aggregate(Evaluation.objects.filter(match)))
+        ranked = {(r.target_content_type_id, r.target_object_id) for r in rows}
+
+        gone = targets - ranked
+        if gone:
+            CallRanking.objects.filter(_target_filter(gone)).delete()
+        if rows:
+            # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target
+            unique_fields = (
+                ['target_content_type', 'target_object_id']
+                if connection.features.supports_update_conflicts_with_target else None
+            )
+            CallRanking.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=unique_fields, update_fields=STAT_FIELDS,
+            )
+        groups |= {(r.call_id, r.target_content_type_id) for r in rows}
+        for call_id, content_type_id in sorted(groups):
+            rerank(call_id, content_type_id)
+
+
+def refresh_template_rankings(template_id):
+    """Recompute every target evaluated with `template_id` (its max score changed)."""
+    refresh_rankings(
+        Evaluation.objects.filter(template_id=template_id)
+        .values_list('target_content_type_id', 'target_object_id').distinct()
+    )
+
+
+def rebuild_rankings(call_id=None):
+    """Rebuild the ranking of one call (or all calls) from scratch. Returns the row count."""
+    evaluations = Evaluation.objects.all()
+    existing = CallRanking.objects.all()
+    if call_id is not None:
+        evaluations = evaluations.filter(call_id=call_id)
+        existing = existing.filter(call_id=call_id)
+    with transaction.atomic():
+        _lock_calls([call_id] if call_id is not None else Call.objects.values_list('pk', flat=True))
+        existing.delete()
+        rows = _ranking_rows(_aggregate(evaluations))
+        CallRanking.objects.bulk_create(rows, batch_size=1000)
+        for group in sorted({(r.call_id, r.target_content_type_id) for r in rows}):
+            rerank(*group)
+    return len(rows)
+
+
+def ranking_page(call_id, content_type_id, page=1, page_size=RANKING_PAGE_SIZE):
+    """
+    One page of a call ranking and the total row count. Pages are rank ranges,
+    so both queries stay on the (call, target_content_type, rank) index.
+    """
+    rows = CallRanking.objects.filter(call_id=call_id, target_content_type_id=content_type_id)
+    start = (page - 1) * page_size
+    return (
+        list(rows.filter(rank__gt=start, rank__lte=start + page_size).order_by('rank')),
+        rows.count(),
+    )
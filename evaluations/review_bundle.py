@@ -0,0 +1,225 @@
+"""
+Copia de revision ("review bundle") de una Expresion o Propuesta.
+
+Cuando el investigador envia una expresion o propuesta se guarda un
+`ReviewSnapshot` con todo lo que el evaluador necesita ver: campos, productos
+con sus efectos estrategicos, equipo con antecedentes, presupuesto, respuestas
+del formulario del proponente y referencias a documentos. La pagina de
+evaluacion se dibuja desde esa unica fila, asi que:
+
+    - cuesta una consulta, sin importar cuantas filas hijas tenga el envio;
+    - el evaluador ve exactamente lo que se envio, aunque el registro cambie
+      despues.
+
+Los envios anteriores a esta tabla se capturan la primera vez que un
+evaluador los abre.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from budgets.models import BudgetItem
+from expressions.models import Expression
+from project_team.models import ExpressionTeamMember, ProposalTeamMember
+from proposals.models import Proposal
+
+from .models import ReviewSnapshot
+
+# Bump when the layout of `data` changes; older snapshots are rebuilt on read
+BUNDLE_VERSION = 1
+
+PROPOSAL_TEXT_FIELDS = (
+    'principal_research_experience',
+    'community_description',
+    'summary',
+    'context_problem_justification',
+    'methodology_analytical_plan_ethics',
+    'equity_inclusion',
+    'communication_strategy',
+    'risk_analysis_mitigation',
+)
+
+
+def _name(obj):
+    return obj.name if obj is not None else ''
+
+
+def _date(value):
+    return value.strftime('%Y-%m-%d') if value else ''
+
+
+def _document(doc):
+    if doc is None:
+        return None
+    return {
+        'id': doc.id,
+        'name': doc.name,
+        'url': doc.file.url if doc.file else '',
+    }
+
+
+def _answer(value):
+    if value in (None, ''):
+        return "No respondido"
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    return str(value).strip()
+
+
+def _load(target):
+    """Re-read `target` with everything the bundle needs in a fixed number of queries."""
+    if isinstance(target, Proposal):
+        model, team_model = Proposal, ProposalTeamMember
+        products, team, antecedents = (
+            'proposalproduct_set', 'proposal_team_members', 'proposal_thematic_antecedents'
+        )
+    else:
+        model, team_model = Expression, ExpressionTeamMember
+        products, team, antecedents = (
+            'expressionproduct_set', 'expression_team_members', 'expression_thematic_antecedents'
+        )
+
+    related = ['call', 'user__person', 'user__user', 'implementation_country']
+    prefetch = [
+        f'{products}__strategic_effects',
+        Prefetch(
+            team,
+            queryset=team_model.objects.select_related('person', 'institution').prefetch_related(
+                f'{antecedents}__thematic_axis'
+            ),
+        ),
+        'form_responses__shared_question',
+    ]
+    if model is Proposal:
+        related += ['community_country', 'project_location', 'timeline_document', 'budget_document']
+        prefetch += [
+            'specific_objectives',
+            'partner_institutions',
+            'partner_institution_commitments',
+            'budget_items__category',
+            'budget_items__period',
+        ]
+    return model.objects.select_related(*related).prefetch_related(*prefetch).get(pk=target.pk)
+
+
+def build_review_bundle(target):
+    """Serializable snapshot of an Expression or Proposal (dict of plain values)."""
+    target = _load(target)
+    is_proposal = isinstance(target, Proposal)
+
+    if is_proposal:
+        products = target.proposalproduct_set.all()
+        team = target.proposal_team_members.all()
+        antecedent_relation = 'proposal_thematic_antecedents'
+        budget_items = target.budget_items.all()
+    else:
+        products = target.expressionproduct_set.all()
+        team = target.expression_team_members.all()
+        antecedent_relation = 'expression_thematic_antecedents'
+        budget_items = BudgetItem.objects.filter(expression=target).select_related('category', 'period')
+
+    researcher = ''
+    if target.user_id:
+        researcher = str(target.user.person) if target.user.person_id else target.user.user.username
+
+    data = {
+        'version': BUNDLE_VERSION,
+        'kind': 'proposal' if is_proposal else 'expression',
+        'project_title': target.project_title,
+        'display_title': getattr(target, 'project_title_override', '') or target.project_title,
+        'call_title': target.call.title if target.call_id else '',
+        'researcher': researcher,
+        'country': _name(getattr(target, 'project_location', None) or target.implementation_country),
+        'problem': target.problem,
+        'general_objective': target.general_objective,
+        'methodology': target.methodology,
+        'products': [
+            {
+                'title': p.title,
+                'description': p.description,
+                'outcome': p.outcome,
+                'start_date': _date(p.start_date),
+                'end_date': _date(p.end_date),
+                'strategic_effects': [e.name for e in p.strategic_effects.all()],
+            }
+            for p in products
+        ],
+        'team_members': [
+            {
+                'name': f"{m.person.first_name} {m.person.first_last_name}",
+                'role': m.role,
+                'institution': _name(m.institution),
+                'start_date': _date(m.start_date),
+                'end_date': _date(m.end_date),
+                'antecedents': [
+                    {
+                        'thematic_axis': _name(a.thematic_axis),
+                        'description': a.description,
+                        'evidence_url': a.evidence_url,
+                    }
+                    for a in getattr(m, antecedent_relation).all()
+                ],
+            }
+            for m in team
+        ],
+        'budget_items': [
+            {
+                'category': b.category.name,
+                'period': b.period.name,
+                'amount': b.amount,
+                'notes': b.notes,
+            }
+            for b in budget_items
+        ],
+        # A list of pairs, not a dict: MySQL's JSON type does not keep key order
+        'responses': [
+            [r.shared_question.question, _answer(r.value)]
+            for r in target.form_responses.all()
+        ],
+        'proposal': None,
+    }
+
+    if is_proposal:
+        proposal = {field: getattr(target, field) for field in PROPOSAL_TEXT_FIELDS}
+        proposal.update({
+            'community_country': _name(target.community_country),
+            'project_location': _name(target.project_location),
+            'duration_months': target.duration_months,
+            'total_requested_budget': target.total_requested_budget,
+            'specific_objectives': [
+                {'title': o.title, 'description': o.description}
+                for o in target.specific_objectives.all()
+            ],
+            'partner_institutions': [i.name for i in target.partner_institutions.all()],
+            'partner_institution_commitments': [
+                _document(d) for d in target.partner_institution_commitments.all()
+            ],
+            'timeline_document': _document(target.timeline_document),
+            'budget_document': _document(target.budget_document),
+        })
+        data['proposal'] = proposal
+    return data
+
+
+def capture_review_snapshot(target):
+    """Store (or replace) the snapshot of `target`. Call it when the target is submitted."""
+    snapshot, _ = ReviewSnapshot.objects.update_or_create(
+        target_content_type=ContentType.objects.get_for_model(target),
+        target_object_id=target.pk,
+        defaults={
+            'data': build_review_bundle(target),
+            'submitted_at': target.submission_datetime or timezone.now(),
+        },
+    )
+    return snapshot
+
+
+def review_bundle(evaluation):
+    """Snapshot data for the target of `evaluation`, capturing it if it is missing."""
+    snapshot = ReviewSnapshot.objects.filter(
+        target_content_type_id=evaluation.target_content_type_id,
+        target_object_id=evaluation.target_object_id,
+    ).only('data').first()
+    if snapshot is not None and snapshot.data.get('version') == BUNDLE_VERSION:
+        return snapshot.data
+    return capture_review_snapshot(evaluation.target).data
@@ -0,0 +1,137 @@
+"""
+Paquete de revision (ZIP) de una evaluacion.
+
+Reune en una sola descarga lo que el evaluador bajaba por separado
+(serve_pdf, download_evaluation_document y las descargas de propuestas y
+CBO):
+
+    documentos/cronograma/, documentos/presupuesto/,
+    documentos/cartas_compromiso/   los del envio, segun la copia de revision
+    documentos/expresion/           documentos de la expresion
+    documentos/cbo/                 documentos de la organizacion comunitaria
+    resumen.json, resumen.html      copia de revision + datos de la evaluacion
+
+El ZIP se arma mientras se envia (common/streaming.py): cada archivo se lee
+del storage en bloques y se comprime directo hacia la respuesta, asi que la
+memoria no depende del tamano del paquete. Un archivo que ya no esta en el
+storage se lista en el resumen en lugar de cortar la descarga.
+"""
+import json
+import os
+import re
+from dataclasses import dataclass
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from cbo.models import CBODocument
+from common.streaming import ZipStream
+from expressions.models import Expression, ExpressionDocument
+from proposals.models import ProposalDocument
+
+PACKAGE_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class PackageFile:
+    folder: str
+    name: str
+    file: object  # FieldFile
+
+
+def _safe_name(name):
+    name = os.path.basename(str(name or '').replace('\\', '/')).strip()
+    return re.sub(r'[\x00-\x1f<>:"|?*]', '_', name) or 'documento'
+
+
+def package_files(evaluation, review):
+    """Documents attached to the target of `evaluation` (four queries at most)."""
+    files = []
+    proposal = review['proposal'] or {}
+    refs = [
+        ('cronograma', proposal.get('timeline_document')),
+        ('presupuesto', proposal.get('budget_document')),
+    ] + [('cartas_compromiso', ref) for ref in proposal.get('partner_institution_commitments') or []]
+    refs = [(folder, ref) for folder, ref in refs if ref]
+    if refs:
+        # The documents that were submitted, not whatever the proposal points to now
+        documents = ProposalDocument.objects.in_bulk([ref['id'] for _, ref in refs])
+        for folder, ref in refs:
+            doc = documents.get(ref['id'])
+            if doc is not None and doc.file:
+                files.append(PackageFile(folder, doc.name or doc.file.name, doc.file))
+
+    target_id = evaluation.target_object_id
+    for doc in ExpressionDocument.objects.filter(expression_id=target_id).order_by('pk'):
+        if doc.file:
+            files.append(PackageFile('expresion', doc.name or doc.file.name, doc.file))
+
+    cbo_id = Expression.objects.filter(pk=target_id).values_list('community_organization_id', flat=True).first()
+    if cbo_id:
+        for doc in CBODocument.objects.filter(cbo_id=cbo_id).order_by('pk'):
+            if doc.file:
+                files.append(PackageFile('cbo', doc.name or doc.file.name, doc.file))
+    return files
+
+
+def _arcnames(files):
+    """(archive path, PackageFile) pairs with unique paths."""
+    seen = set()
+    for item in files:
+        base, ext = os.path.splitext(_safe_name(item.name))
+        arcname = f'documentos/{item.folder}/{base}{ext}'
+        n = 1
+        while arcname in seen:
+            n += 1
+            arcname = f'documentos/{item.folder}/{base}_{n}{ext}'
+        seen.add(arcname)
+        yield arcname, item
+
+
+def _summary(evaluation, review, documents, missing):
+    evaluator = evaluation.evaluator
+    return {
+        'generated_at': timezone.localtime().strftime('%Y-%m-%d %H:%M'),
+        'evaluation': {
+            'id': evaluation.id,
+            'target_type': review['kind'],
+            'target_id': evaluation.target_object_id,
+            'evaluator': str(evaluator.person) if evaluator.person_id else evaluator.user.username,
+            'template': evaluation.template.name if evaluation.template_id else '',
+            'status': evaluation.status.name if evaluation.status_id else '',
+            'total_score': evaluation.total_score,
+            'max_possible_score': evaluation.max_possible_score,
+        },
+        'review': review,
+        'documents': documents,
+        'missing_documents': missing,
+    }
+
+
+def review_package_stream(evaluation, review, chunk_size=PACKAGE_CHUNK_SIZE):
+    """Yield the ZIP review package of `evaluation` (`review` is its review bundle)."""
+    archive = ZipStream()
+    documents, missing = [], []
+    for arcname, item in _arcnames(package_files(evaluation, review)):
+        try:
+            source = item.file.open('rb')
+        except OSError:
+            missing.append(arcname)
+            continue
+        with source:
+            yield from archive.write_file(arcname, source, chunk_size)
+        documents.append(arcname)
+
+    summary = _summary(evaluation, review, documents, missing)
+    with archive.open('resumen.json') as entry:
+        entry.write(json.dumps(summary, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2).encode())
+    with archive.open('resumen.html') as entry:
+        entry.write(render_to_string('evaluations/review_package_summary.html', summary).encode())
+    yield archive.close()
+
+
+def review_package_filename(evaluation, review):
+    title = re.sub(r'[^\w\s-]', '_', (review['project_title'] or 'evaluacion').strip())
+    title = re.sub(r'[-_\s]+', '_', title).strip('_')[:80] or 'evaluacion'
+    return f'{title}_evaluacion_{evaluation.id}.zip'
@@ -0,0 +1,134 @@
+"""
+Envio de una evaluacion: validacion, puntaje y guardado de respuestas.
+
+`submit_evaluation()` recibe la plantilla compilada (ver `compiled_templates`)
+y el POST del evaluador:
+
+    - valida cada opcion seleccionada contra las opciones de la plantilla;
+    - guarda todas las respuestas con un solo INSERT ... ON CONFLICT/DUPLICATE
+      KEY UPDATE sobre (evaluation, item);
+    - calcula el total con los puntajes de la plantilla y toma de ella el
+      maximo posible;
+    - ejecuta una sola vez la revision de autoaprobacion (ver `approval`) y,
+      si no se aprobo, la de escalamiento a otro evaluador (ver `escalation`).
+
+Un envio cuesta las mismas pocas consultas sin importar cuantos items tenga
+la plantilla.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.utils import timezone
+
+from common.status_registry import statuses
+
+from .approval import approve_if_ready, lock_targets, rules_for_call
+from .escalation import escalate_if_needed
+from .models import EvaluationResponse
+
+
+@dataclass(frozen=True)
+class ScoredItem:
+    item: object
+    option: object
+    comment: str
+
+
+@dataclass(frozen=True)
+class SubmissionResult:
+    total_score: Decimal
+    max_possible_score: Decimal
+    is_positive: bool
+    auto_approved: bool
+    escalated: bool
+
+
+def score_items(items, data):
+    """
+    Selected option of every compiled item in `data` (a QueryDict / dict with
+    `item_<id>` and `comment_<id>`). Raises ValueError with the message shown
+    to the evaluator on the first invalid item. No queries.
+    """
+    scored = []
+    for item in items:
+        try:
+            option_id = int(data.get(f"item_{item.id}"))
+        except (TypeError, ValueError):
+            raise ValueError(f"Opción inválida para '{item.question}'.")
+        if not option_id:
+            raise ValueError(f"Debe asignar una puntuación para: {item.question}")
+
+        option = item.option(option_id)
+        if option is None:
+            raise ValueError(f"Opción inválida seleccionada para '{item.question}'.")
+        if option.score < 0 or option.score > item.max_score:
+            raise ValueError(
+                f"Puntuación inválida para '{item.question}'. "
+                f"Debe estar entre 0 y {item.max_score}."
+            )
+        scored.append(ScoredItem(item=item, option=option, comment=data.get(f"comment_{item.id}", "")))
+    return scored
+
+
+def save_responses(evaluation, scored):
+    """Upsert every response of `evaluation` in one statement keyed on (evaluation, item)."""
+    responses = [
+        EvaluationResponse(evaluation=evaluation, item_id=s.item.id, score=s.option.score, comment=s.comment)
+        for s in scored
+    ]
+    # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target; it uses the
+    # (evaluation, item) unique key on its own
+    unique_fields = (
+        ['evaluation', 'item']
+        if connection.features.supports_update_conflicts_with_target else None
+    )
+    EvaluationResponse.objects.bulk_create(
+        responses,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=['score', 'comment', 'updated_at'],
+    )
+
+
+def submit_evaluation(evaluation, compiled, data):
+    """
+    Validate and store a full submission of `evaluation` against its compiled
+    template, mark it completed and run the auto-approval and escalation
+    checks. Raises ValueError (nothing is saved) if any item is invalid.
+    """
+    scored = score_items(compiled.items, data)
+    total_score = sum((s.option.score for s in scored), Decimal('0'))
+    # Same value as template.calculate_total_max_score()
+    max_possible_score = compiled.total_max_score
+    threshold = rules_for_call(evaluation.call_id).threshold
+    is_positive = max_possible_score > 0 and total_score >= max_possible_score * threshold
+
+    with transaction.atomic():
+        # Lock the target before writing, in the same order as the approval
+        # engine, so concurrent submissions on one target are serialized
+        lock_targets([evaluation.target_object_id])
+        save_responses(evaluation, scored)
+
+        evaluation.total_score = total_score
+        evaluation.max_possible_score = max_possible_score
+        evaluation.is_positive = is_positive
+        evaluation.status = statuses.get('Completada')
+        evaluation.submission_datetime = timezone.now()
+        evaluation.save(update_fields=[
+            'total_score', 'max_possible_score', 'is_positive',
+            'status', 'submission_datetime', 'updated_at',
+        ])
+
+        target_type = ContentType.objects.get_for_id(evaluation.target_content_type_id).model
+        auto_approved = approve_if_ready(evaluation.target_object_id, target_type)
+        escalated = not auto_approved and escalate_if_needed(evaluation.target_object_id, target_type)
+
+    return SubmissionResult(
+        total_score=total_score,
+        max_possible_score=max_possible_score,
+        is_positive=is_positive,
+        auto_approved=auto_approved,
+        escalated=escalated,
+    )
@@ -1,13 +1,69 @@
-from django.db.models.signals import post_save, post_delete
+from collections import Counter
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.contrib.contenttypes.models import ContentType
 from django.dispatch import receiver
 from django.db import transaction
+from expressions.models import Expression
+from proposals.models import Proposal
+from common import counters
+from common.status_registry import statuses
 from .models import (
     TemplateItem, 
     TemplateSubcategory, 
     TemplateCategory, 
     EvaluationTemplate, 
-    TemplateItemOption
+    TemplateItemOption,
+    Evaluation,
 )
+from .compiled_templates import compiled_templates
+from .ranking import refresh_rankings
+
+
+# Work waiting for the current transaction to commit, per database
+# connection. Many edits in one transaction (a form saving 30 items, a cascade
+# delete) add to the same set and the work runs once on commit.
+def _schedule_on_commit(name, key, run):
+    """Add `key` to the pending set `name`; `run(keys)` gets the whole set on commit."""
+    connection = transaction.get_connection()
+    attr = f'_pending_{name}'
+    pending = getattr(connection, attr, None)
+    # on_commit callbacks are dropped on rollback; start over if ours was dropped
+    if pending is not None and not any(entry[1] is pending['flush'] for entry in connection.run_on_commit):
+        pending = None
+    if pending is not None:
+        pending['keys'].add(key)
+        return
+
+    keys = {key}
+
+    def flush():
+        setattr(connection, attr, None)
+        run(keys)
+
+    setattr(connection, attr, {'keys': keys, 'flush': flush})
+    # Outside a transaction this runs flush() right away
+    transaction.on_commit(flush)
+
+
+def _recompute_templates(ids):
+    for template in EvaluationTemplate.objects.filter(pk__in=ids):
+        template.update_evaluations()
+
+
+def schedule_template_recompute(template_id):
+    """Recompute evaluation scores for `template_id` once the current transaction commits."""
+    _schedule_on_commit('template_recompute', template_id, _recompute_templates)
+
+
+def schedule_template_invalidation(template_id):
+    """Drop the compiled copy of `template_id` once the current transaction commits."""
+    _schedule_on_commit('template_invalidation', template_id, compiled_templates.invalidate)
+
+
+def schedule_ranking_refresh(content_type_id, object_id):
+    """Refresh the CallRanking row of a target once the current transaction commits."""
+    _schedule_on_commit('ranking_refresh', (content_type_id, object_id), refresh_rankings)
+
 
 # Re-calculate whenever any part of the hierarchy changes
 @receiver([post_save, post_delete], sender=TemplateItem)
@@ -15,18 +71,95 @@ from .models import (
 @receiver([post_save, post_delete], sender=TemplateCategory)
 def trigger_template_update(sender, instance, **kwargs):
     if sender == TemplateItem:
-        template = instance.subcategory.category.template
+        template_id = TemplateCategory.objects.filter(
+            subcategories__id=instance.subcategory_id
+        ).values_list('template_id', flat=True).first()
     elif sender == TemplateSubcategory:
-        template = instance.category.template
+        template_id = TemplateCategory.objects.filter(
+            pk=instance.category_id
+        ).values_list('template_id', flat=True).first()
     elif sender == TemplateCategory:
-        template = instance.template
+        template_id = instance.template_id
     else:
         return
-    transaction.on_commit(lambda: template.update_evaluations())
+    if template_id is not None:
+        schedule_template_recompute(template_id)
+        schedule_template_invalidation(template_id)
+
+# Name / description changes and deletes show up in the compiled copy too
+@receiver([post_save, post_delete], sender=EvaluationTemplate)
+def invalidate_compiled_template(sender, instance, **kwargs):
+    schedule_template_invalidation(instance.pk)
+
+# Keep the columns Evaluation copies from its target in sync (one UPDATE,
+# touching only rows that are out of date)
+@receiver(post_save, sender=Expression)
+@receiver(post_save, sender=Proposal)
+def sync_evaluation_targets(sender, instance, created, **kwargs):
+    if created:
+        return
+    with transaction.atomic():
+        stale = list(
+            Evaluation.objects.select_for_update().filter(expression_id=instance.pk).exclude(
+                call_id=instance.call_id,
+                project_title=instance.project_title,
+                researcher_id=instance.user_id,
+            ).values('pk', 'call_id', 'status_id', 'target_content_type_id')
+        )
+        if not stale:
+            return
+        Evaluation.objects.filter(pk__in=[row['pk'] for row in stale]).update(
+            call_id=instance.call_id,
+            project_title=instance.project_title,
+            researcher_id=instance.user_id,
+        )
+        # .update() skips the counter signals: move the moved rows by hand
+        deltas = Counter()
+        for row in stale:
+            if row['call_id'] == instance.call_id:
+                continue
+            kind = counters.EVALUATION_KINDS.get(
+                ContentType.objects.get_for_id(row['target_content_type_id']).model
+            )
+            if kind is not None:
+                deltas[counters.key(kind, row['call_id'], row['status_id'])] -= 1
+                deltas[counters.key(kind, instance.call_id, row['status_id'])] += 1
+        counters.apply_deltas(deltas)
+    # The ranking rows copy title and call from the evaluations
+    for model in (Expression, Proposal):
+        schedule_ranking_refresh(ContentType.objects.get_for_model(model).id, instance.pk)
+
+# Remember whether a saved evaluation was completed, so reopening it also
+# takes its target out of (or moves it in) the ranking
+@receiver(pre_save, sender=Evaluation)
+def remember_completed_status(sender, instance, update_fields=None, **kwargs):
+    instance._was_completed = False
+    if instance.pk is None or instance.status_id == statuses.id('Completada'):
+        return
+    if update_fields is not None and not {'status', 'status_id'} & set(update_fields):
+        return
+    instance._was_completed = Evaluation.objects.filter(
+        pk=instance.pk, status_id=statuses.id('Completada')
+    ).exists()
+
+# A completed, reopened or deleted evaluation moves its target in the call ranking
+@receiver(post_save, sender=Evaluation)
+@receiver(post_delete, sender=Evaluation)
+def refresh_evaluation_ranking(sender, instance, **kwargs):
+    if kwargs.get('signal') is post_save and not (
+        instance.status_id == statuses.id('Completada') or getattr(instance, '_was_completed', False)
+    ):
+        return
+    schedule_ranking_refresh(instance.target_content_type_id, instance.target_object_id)
 
 @receiver([post_save, post_delete], sender=TemplateItemOption)
 def update_item_max_score(sender, instance, **kwargs):
     """Update the parent TemplateItem's max_score when an option changes."""
+    template_id = TemplateCategory.objects.filter(
+        subcategories__items__id=instance.item_id
+    ).values_list('template_id', flat=True).first()
+    if template_id is not None:
+        schedule_template_invalidation(template_id)
     item = instance.item
     item.sync_max_score()
     computed_max = item.calculate_max_score_from_options()
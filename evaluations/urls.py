@@ -82,6 +82,10 @@ urlpatterns = [
         views.assign_evaluator, 
         name='assign_evaluator'),
 
+    path('call/<int:call_id>/auto-assign/',
+        views.auto_assign_evaluators,
+        name='auto_assign_evaluators'),
+
     # Evaluator Workflow
     path('evaluator/dashboard/', 
         views.evaluator_dashboard, 
@@ -101,6 +105,10 @@ urlpatterns = [
         name='download_evaluation_document'
         ),
 
+    path('review-package/<int:evaluation_id>/',
+        views.download_review_package,
+        name='download_review_package'),
+
     path('get-document-url/<int:evaluation_id>/<str:doc_type>/', 
         views.get_document_url, 
         name='get_document_url'),
@@ -110,6 +118,22 @@ urlpatterns = [
         views.coordinator_view_evaluations, 
         name='coordinator_view_evaluations'),
 
+    path('call/<int:call_id>/score-analysis/',
+        views.call_score_analysis,
+        name='call_score_analysis'),
+
+    path('call/<int:call_id>/ranking/',
+        views.call_ranking,
+        name='call_ranking'),
+
+    path('call/<int:call_id>/ranking/json/',
+        views.call_ranking_json,
+        name='call_ranking_json'),
+
+    path('call/<int:call_id>/export/',
+        views.export_call_evaluations,
+        name='export_call_evaluations'),
+
     path('evaluation/<int:evaluation_id>/detail-json/',
         views.evaluation_detail_json,
         name='evaluation_detail_json'),
@@ -5,40 +5,55 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.http import HttpResponseForbidden, JsonResponse, FileResponse, Http404
+from django.utils.http import content_disposition_header
+from django.http import HttpResponseForbidden, JsonResponse, FileResponse, Http404, StreamingHttpResponse
 from django.core.serializers import serialize
 import re
 from .models import (
     EvaluationTemplate, TemplateCategory, TemplateSubcategory,
-    TemplateItem, TemplateItemOption, Evaluation, EvaluationResponse
+    TemplateItem, TemplateItemOption, Evaluation, EvaluationResponse,
+    ScoreAnalysis, EvaluatorScoreStats, ItemScoreStats, EvaluationScoreStats
 )
 from expressions.models import Expression
-from proposals.models import Proposal
+from proposals.models import Proposal, ProposalDocument
 from people.models import Person
 from accounts.models import CustomUser
-from common.models import Status
+from common import counters
+from common.keyset import KeysetPaginator
+from common.status_registry import statuses
+from accounts.decorators import role_required
+from accounts.profile import get_profile
 from django.contrib.contenttypes.models import ContentType
 from calls.models import Call
-from evaluations.utils import approve_if_auto_approved
+from evaluations.compiled_templates import compiled_templates
+from evaluations.scoring import submit_evaluation
+from evaluations.approval import rules_for_call
+from evaluations.assignment import assign_call
+from evaluations.analytics import store_call_analyses
+from evaluations.ranking import RANKING_PAGE_SIZE, ranking_page
+from evaluations.review_bundle import review_bundle
+from evaluations.review_package import review_package_filename, review_package_stream
+from evaluations.export import FORMATS as EXPORT_FORMATS, LEVELS as EXPORT_LEVELS, export_filename, export_stream
 from budgets.models import BudgetItem
 from django.db import transaction
+from django.db.models import Prefetch
 from decimal import Decimal
 from django.core.exceptions import PermissionDenied
 from django.views.decorators.clickjacking import xframe_options_exempt 
 #from proposals.models import Proposal
 
 @login_required
+@role_required('Coordinator')
 def coordinator_evaluations_dashboard(request):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-
-    # Get all submitted expressions (status = 'Enviada')
+    # Submitted expressions (status = 'Enviada'), one keyset page at a time
     submitted_expressions = Expression.objects.filter(
-        status__name='Enviada'
+        status_id=statuses.id('Enviada'), submission_datetime__isnull=False,
     ).select_related(
-        'user', 'call', 'scale', 'status'
-    ).order_by('-submission_datetime')
+        'user__person', 'user__user', 'call', 'scale', 'status'
+    ).prefetch_related('call__evaluation_templates')
+    page = KeysetPaginator(
+        submitted_expressions, ('-submission_datetime', '-pk'), non_null=('submission_datetime',)
+    ).page(request.GET.get('cursor'))
 
     # Get all Evaluator users
     evaluators = CustomUser.objects.filter(
@@ -47,17 +62,17 @@ def coordinator_evaluations_dashboard(request):
     ).select_related('role', 'person').order_by('person__first_name', 'person__first_last_name')
 
     context = {
-        'submitted_expressions': submitted_expressions,
+        'submitted_expressions': page,
+        'page': page,
         'evaluators': evaluators,
+        'counts': counters.totals(submitted_expressions=(counters.EXPRESSIONS, ['Enviada'])),
     }
     return render(request, 'evaluations/coordinator_evaluations_dashboard.html', context)
 
 
 @login_required
+@role_required('Coordinator', json=True)
 def create_evaluation_template(request):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
-
     if request.method == 'POST':
         print("Trying...")
         name = request.POST.get('name')
@@ -95,9 +110,8 @@ def create_evaluation_template(request):
     return JsonResponse({'success': False, 'error': 'Invalid request method.'})
 
 @login_required
+@role_required('Coordinator', json=True)
 def edit_evaluation_template(request, template_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
     template = get_object_or_404(EvaluationTemplate, id=template_id)
 
     if request.method == 'POST':
@@ -131,43 +145,34 @@ def edit_evaluation_template(request, template_id):
     return JsonResponse({'success': False, 'error': 'Invalid request method.'})
 
 @login_required
+@role_required('Coordinator')
 def delete_evaluation_template(request, template_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-
     template = get_object_or_404(EvaluationTemplate, id=template_id)
     template.delete()
     messages.success(request, 'Plantilla eliminada correctamente.')
     return redirect('calls:coordinator_dashboard')
 
 @login_required
+@role_required('Coordinator')
 def evaluation_template_detail(request, template_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-    
     template = get_object_or_404(EvaluationTemplate, id=template_id)
-    categories = TemplateCategory.objects.filter(template=template).prefetch_related(
-        'subcategories',
-        'subcategories__items'
-    ).order_by('order')
+    # Cached category / subcategory / item tree
+    compiled = compiled_templates.get(template.id)
 
     # Get all calls for linking
     all_calls = Call.objects.all().order_by('title')
 
     context = {
         'template': template,
-        'categories': categories,
+        'categories': compiled.categories,
+        'linked_calls': list(template.calls.order_by('title')),
         'all_calls': all_calls,  # Pass to template
     }
     return render(request, 'evaluations/template_detail.html', context)
 
 @login_required
+@role_required('Coordinator', json=True)
 def create_template_category(request):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
-
     if request.method == 'POST':
         try:
             template_id = request.POST.get('template_id')
@@ -192,10 +197,8 @@ def create_template_category(request):
     return JsonResponse({'success': False, 'error': 'Invalid request method.'})
 
 @login_required
+@role_required('Coordinator', json=True, status=403)
 def edit_template_category(request, category_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'}, status=403)
-
     category = get_object_or_404(TemplateCategory, id=category_id)
     
     if request.method == 'POST':
@@ -226,10 +229,8 @@ def edit_template_category(request, category_id):
     return JsonResponse({'success': False, 'error': 'Invalid request method.'}, status=405)
 
 @login_required
+@role_required('Coordinator', json=True, status=403)
 def delete_template_category(request, category_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'}, status=403)
-
     category = get_object_or_404(TemplateCategory, id=category_id)
 
     if request.method == 'DELETE':
@@ -247,9 +248,8 @@ def delete_template_category(request, category_id):
     return JsonResponse({'success': False, 'error': 'Invalid request method.'}, status=405)
 
 @login_required
+@role_required('Coordinator', json=True)
 def create_template_subcategory(request):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
     if request.method == 'POST':
         try:
             category_id = request.POST.get('category_id')
@@ -274,9 +274,8 @@ def create_template_subcategory(request):
 
 
 @login_required
+@role_required('Coordinator', json=True)
 def edit_template_subcategory(request, subcategory_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
     subcategory = get_object_or_404(TemplateSubcategory, id=subcategory_id)
     if request.method == 'POST':
         try:
@@ -302,9 +301,8 @@ def edit_template_subcategory(request, subcategory_id):
 
 
 @login_required
+@role_required('Coordinator', json=True)
 def delete_template_subcategory(request, subcategory_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
     subcategory = get_object_or_404(TemplateSubcategory, id=subcategory_id)
     if request.method == 'DELETE':
         try:
@@ -318,9 +316,8 @@ def delete_template_subcategory(request, subcategory_id):
 
 
 @login_required
+@role_required('Coordinator', json=True)
 def create_template_item(request):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
     if request.method == 'POST':
         try:
             subcategory_id = request.POST.get('subcategory_id')
@@ -364,9 +361,8 @@ def create_template_item(request):
     return JsonResponse({'success': False, 'error': 'Invalid request method.'})
 
 @login_required
+@role_required('Coordinator', json=True)
 def get_template_item(request, item_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
     try:
         item = TemplateItem.objects.prefetch_related('options').get(id=item_id)
         options = [
@@ -387,9 +383,8 @@ def get_template_item(request, item_id):
         return JsonResponse({'success': False, 'error': 'Item not found.'})
     
 @login_required
+@role_required('Coordinator', json=True)
 def get_template_item(request, item_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
     try:
         item = TemplateItem.objects.prefetch_related('options').get(id=item_id)
         options = [
@@ -411,9 +406,8 @@ def get_template_item(request, item_id):
     
 
 login_required
+@role_required('Coordinator', json=True)
 def edit_template_item(request, item_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
     item = get_object_or_404(TemplateItem, id=item_id)
     if request.method == 'POST':
         try:
@@ -457,10 +451,9 @@ def edit_template_item(request, item_id):
     return JsonResponse({'success': False, 'error': 'Invalid request method.'})
 
 @login_required
+@role_required('Coordinator', json=True)
 def load_dynamic_options(request):
     """AJAX endpoint to preload display_text from source_model (score = 0 by default)."""
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'})
     source_model = request.GET.get('source_model')
     if not source_model:
         return JsonResponse({'success': False, 'error': 'source_model required.'})
@@ -490,10 +483,8 @@ def load_dynamic_options(request):
         return JsonResponse({'success': False, 'error': str(e)})
     
 @login_required
+@role_required('Coordinator', json=True, status=403)
 def delete_template_item(request, item_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        return JsonResponse({'success': False, 'error': 'Access denied.'}, status=403)
-
     item = get_object_or_404(TemplateItem, id=item_id)
 
     if request.method == 'DELETE':
@@ -513,11 +504,8 @@ def delete_template_item(request, item_id):
     return JsonResponse({'success': False, 'error': 'Invalid request method.'}, status=405) 
 
 @login_required
+@role_required('Coordinator', redirect_to='calls:coordinator_dashboard')
 def assign_evaluator(request, target_type, target_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied.")
-        return redirect('calls:coordinator_dashboard')
-    
     # Map target_type to model
     model_map = {
         "expression": Expression,
@@ -576,10 +564,7 @@ def assign_evaluator(request, target_type, target_id):
                 return redirect('calls:coordinator_dashboard')
 
         # Get or create status
-        pending_status, _ = Status.objects.get_or_create(
-            name='Pendiente',
-            defaults={'description': 'Evaluación pendiente de revisión'}
-        )
+        pending_status = statuses.get('Pendiente')
 
         # Save evaluation dynamically
         content_type = ContentType.objects.get_for_model(target)
@@ -623,11 +608,57 @@ def assign_evaluator(request, target_type, target_id):
     return redirect('calls:coordinator_dashboard')
 
 @login_required
-def approve_expression(request, expression_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Acceso denegado.")
+@role_required('Coordinator', redirect_to='calls:coordinator_dashboard')
+def auto_assign_evaluators(request, call_id):
+    """Assign evaluators to every submitted expression/proposal of a call at once."""
+    call = get_object_or_404(Call, id=call_id)
+    if request.method != 'POST':
+        return redirect('calls:coordinator_dashboard')
+
+    target_type = request.POST.get('target_type', 'expression')
+    if target_type not in ('expression', 'proposal'):
+        messages.error(request, "Tipo de objetivo inválido.")
+        return redirect('calls:coordinator_dashboard')
+    try:
+        per_target = int(request.POST.get('evaluators_per_target') or call.required_evaluations)
+    except ValueError:
+        per_target = 0
+    if per_target < 1:
+        messages.error(request, "El número de evaluadores por objetivo debe ser al menos 1.")
+        return redirect('calls:coordinator_dashboard')
+
+    template = None
+    template_id = request.POST.get('template_id')
+    if template_id:
+        applies = 'applies_to_proposal' if target_type == 'proposal' else 'applies_to_expression'
+        template = EvaluationTemplate.objects.filter(id=template_id, calls=call, **{applies: True}).first()
+        if template is None:
+            messages.error(request, "La plantilla seleccionada no es válida para esta convocatoria o tipo de objetivo.")
+            return redirect('calls:coordinator_dashboard')
+
+    try:
+        plan = assign_call(call.id, target_type, per_target, template=template, created_by=request.user)
+    except ValueError as e:
+        messages.error(request, str(e))
         return redirect('calls:coordinator_dashboard')
 
+    label = "propuestas" if target_type == 'proposal' else "expresiones"
+    assigned_targets = len({target_id for target_id, _ in plan.pairs})
+    messages.success(
+        request,
+        f"Se crearon {len(plan.pairs)} evaluaciones para {assigned_targets} {label} de '{call.title}'."
+    )
+    if plan.short:
+        messages.warning(
+            request,
+            f"{len(plan.short)} {label} no alcanzaron {per_target} evaluadores "
+            "(conflictos de interés o capacidad de los evaluadores)."
+        )
+    return redirect('calls:coordinator_dashboard')
+
+@login_required
+@role_required('Coordinator', message="Acceso denegado.", redirect_to='calls:coordinator_dashboard')
+def approve_expression(request, expression_id):
     expression = get_object_or_404(Expression, id=expression_id)
 
     if expression.status.name != 'Enviada':
@@ -642,10 +673,10 @@ def approve_expression(request, expression_id):
         implementation_plan="",
         risk_analysis="",
         sustainability_plan="",
-        status=Status.objects.get(name='Aprobada'),
+        status=statuses.get('Aprobada'),
     )
 
-    expression.status = Status.objects.get(name='Aprobada')
+    expression.status = statuses.get('Aprobada')
     expression.save()
 
     # Let coordinator choose template for Proposal
@@ -681,32 +712,29 @@ def approve_expression(request, expression_id):
 
 
 @login_required
+@role_required('Evaluator')
 def evaluator_dashboard(request):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Evaluator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-
-    # Get all evaluations assigned to this evaluator
+    # Evaluations assigned to this evaluator, newest assignment first
     evaluations = Evaluation.objects.filter(
         evaluator=request.user.customuser,
-        status__name__in=['Pendiente', 'En Progreso', 'Completada']
+        status_id__in=statuses.ids('Pendiente', 'En Progreso', 'Completada')
     ).select_related(
         'target_content_type',
+        'call',
         'template',
         'status'
-    ).order_by('-updated_at')
+    )
+    page = KeysetPaginator(evaluations, ('-created_at', '-pk')).page(request.GET.get('cursor'))
 
     context = {
-        'evaluations': evaluations
+        'evaluations': page,
+        'page': page,
     }
     return render(request, 'evaluations/evaluator_dashboard.html', context)
 
 @login_required
+@role_required('Evaluator')
 def evaluate_expression(request, evaluation_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Evaluator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-
     evaluation = get_object_or_404(
         Evaluation, 
         id=evaluation_id, 
@@ -714,7 +742,7 @@ def evaluate_expression(request, evaluation_id):
     )
 
     # Validate state
-    if evaluation.status.name not in ['Pendiente', 'En Progreso']:
+    if evaluation.status_id not in statuses.ids('Pendiente', 'En Progreso'):
         messages.error(request, "Esta evaluación ya fue completada o no está disponible.")
         return redirect('calls:evaluator_dashboard')
 
@@ -724,306 +752,187 @@ def evaluate_expression(request, evaluation_id):
         messages.error(request, "No se encontró una plantilla de evaluación activa.")
         return redirect('calls:evaluator_dashboard')
 
-    items = TemplateItem.objects.filter(
-        subcategory__category__template=template
-    ).select_related('subcategory__category').prefetch_related(
-        'options'
-    ).order_by(
-        'subcategory__category__order', 'subcategory__order', 'order'
-    )
-
-    # Determine target type and get proposal-specific data if needed
-    target = evaluation.target
-    print("target", target)
-    print(isinstance(target, Expression))
-    print(isinstance(target, Proposal))
-    # target_type = 'expression' if isinstance(target, Expression) else 'proposal'
-    target_type = 'proposal' if isinstance(target, Proposal) else 'expression'
-
-    # Prepare proposal-specific fields to pass to template (only if Proposal)
-    proposal_fields = {}
-    if target_type == 'proposal':
-        proposal_fields = {
-            'principal_research_experience': target.principal_research_experience,
-            'community_country': target.community_country,
-            'community_description': target.community_description,
-            'project_location': target.project_location,
-            'duration_months': target.duration_months,
-            'summary': target.summary,
-            'context_problem_justification': target.context_problem_justification,
-            'specific_objectives': target.specific_objectives.all(),
-            'methodology_analytical_plan_ethics': target.methodology_analytical_plan_ethics,
-            'equity_inclusion': target.equity_inclusion,
-            'communication_strategy': target.communication_strategy,
-            'risk_analysis_mitigation': target.risk_analysis_mitigation,
-            #'research_team': target.research_team,
-            'timeline_document': target.timeline_document,
-            'budget_document': target.budget_document,
-            'partner_institutions': target.partner_institutions.all(),
-            'partner_institution_commitments': target.partner_institution_commitments.all(),
-        }
-    
-    # EXTRA DATA: Products, Team Members, Budget Items, Responses
-    # Extract related objects using correct _set syntax
-    try:
-        # Products
-        # print("DEBUG")
-        # for attr in dir(target):
-        #     print(attr)
-        # print("END DEBUG")
-        if isinstance(target, Proposal):
-            print("A: This is a Proposal instance")
-            if hasattr(target, 'proposalproduct_set') and target.proposalproduct_set.exists():
-                products = list(
-                    target.proposalproduct_set.prefetch_related('strategic_effects').all()
-                )
-            print(products)
-        elif isinstance(target, Expression):
-            if hasattr(target, 'expressionproduct_set') and target.expressionproduct_set.exists():
-                products = list(
-                    target.expressionproduct_set.prefetch_related('strategic_effects').all()
-                )
-            print("B: This is NOT a Proposal (it's a", type(target).__name__, ")")
-        
-        # if hasattr(target, 'proposalproduct_set') and target.proposalproduct_set.exists():
-        #     products = list(
-        #         target.product_set.prefetch_related('strategic_effects').all()
-        #     )
-        # elif hasattr(target, 'expressionproduct_set') and target.expressionproduct_set.exists():
-        #     products = list(
-        #         target.expressionproduct_set.prefetch_related('strategic_effects').all()
-        #     )
-        #     # for product in products:
-        #     #     print(f"Product: {product.title}")
-        #     #     effects = product.strategic_effects.all()
-        #     #     for effect in effects:
-        #     #         print(f"  → Effect: {effect.name}")
-        #     #     print(f"\nProduct ID is: {product.id} - Title: {product.title}")
-        #     #     if effects:
-        #     #         for effect in effects:
-        #     #             print(f"    {effect.id} - {effect.name}")
-        #     #     else:
-        #     #         print("   No strategic effects linked.")
-        # else:
-        #     print("Error loading products:")
-        #     products = []
-
-        # # Team Members
-        # if hasattr(target, 'projectteammember_set') and target.teammember_set.exists():
-        #     team_members = list(target.teammember_set.all())
-        # else:
-        #     team_members = []
-
-        # print("Team Members", team_members)
-
-        try:
-            # Safe: use the actual related_name or default _set
-            if hasattr(target, 'team_members'):  
-                team_members = list(target.team_members.all())
-            else:
-                # Fallback: try default _set name
-                rel_name = 'projectteammember_set'
-                if hasattr(target, rel_name):
-                    team_members = list(getattr(target, rel_name).all())
-                else:
-                    team_members = []
-        except Exception as e:
-            print("Error loading team members:", str(e))
-            team_members = []
-
-        # Budget Items
-        existing_budget_items = BudgetItem.objects.filter(expression=target.id).select_related('category', 'period')
-        for item in existing_budget_items:
-            print(item.id, item.category.name, item.period.name)
-        
-        # Dynamic Question Responses
-        print(target, "EVALUATION QUESTIONS")
-        responses = {}
-        try:
-            # Use correct related name
-            response_qs = target.form_responses.select_related('shared_question')
-            if response_qs.exists():
-                for r in response_qs:
-                    question_text = r.shared_question.question
-                    responses[question_text] = r.value.strip() if r.value else "No respondido"
-        except Exception as e:
-            print("Error accessing form_responses:", str(e))
-            # Fallback: try default reverse accessor
-            try:
-                from proponent_forms.models import ProponentResponse
-                response_qs = ProponentResponse.objects.filter(expression=target).select_related('shared_question')
-                for r in response_qs:
-                    question_text = r.shared_question.question
-                    responses[question_text] = r.value.strip() if r.value else "No respondido"
-            except:
-                pass
-        print(len(responses))
-    except Exception as e:
-        print("Error loading extended fields:", e)
-        products = []
-        team_members = []
-        budget_items = []
-        responses = {}
+    # Cached item / option tree of the template
+    compiled = compiled_templates.get(template.id)
 
     if request.method == 'POST':
-        total_score = 0
         try:
-            with transaction.atomic():
-                for item in items:
-                    field_name = f"item_{item.id}"
-                    option_id = request.POST.get(field_name)
-                    try:
-                        option_id = int(option_id)
-                    except (TypeError, ValueError):
-                        raise ValueError(f"Opción inválida para '{item.question}'.")
-                    comment = request.POST.get(f"comment_{item.id}", "")
-                    #print("EVALUATION QUESTION:", dir(item))
-
-                    if not option_id:
-                        raise ValueError(f"Debe asignar una puntuación para: {item.question}")
-
-                    # print("Opt id:", option_id)
-
-                    try:
-                        # # The item already has its options prefetched
-                        # selected_option = next(
-                        #     (opt for opt in item.options.all() if str(opt.id) == option_id),
-                        #     None
-                        # )
-                        # # print(selected_option)
-                        # # for val in item.options.all():
-                        # #     print("Values:", val, type(val))
-                        # if not selected_option:
-                        #     raise TemplateItemOption.DoesNotExist
-                        # score = selected_option.score
-                        selected_option = TemplateItemOption.objects.get(id=option_id, item=item)
-                        score = selected_option.score
-                        print(f"Starting questions {item.question.strip()}: Score is {score}")
-                    except TemplateItemOption.DoesNotExist:
-                        raise ValueError(f"Opción inválida seleccionada para '{item.question}'.")
-
-                    # Validation
-                    if score < 0 or score > item.max_score:
-                        raise ValueError(
-                            f"Puntuación inválida para '{item.question}'. "
-                            f"Debe estar entre 0 y {item.max_score}."
-                        )
-
-                    # Update or create response
-                    EvaluationResponse.objects.update_or_create(
-                        evaluation=evaluation,
-                        item=item,
-                        defaults={
-                            'score': score,
-                            'comment': comment,
-                        }
-                    )
-                    total_score += score
-
-                # Set completion status
-                status_completada, _ = Status.objects.get_or_create(
-                    name='Completada',
-                    defaults={'description': 'Evaluación completada por el evaluador'}
-                )
-                # THRESHOLD LOGIC - SAFE DECIMAL ARITHMETIC
-                # Convert to Decimal
-                total_score_decimal = Decimal(str(total_score))
-                evaluation.total_score = total_score_decimal
-                evaluation.max_possible_score = evaluation.template.get_total_max_score()
-                print("Total score and max_possible score are good")
-                # Then calculate is_positive
-                if evaluation.max_possible_score > 0:
-                    ratio = total_score / Decimal(evaluation.max_possible_score)
-                    evaluation.is_positive = ratio >= 0.7
-                else:
-                    evaluation.is_positive = False
-
-                # Save final evaluation
-                evaluation.status = status_completada
-                evaluation.submission_datetime = timezone.now()
-                evaluation.save()
-
-                # Auto-approve check (if applicable)
-                target = evaluation.target
-                target_type = 'expression' if isinstance(target, Expression) else 'proposal'
-                print(approve_if_auto_approved(target.id, target_type))
-                if approve_if_auto_approved(target.id, target_type):
-                    messages.info(
-                        request,
-                        "¡Autoaprobado! Dos evaluaciones positivas recibidas. La propuesta ha sido aprobada automáticamente."
-                    )
-
-                messages.success(request, "Evaluación enviada con éxito.")
-
+            result = submit_evaluation(evaluation, compiled, request.POST)
         except ValueError as ve:
             messages.error(request, str(ve))
-            return render(request, 'evaluations/evaluate_expression.html', {
-                'evaluation': evaluation,
-                'template': template,
-                'items': items,
-                'target_type': target_type,
-                'proposal_fields': proposal_fields,
-                'products': products,
-                'team_members': team_members,
-                #'existing_budget_items': existing_budget_items,
-                'responses': responses,
-            })
         except Exception as e:
             messages.error(request, "Ocurrió un error al guardar la evaluación.")
             print("Error saving evaluation:", e)
-            return render(request, 'evaluations/evaluate_expression.html', {
-                'evaluation': evaluation,
-                'template': template,
-                'items': items,
-                'target_type': target_type,
-                'proposal_fields': proposal_fields,
-                'products': products,
-                'team_members': team_members,
-                #'existing_budget_items': existing_budget_items,
-                'responses': responses,
-            })
+        else:
+            if result.auto_approved:
+                required = rules_for_call(evaluation.call_id).required_evaluations
+                target_model = ContentType.objects.get_for_id(evaluation.target_content_type_id).model
+                target_label = "La expresión" if target_model == 'expression' else "La propuesta"
+                received = (
+                    "Una evaluación positiva recibida" if required == 1
+                    else f"{required} evaluaciones positivas recibidas"
+                )
+                messages.info(
+                    request,
+                    f"¡Autoaprobado! {received}. {target_label} ha sido aprobada automáticamente."
+                )
+            messages.success(request, "Evaluación enviada con éxito.")
+            return redirect('evaluations:evaluator_dashboard')
 
-        return redirect('evaluations:evaluator_dashboard')
+    # Frozen copy of what the researcher submitted (one query)
+    review = review_bundle(evaluation)
 
     context = {
         'evaluation': evaluation,
         'template': template,
-        'items': items,
-        'target_type': target_type,
-        'proposal_fields': proposal_fields,
-        'products': products,
-        'team_members': team_members,
-        #'existing_budget_items': existing_budget_items,
-        'responses': responses,
+        'items': compiled.items,
+        'target_type': review['kind'],
+        'review': review,
+        'proposal_fields': review['proposal'] or {},
     }
     return render(request, 'evaluations/evaluate_expression.html', context)
 
 @login_required
+@role_required('Coordinator')
 def coordinator_view_evaluations(request):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied.")
-        return redirect('home')
-
     evaluations = Evaluation.objects.filter(
-        status__name='Completada'
+        status_id=statuses.id('Completada'), submission_datetime__isnull=False,
     ).select_related(
         'target_content_type',
         'evaluator__person',
+        'evaluator__user',
+        'researcher__person',
+        'researcher__user',
+        'call',
         'template',
         'status'
-    ).order_by('-submission_datetime')
+    )
+    page = KeysetPaginator(
+        evaluations, ('-submission_datetime', '-pk'), non_null=('submission_datetime',)
+    ).page(request.GET.get('cursor'))
 
     context = {
-        'evaluations': evaluations,
+        'evaluations': page,
+        'page': page,
     }
     return render(request, 'evaluations/coordinator_view_evaluations.html', context)
 
 @login_required
-def link_template_to_call(request, template_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied.")
-        return redirect('calls:coordinator_dashboard')
+@role_required('Coordinator')
+def call_score_analysis(request, call_id):
+    """Evaluator bias, item statistics and inter-rater agreement of a call (POST recomputes)."""
+    call = get_object_or_404(Call, id=call_id)
+    if request.method == 'POST':
+        analyses = store_call_analyses(call.id)
+        messages.success(request, f"Análisis recalculado ({len(analyses)} plantilla(s)).")
+        return redirect('evaluations:call_score_analysis', call_id=call.id)
+
+    analyses = ScoreAnalysis.objects.filter(call=call).select_related('template').prefetch_related(
+        Prefetch(
+            'evaluator_stats',
+            queryset=EvaluatorScoreStats.objects.select_related('evaluator__person', 'evaluator__user').order_by('mean'),
+        ),
+        Prefetch(
+            'item_stats',
+            queryset=ItemScoreStats.objects.select_related('item').order_by('-variance'),
+        ),
+        Prefetch(
+            'evaluation_stats',
+            queryset=EvaluationScoreStats.objects.filter(disagreement=True).select_related(
+                'evaluation__evaluator__person', 'evaluation__evaluator__user'
+            ).order_by('evaluation__project_title', 'ratio'),
+            to_attr='disagreements',
+        ),
+    ).order_by('template__name')
+
+    context = {
+        'call': call,
+        'analyses': analyses,
+    }
+    return render(request, 'evaluations/call_score_analysis.html', context)
+
+def _ranking_request(request, call_id, max_page_size=RANKING_PAGE_SIZE):
+    """Call, target type, content type, page and page size of a ranking request."""
+    call = get_object_or_404(Call, id=call_id)
+    target_type = 'proposal' if request.GET.get('type') == 'proposal' else 'expression'
+    content_type = ContentType.objects.get_for_model(Proposal if target_type == 'proposal' else Expression)
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+        page_size = min(max(int(request.GET.get('page_size', RANKING_PAGE_SIZE)), 1), max_page_size)
+    except ValueError:
+        page, page_size = 1, RANKING_PAGE_SIZE
+    return call, target_type, content_type, page, page_size
+
+
+@login_required
+@role_required('Coordinator')
+def call_ranking(request, call_id):
+    """Expressions or proposals of a call ordered by their evaluations (?type=, ?page=)."""
+    call, target_type, content_type, page, page_size = _ranking_request(request, call_id)
+    rows, total = ranking_page(call.id, content_type.id, page, page_size)
+    num_pages = max((total + page_size - 1) // page_size, 1)
+
+    context = {
+        'call': call,
+        'target_type': target_type,
+        'rankings': rows,
+        'total': total,
+        'page': page,
+        'num_pages': num_pages,
+        'previous_page': page - 1 if page > 1 else None,
+        'next_page': page + 1 if page < num_pages else None,
+    }
+    return render(request, 'evaluations/call_ranking.html', context)
+
+
+@login_required
+@role_required('Coordinator', json=True)
+def call_ranking_json(request, call_id):
+    call, target_type, content_type, page, page_size = _ranking_request(request, call_id, max_page_size=200)
+    rows, total = ranking_page(call.id, content_type.id, page, page_size)
+    return JsonResponse({
+        'success': True,
+        'call': call.id,
+        'type': target_type,
+        'page': page,
+        'page_size': page_size,
+        'total': total,
+        'has_next': page * page_size < total,
+        'results': [
+            {
+                'rank': r.rank,
+                'target_id': r.target_object_id,
+                'project_title': r.project_title,
+                'evaluation_count': r.evaluation_count,
+                'positive_count': r.positive_count,
+                'mean_score': r.mean_score,
+                'min_score': r.min_score,
+                'max_score': r.max_score,
+            }
+            for r in rows
+        ],
+    })
+
+
+@login_required
+@role_required('Coordinator')
+def export_call_evaluations(request, call_id):
+    """Stream the evaluations (?level=evaluations) or responses (?level=responses) of a call as CSV or XLSX (?format=)."""
+    call = get_object_or_404(Call, id=call_id)
+    level = request.GET.get('level') if request.GET.get('level') in EXPORT_LEVELS else 'evaluations'
+    file_format = request.GET.get('format') if request.GET.get('format') in EXPORT_FORMATS else 'csv'
+    response = StreamingHttpResponse(
+        export_stream(call.id, level, file_format), content_type=EXPORT_FORMATS[file_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(call.id, level, file_format)}"'
+    # Let nginx pass the chunks through instead of buffering the whole file
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 
+@login_required
+@role_required('Coordinator', redirect_to='calls:coordinator_dashboard')
+def link_template_to_call(request, template_id):
     template = get_object_or_404(EvaluationTemplate, id=template_id)
 
     if request.method == 'POST':
@@ -1040,11 +949,8 @@ def link_template_to_call(request, template_id):
 
 
 @login_required
+@role_required('Coordinator', redirect_to='calls:coordinator_dashboard')
 def unlink_template_from_call(request, template_id, call_id):
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Coordinator':
-        messages.error(request, "Access denied.")
-        return redirect('calls:coordinator_dashboard')
-
     template = get_object_or_404(EvaluationTemplate, id=template_id)
     call = get_object_or_404(Call, id=call_id)
     template.calls.remove(call)
@@ -1059,9 +965,10 @@ def evaluation_detail_json(request, evaluation_id):
         evaluation = Evaluation.objects.select_related(
             'target_content_type',
             'evaluator__person',
+            'evaluator__user',
             'template',
             'status'
-        ).get(id=evaluation_id)
+        ).with_targets().get(id=evaluation_id)
     except Evaluation.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Evaluación no encontrada.'}, status=404)
 
@@ -1126,7 +1033,7 @@ def serve_pdf(request, evaluation_id, doc_type):
     """
 
     # Get the evaluation
-    evaluation = get_object_or_404(Evaluation, id=evaluation_id)
+    evaluation = get_object_or_404(Evaluation.objects.with_targets(), id=evaluation_id)
 
     # Ensure user is the evaluator
     if request.user.customuser != evaluation.evaluator:
@@ -1171,7 +1078,7 @@ def get_document_url(request, evaluation_id, doc_type):
     Returns the secure URL to view a document (PDF, DOCX, XLSX, etc.) via Google Docs Viewer.
     Only the evaluator can access it.
     """
-    evaluation = get_object_or_404(Evaluation, id=evaluation_id)
+    evaluation = get_object_or_404(Evaluation.objects.with_targets(), id=evaluation_id)
 
     if request.user.customuser != evaluation.evaluator:
         raise PermissionDenied("No permission to view this document.")
@@ -1212,23 +1119,26 @@ def download_evaluation_document(request, evaluation_id, doc_type):
     if request.user.customuser != evaluation.evaluator:
         raise PermissionDenied("No permission to access this document.")
 
-    target = evaluation.target
+    # Serve the document that was submitted, not whatever the proposal points to now
+    review = review_bundle(evaluation)
+    proposal_fields = review['proposal'] or {}
 
     # Map doc_type to file field
     if doc_type == 'timeline':
-        doc_field = getattr(target, 'timeline_document', None)
+        doc_ref = proposal_fields.get('timeline_document')
         doc_name = 'cronograma.xlsx'
     elif doc_type == 'budget':
-        doc_field = getattr(target, 'budget_document', None)
+        doc_ref = proposal_fields.get('budget_document')
         doc_name = 'presupuesto.xlsx'
     else:
         raise Http404("Invalid document type.")
+    doc_field = ProposalDocument.objects.filter(pk=doc_ref['id']).first() if doc_ref else None
 
     if not doc_field or not doc_field.file:
         raise Http404("Document not found.")
 
     # Get project title safely
-    project_title = evaluation.project_title or "Documento"
+    project_title = review['project_title'] or "Documento"
     
     # Make it filename-safe: keep letters, numbers, spaces, hyphens, underscores; replace rest with underscores
     safe_title = re.sub(r'[^\w\s-]', '_', project_title.strip())
@@ -1244,4 +1154,32 @@ def download_evaluation_document(request, evaluation_id, doc_type):
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
\ No newline at end of file
+    return response
+
+
+@login_required
+def download_review_package(request, evaluation_id):
+    """
+    Stream a ZIP with every document attached to the evaluation's target plus a
+    JSON/HTML summary of the submission. Only the assigned evaluator or a
+    coordinator can download it.
+    """
+    evaluation = get_object_or_404(
+        Evaluation.objects.select_related('evaluator__person', 'evaluator__user', 'template', 'status'),
+        id=evaluation_id,
+    )
+
+    # One permission check for the whole package
+    profile = get_profile(request)
+    is_coordinator = profile is not None and profile.role is not None and profile.role.name == 'Coordinator'
+    if profile is None or (profile.pk != evaluation.evaluator_id and not is_coordinator):
+        raise PermissionDenied("No permission to access this package.")
+
+    review = review_bundle(evaluation)
+    response = StreamingHttpResponse(review_package_stream(evaluation, review), content_type='application/zip')
+    response['Content-Disposition'] = content_disposition_header(
+        as_attachment=True, filename=review_package_filename(evaluation, review)
+    )
+    # Let nginx pass the chunks through instead of buffering the whole file
+    response['X-Accel-Buffering'] = 'no'
+    return response
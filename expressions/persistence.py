@@ -0,0 +1,368 @@
+"""
+Guardado por diferencias de las filas hijas del formulario de Expresión.
+
+`apply_call` antes borraba y volvia a crear productos, miembros del equipo,
+antecedentes, items de presupuesto, roles de la CBO y respuestas en cada
+guardado, con un INSERT por fila. Aqui se comparan las filas enviadas con las
+existentes y solo se escriben las diferencias, en lote:
+
+    - una consulta para leer cada tipo de fila existente,
+    - como maximo un bulk_create, un bulk_update y un DELETE por modelo,
+    - las filas de la tabla intermedia producto <-> efecto estrategico en un
+      solo INSERT y un solo DELETE.
+
+El numero de consultas no depende de cuantas filas tenga el formulario.
+
+Emparejamiento:
+    - BudgetItem por (categoria, periodo) y ExpressionTeamMember por persona
+      (sus unique_together).
+    - ProponentResponse por pregunta.
+    - Productos, antecedentes y roles de CBO no tienen clave natural: se
+      emparejan por posicion (orden de creacion).
+
+Las funciones esperan filas ya validadas (ver `parse_*`) y deben llamarse
+dentro de `transaction.atomic()`; `lock_expression` serializa guardados
+concurrentes de la misma expresión. Cada `sync_*` devuelve un resumen
+{'created', 'updated', 'deleted'} que usa el autosave (calls/api.py).
+"""
+from datetime import date
+
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from budgets.models import BudgetItem
+from cbo.models import CBORelevantRole
+from expressions.models import Expression
+from products.models import ExpressionProduct
+from project_team.models import ExpressionTeamMember, ExpressionInvestigatorThematicAntecedent
+from proponent_forms.models import ProponentResponse
+
+
+# Budget ceiling and scale thresholds for an Expression (COP)
+MAX_EXPRESSION_BUDGET = 900000000
+SCALE_THRESHOLDS = (
+    (250000000, 'S'),
+    (500000000, 'M'),
+)
+
+
+def scale_name_for_budget(total_budget):
+    """'S', 'M' or 'B' for a total budget."""
+    for limit, name in SCALE_THRESHOLDS:
+        if total_budget <= limit:
+            return name
+    return 'B'
+
+
+# -------------------------
+# POST parsing helpers
+# -------------------------
+
+def posted_indices(post, prefix):
+    """Row indices posted as `<prefix><index>`, in form order."""
+    indices = {k[len(prefix):] for k in post.keys() if k.startswith(prefix)}
+    return sorted(indices, key=lambda i: (not i.isdigit(), int(i) if i.isdigit() else 0, i))
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_date(value):
+    if isinstance(value, date):
+        return value
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+def parse_products(post):
+    rows = []
+    for index in posted_indices(post, 'product_title_'):
+        title = post.get(f'product_title_{index}', '').strip()
+        if not title:
+            continue
+        rows.append({
+            'title': title,
+            'description': post.get(f'product_description_{index}', ''),
+            'outcome': post.get(f'product_outcome_{index}', ''),
+            'start_date': to_date(post.get(f'product_start_date_{index}')),
+            'end_date': to_date(post.get(f'product_end_date_{index}')),
+            'effect_ids': {i for i in map(to_int, post.getlist(f'product_strategic_effects_{index}')) if i},
+        })
+    return rows
+
+
+def parse_team_members(post):
+    rows = {}
+    for index in posted_indices(post, 'team_member_person_id_'):
+        person_id = to_int(post.get(f'team_member_person_id_{index}', '').strip())
+        role = post.get(f'team_member_role_{index}', '').strip()
+        if not person_id or not role or person_id in rows:
+            continue
+
+        axis_ids = post.getlist(f'team_member_antecedent_axis_{index}')
+        urls = post.getlist(f'team_member_antecedent_url_{index}')
+        antecedents = []
+        for i, description in enumerate(post.getlist(f'team_member_antecedent_description_{index}')):
+            description = description.strip()
+            if not description:
+                continue
+            antecedents.append({
+                'thematic_axis_id': to_int(axis_ids[i]) if i < len(axis_ids) else None,
+                'description': description,
+                'evidence_url': urls[i].strip() if i < len(urls) else '',
+            })
+
+        rows[person_id] = {
+            'role': role,
+            'status_id': to_int(post.get(f'team_member_status_{index}')),
+            'start_date': to_date(post.get(f'team_member_start_date_{index}')),
+            'end_date': to_date(post.get(f'team_member_end_date_{index}')),
+            'institution_id': to_int(post.get(f'team_member_institution_{index}')),
+            'antecedents': antecedents,
+        }
+    return rows
+
+
+def parse_cbo_roles(post):
+    rows = []
+    for index in posted_indices(post, 'cbo_role_person_name_'):
+        person_name = post.get(f'cbo_role_person_name_{index}', '').strip()
+        if not person_name:
+            continue
+        rows.append({
+            'predefined_role': post.get(f'cbo_role_predefined_{index}') or None,
+            'custom_role': post.get(f'cbo_role_custom_{index}', '').strip(),
+            'person_name': person_name,
+            'contact_phone': post.get(f'cbo_role_phone_{index}', '').strip(),
+            'contact_email': post.get(f'cbo_role_email_{index}', '').strip(),
+        })
+    return rows
+
+
+# -------------------------
+# Bulk write helpers
+# -------------------------
+
+def lock_expression(expression):
+    """Row lock on the expression so two saves of the same form do not interleave."""
+    Expression.objects.select_for_update().filter(pk=expression.pk).values_list('pk', flat=True).first()
+
+
+def _apply(obj, values):
+    """Set `values` on `obj`; return True if anything changed."""
+    changed = False
+    for field, value in values.items():
+        if getattr(obj, field) != value:
+            setattr(obj, field, value)
+            changed = True
+    return changed
+
+
+def _bulk_create(model, objs, **scope):
+    """
+    bulk_create that always leaves primary keys on `objs`.
+
+    MySQL does not return ids from a multi-row INSERT, so the new rows are read
+    back (by scope, in insertion order). The caller holds the expression lock,
+    so no other rows can appear in `scope` meanwhile.
+    """
+    if not objs:
+        return objs
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objs)
+
+    last_pk = model.objects.filter(**scope).order_by('-pk').values_list('pk', flat=True).first() or 0
+    model.objects.bulk_create(objs)
+    new_pks = model.objects.filter(**scope, pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)
+    for obj, pk in zip(objs, new_pks):
+        obj.pk = pk
+    return objs
+
+
+def _bulk_update(model, objs, fields):
+    if not objs:
+        return
+    # bulk_update skips auto_now
+    now = timezone.now()
+    for obj in objs:
+        obj.updated_at = now
+    model.objects.bulk_update(objs, list(fields) + ['updated_at'])
+
+
+def _delete(model, pks):
+    if pks:
+        model.objects.filter(pk__in=pks).delete()
+
+
+def _summary(created, updated, deleted):
+    return {'created': len(created), 'updated': len(updated), 'deleted': len(deleted)}
+
+
+# -------------------------
+# Sync per child type
+# -------------------------
+
+PRODUCT_FIELDS = ('title', 'description', 'outcome', 'start_date', 'end_date')
+
+
+def sync_products(expression, rows, status, user):
+    existing = list(ExpressionProduct.objects.filter(expression=expression).order_by('pk'))
+    through = ExpressionProduct.strategic_effects.through
+    current_links = {
+        (product_id, effect_id): pk
+        for pk, product_id, effect_id in through.objects.filter(expressionproduct__expression=expression)
+        .values_list('id', 'expressionproduct_id', 'strategiceffect_id')
+    }
+
+    to_create, to_update, wanted_links = [], [], []
+    for position, row in enumerate(rows):
+        values = {field: row[field] for field in PRODUCT_FIELDS}
+        if position < len(existing):
+            product = existing[position]
+            if _apply(product, values):
+                to_update.append(product)
+        else:
+            product = ExpressionProduct(expression=expression, status=status, created_by=user, **values)
+            to_create.append(product)
+        wanted_links.append((product, row['effect_ids']))
+
+    removed = [p.pk for p in existing[len(rows):]]
+    _delete(ExpressionProduct, removed)
+    _bulk_update(ExpressionProduct, to_update, PRODUCT_FIELDS)
+    _bulk_create(ExpressionProduct, to_create, expression=expression)
+
+    wanted = {(product.pk, effect_id) for product, effect_ids in wanted_links for effect_id in effect_ids}
+    # Links of deleted products already went with them (cascade)
+    kept_products = {product.pk for product, _ in wanted_links}
+    stale = [pk for link, pk in current_links.items() if link not in wanted and link[0] in kept_products]
+    _delete(through, stale)
+    through.objects.bulk_create(
+        [through(expressionproduct_id=p, strategiceffect_id=e) for p, e in wanted if (p, e) not in current_links]
+    )
+
+    summary = _summary(to_create, to_update, removed)
+    summary['ids'] = [product.pk for product, _ in wanted_links]
+    return summary
+
+
+TEAM_FIELDS = ('role', 'status_id', 'start_date', 'end_date', 'institution_id')
+ANTECEDENT_FIELDS = ('thematic_axis_id', 'description', 'evidence_url')
+
+
+def sync_team_members(expression, rows):
+    existing = {m.person_id: m for m in ExpressionTeamMember.objects.filter(expression=expression)}
+
+    to_create, to_update = [], []
+    members = []
+    for person_id, row in rows.items():
+        values = {field: row[field] for field in TEAM_FIELDS}
+        member = existing.get(person_id)
+        if member is None:
+            member = ExpressionTeamMember(expression=expression, person_id=person_id, **values)
+            to_create.append(member)
+        elif _apply(member, values):
+            to_update.append(member)
+        members.append((member, row['antecedents']))
+
+    removed = [m.pk for person_id, m in existing.items() if person_id not in rows]
+    kept = [m.pk for person_id, m in existing.items() if person_id in rows]
+
+    # Antecedents of removed members go with them (on_delete=CASCADE)
+    _delete(ExpressionTeamMember, removed)
+    _bulk_update(ExpressionTeamMember, to_update, TEAM_FIELDS)
+    _bulk_create(ExpressionTeamMember, to_create, expression=expression)
+
+    current = {}
+    for antecedent in ExpressionInvestigatorThematicAntecedent.objects.filter(team_member_id__in=kept).order_by('pk'):
+        current.setdefault(antecedent.team_member_id, []).append(antecedent)
+
+    ant_create, ant_update, ant_delete = [], [], []
+    for member, antecedents in members:
+        old = current.get(member.pk, [])
+        for position, values in enumerate(antecedents):
+            if position < len(old):
+                if _apply(old[position], values):
+                    ant_update.append(old[position])
+            else:
+                ant_create.append(ExpressionInvestigatorThematicAntecedent(team_member_id=member.pk, **values))
+        ant_delete.extend(a.pk for a in old[len(antecedents):])
+
+    _delete(ExpressionInvestigatorThematicAntecedent, ant_delete)
+    _bulk_update(ExpressionInvestigatorThematicAntecedent, ant_update, ANTECEDENT_FIELDS)
+    ExpressionInvestigatorThematicAntecedent.objects.bulk_create(ant_create)
+
+    summary = _summary(to_create, to_update, removed)
+    summary['ids'] = {person_id: member.pk for (member, _), person_id in zip(members, rows)}
+    return summary
+
+
+def sync_budget_items(expression, rows):
+    """`rows`: {(category_id, period_id): {'amount': Decimal, 'notes': str}}"""
+    existing = {(b.category_id, b.period_id): b for b in BudgetItem.objects.filter(expression=expression)}
+
+    to_create, to_update = [], []
+    for (category_id, period_id), values in rows.items():
+        item = existing.get((category_id, period_id))
+        if item is None:
+            to_create.append(BudgetItem(expression=expression, category_id=category_id, period_id=period_id, **values))
+        elif _apply(item, values):
+            to_update.append(item)
+
+    removed = [b.pk for key, b in existing.items() if key not in rows]
+    _delete(BudgetItem, removed)
+    _bulk_update(BudgetItem, to_update, ('amount', 'notes'))
+    BudgetItem.objects.bulk_create(to_create)
+    return _summary(to_create, to_update, removed)
+
+
+CBO_ROLE_FIELDS = ('predefined_role', 'custom_role', 'person_name', 'contact_phone', 'contact_email')
+
+
+def sync_cbo_roles(cbo, rows):
+    existing = list(CBORelevantRole.objects.filter(cbo=cbo).order_by('pk'))
+
+    to_create, to_update = [], []
+    for position, values in enumerate(rows):
+        if position < len(existing):
+            if _apply(existing[position], values):
+                to_update.append(existing[position])
+        else:
+            to_create.append(CBORelevantRole(cbo=cbo, **values))
+
+    removed = [r.pk for r in existing[len(rows):]]
+    _delete(CBORelevantRole, removed)
+    _bulk_update(CBORelevantRole, to_update, CBO_ROLE_FIELDS)
+    CBORelevantRole.objects.bulk_create(to_create)
+    return _summary(to_create, to_update, removed)
+
+
+def sync_responses(expression, values):
+    """
+    Upsert `values` ({shared_question_id: value}). Responses to questions that
+    were not posted are kept, as with the previous update_or_create loop.
+    """
+    if not values:
+        return _summary([], [], [])
+    existing = {
+        r.shared_question_id: r
+        for r in ProponentResponse.objects.filter(expression=expression, shared_question_id__in=list(values))
+    }
+
+    to_create, to_update = [], []
+    for question_id, value in values.items():
+        response = existing.get(question_id)
+        if response is None:
+            to_create.append(ProponentResponse(expression=expression, shared_question_id=question_id, value=value))
+        elif _apply(response, {'value': value}):
+            to_update.append(response)
+
+    _bulk_update(ProponentResponse, to_update, ('value',))
+    ProponentResponse.objects.bulk_create(to_create)
+    return _summary(to_create, to_update, [])
@@ -2,6 +2,7 @@ from django.db import models
 from core.models import TimestampMixin, AddressMixin, CreatedByMixin
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import RegexValidator
+from common.search import normalize_search
 
 class InstitutionType(TimestampMixin, CreatedByMixin):
     """
@@ -106,7 +107,9 @@ class Institution(TimestampMixin, AddressMixin, CreatedByMixin):
         help_text=_("Marque como inactivo en lugar de eliminar")
     )
 
-
+    # Normalized copies for typeahead (common.search); filled in save()
+    search_name = models.CharField(max_length=200, blank=True, editable=False, db_index=True)
+    search_acronym = models.CharField(max_length=50, blank=True, editable=False, db_index=True)
 
     class Meta:
         verbose_name = _("Institución")
@@ -118,9 +121,23 @@ class Institution(TimestampMixin, AddressMixin, CreatedByMixin):
                 name='unique_institution_per_country'
             )
         ]
+        indexes = [
+            models.Index(fields=['tax_register_number'], name='institution_tax_number_idx'),
+        ]
 
     def __str__(self):
         return self.name
+
+    def update_search_fields(self):
+        self.search_name = normalize_search(self.name)[:200]
+        self.search_acronym = normalize_search(self.acronym)[:50]
+
+    def save(self, *args, **kwargs):
+        self.update_search_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'name', 'acronym'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'search_name', 'search_acronym'}
+        super().save(*args, **kwargs)
     
     # For detail views
     # Defining the URL pattern is needed
@@ -6,5 +6,6 @@ app_name = 'institutions' #Enable institutions:detail
 urlpatterns = [
     #path('', views.institution_list, name='list'),
     path('<int:pk>', views.institution_detail, name='detail'),
+    path('search/', views.institution_search, name='search'),
     #path('create/', views.institution.create, name='create')
 ]
\ No newline at end of file
@@ -1,4 +1,8 @@
+from django.contrib.auth.decorators import login_required
+from django.db.models import Q
 from django.shortcuts import render, get_object_or_404
+from accounts.profile import get_profile
+from common.search import typeahead_response
 from .models import Institution, InstitutionType
 
 def institution_detail(request, pk):
@@ -6,3 +10,40 @@ def institution_detail(request, pk):
     return render(request, 'institutions/detail.html', {'institution': institution})
 
 
+@login_required
+def institution_search(request):
+    """
+    Typeahead: ?q=<prefix> on name, acronym or tax number (accent-insensitive).
+    Coordinators may add ?include_inactive=1.
+    """
+    raw = request.GET.get('q', '').strip()
+    include_inactive = False
+    if request.GET.get('include_inactive') == '1':
+        profile = get_profile(request)
+        include_inactive = (
+            profile is not None and profile.role is not None
+            and profile.role.name == 'Coordinator'
+        )
+
+    def search(term, offset, limit):
+        queryset = Institution.objects.filter(
+            Q(search_name__istartswith=term)
+            | Q(search_acronym__istartswith=term)
+            | Q(tax_register_number__istartswith=raw)
+        )
+        if not include_inactive:
+            queryset = queryset.filter(is_active=True)
+        return [
+            {
+                'id': inst['id'],
+                'name': inst['name'],
+                'acronym': inst['acronym'],
+                'institution_type_name': inst['institution_type__name'],
+                'is_active': inst['is_active'],
+            }
+            for inst in queryset.order_by('search_name', 'id').values(
+                'id', 'name', 'acronym', 'institution_type__name', 'is_active'
+            )[offset:offset + limit]
+        ]
+
+    return typeahead_response(request, 'institutions', search, variant=f'{include_inactive}|{raw}')
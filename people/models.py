@@ -2,6 +2,7 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from core.models import TimestampMixin, CreatedByMixin, AddressMixin
 from geo.models import DocumentType
+from common.search import normalize_search
 
 User = get_user_model()
 
@@ -66,6 +67,10 @@ class Person(TimestampMixin, CreatedByMixin, models.Model):
         verbose_name='Genero'
     )
 
+    # Normalized names for typeahead (common.search); filled in save()
+    search_name = models.CharField(max_length=140, blank=True, editable=False, db_index=True)
+    search_surname = models.CharField(max_length=140, blank=True, editable=False, db_index=True)
+
     class Meta:
         db_table = 'person'
         verbose_name = 'Persona'
@@ -73,6 +78,20 @@ class Person(TimestampMixin, CreatedByMixin, models.Model):
 
     def __str__(self):
         return f"{self.first_name} {self.first_last_name}"
+
+    def update_search_fields(self):
+        names = [self.first_name, self.second_name]
+        surnames = [self.first_last_name, self.second_last_name]
+        self.search_name = normalize_search(' '.join(filter(None, names + surnames)))[:140]
+        self.search_surname = normalize_search(' '.join(filter(None, surnames + names)))[:140]
+
+    def save(self, *args, **kwargs):
+        self.update_search_fields()
+        update_fields = kwargs.get('update_fields')
+        name_fields = {'first_name', 'second_name', 'first_last_name', 'second_last_name'}
+        if update_fields is not None and name_fields & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'search_name', 'search_surname'}
+        super().save(*args, **kwargs)
     
     def get_full_name(self):
         """Return full name (first + second name + both last names)."""
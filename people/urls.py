@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'people'
+
+urlpatterns = [
+    path('search/', views.person_search, name='search'),
+]
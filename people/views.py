@@ -1,3 +1,47 @@
-from django.shortcuts import render
+from django.contrib.auth.decorators import login_required
+from django.db.models import Q
+from django.http import JsonResponse
+from accounts.profile import get_profile
+from common.search import typeahead_response
+from .models import Person
 
-# Create your views here.
+# People without an account are only listed for whoever links accounts to them
+UNLINKED_SEARCH_ROLES = ('Coordinator', 'Admin')
+
+
+@login_required
+def person_search(request):
+    """
+    Typeahead: ?q=<prefix> on names (either order) or document number.
+    ?unlinked=1 leaves out people already linked to a user account
+    (coordinators and admins only, for assigning accounts).
+    """
+    raw = request.GET.get('q', '').strip()
+    unlinked = request.GET.get('unlinked') == '1'
+    if unlinked:
+        profile = get_profile(request)
+        if profile is None or profile.role is None or profile.role.name not in UNLINKED_SEARCH_ROLES:
+            return JsonResponse({'success': False, 'error': 'Permiso denegado'}, status=403)
+
+    def search(term, offset, limit):
+        queryset = Person.objects.filter(
+            Q(search_name__istartswith=term)
+            | Q(search_surname__istartswith=term)
+            | Q(document_number__istartswith=raw)
+        )
+        if unlinked:
+            queryset = queryset.filter(user_account__isnull=True)
+        else:
+            queryset = queryset.filter(created_by__isnull=False)
+        return [
+            {
+                'id': person['id'],
+                'first_name': person['first_name'],
+                'first_last_name': person['first_last_name'],
+            }
+            for person in queryset.order_by('search_name', 'id').values(
+                'id', 'first_name', 'first_last_name'
+            )[offset:offset + limit]
+        ]
+
+    return typeahead_response(request, 'people', search, variant=f'{unlinked}|{raw}')
@@ -5,3 +5,9 @@ class ProponentFormsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'proponent_forms'
     verbose_name = "Formularios del Proponente"
+
+    def ready(self):
+        from .bundle import connect_signals
+
+        # Rebuild compiled per-call forms when a form, question or option changes
+        connect_signals()
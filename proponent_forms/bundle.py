@@ -0,0 +1,270 @@
+"""
+Formulario del proponente compilado por convocatoria.
+
+`form_bundle(call_id)` devuelve una estructura inmutable con las preguntas del
+ProponentForm de la convocatoria (en orden), sus opciones y puntajes, ya
+separadas por destino (expresion / propuesta). Renderizar o validar el
+formulario no consulta la base de datos para la definicion.
+
+Cache:
+    Cada bundle se guarda en memoria del worker y en el cache de Django bajo
+    una clave que incluye dos versiones:
+      - la de la convocatoria, que cambia al modificar su ProponentForm o sus
+        ProponentFormQuestion;
+      - una global, que cambia al modificar cualquier SharedQuestion,
+        SharedQuestionOption o SharedQuestionCategory (pueden estar en varios
+        formularios).
+    Los cambios se publican al hacer commit (post_save / post_delete).
+"""
+import threading
+from dataclasses import dataclass, field
+from decimal import Decimal
+from uuid import uuid4
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from common.reference_data import reference_data
+from core.choices import FIELD_TYPE_CHOICES
+
+GLOBAL_VERSION_KEY = 'climas:proponent_form:version'
+CALL_VERSION_KEY = 'climas:proponent_form:version:{call_id}'
+BUNDLE_KEY = 'climas:proponent_form:{call_id}:{global_version}:{call_version}'
+# Superseded bundles are never read again; let the backend drop them
+BUNDLE_CACHE_TIMEOUT = 60 * 60 * 24
+
+CHOICE_FIELD_TYPES = ('radio', 'dropdown')
+
+# Same as SharedQuestion.TARGET_CHOICES (models.py imports nothing from here)
+TARGET_CHOICES = [
+    ('expression', 'Expresion de Interes'),
+    ('proposal', 'Propuesta Completa')
+]
+
+
+@dataclass(frozen=True)
+class CompiledOption:
+    id: int
+    display_text: str
+    score: Decimal
+
+
+@dataclass(frozen=True)
+class CompiledQuestion:
+    """Read-only copy of a SharedQuestion as placed in one form."""
+    id: int
+    question: str
+    field_type: str
+    target_category: str
+    is_required: bool
+    is_active: bool
+    source_model: str
+    category: str
+    order: int
+    options: tuple = ()
+    legacy_options: tuple = ()
+    scores: dict = field(default_factory=dict, compare=False)
+
+    def get_field_type_display(self):
+        return dict(FIELD_TYPE_CHOICES).get(self.field_type, self.field_type)
+
+    def get_target_category_display(self):
+        return dict(TARGET_CHOICES).get(self.target_category, self.target_category)
+
+    @property
+    def has_options(self):
+        return bool(self.options)
+
+    def get_options(self):
+        """Same result as SharedQuestion.get_options(), without the options query."""
+        if self.field_type == 'dynamic_dropdown' and self.source_model:
+            try:
+                model = apps.get_model(self.source_model)
+            except (LookupError, ValueError) as e:
+                return [f"Error loading {self.source_model}: {e}"]
+            rows = reference_data.for_model_path(self.source_model)
+            for attr in ['name', 'title', 'code', 'label', 'description']:
+                if hasattr(model, attr):
+                    if rows is not None:
+                        return [getattr(obj, attr) for obj in rows]
+                    return list(model.objects.values_list(attr, flat=True))
+            return [str(obj) for obj in model.objects.all()[:50]]
+        if self.options:
+            return [opt.display_text for opt in self.options]
+        return list(self.legacy_options)
+
+    def get_scored_options(self):
+        """Same result as SharedQuestion.get_scored_options()."""
+        if self.field_type == 'dynamic_dropdown':
+            return [(opt, Decimal('0.0')) for opt in self.get_options()]
+        if self.options:
+            return [(opt.display_text, opt.score) for opt in self.options]
+        return [(opt, Decimal('0.0')) for opt in self.legacy_options]
+
+    def score_for(self, value):
+        """Score of a posted choice, or None if it is not one of the options."""
+        return self.scores.get(str(value))
+
+
+@dataclass(frozen=True)
+class FormBundle:
+    call_id: int
+    form_id: int = None
+    title: str = ''
+    is_active: bool = False
+    questions: tuple = ()
+
+    @property
+    def expression_questions(self):
+        return tuple(q for q in self.questions if q.target_category == 'expression')
+
+    @property
+    def proposal_questions(self):
+        return tuple(q for q in self.questions if q.target_category == 'proposal')
+
+    def question(self, question_id, target_category=None):
+        """Question by id (optionally restricted to a target), or None."""
+        for q in self.questions:
+            if q.id == question_id and target_category in (None, q.target_category):
+                return q
+        return None
+
+
+def compile_form(call_id):
+    """Build the bundle for `call_id` from the database (3 queries)."""
+    ProponentForm = apps.get_model('proponent_forms', 'ProponentForm')
+    form = ProponentForm.objects.filter(call_id=call_id).first()
+    if form is None:
+        return FormBundle(call_id=call_id)
+
+    form_questions = (
+        form.form_questions
+        .select_related('shared_question', 'shared_question__category')
+        .prefetch_related('shared_question__options_set')
+        .order_by('order')
+    )
+    questions = []
+    for fq in form_questions:
+        sq = fq.shared_question
+        options = tuple(
+            CompiledOption(id=o.id, display_text=o.display_text, score=o.score)
+            for o in sq.options_set.all()
+        )
+        scores = {o.display_text: o.score for o in options}
+        if not options and sq.field_type in CHOICE_FIELD_TYPES:
+            scores = {str(opt): Decimal('0.0') for opt in (sq.options or [])}
+        questions.append(CompiledQuestion(
+            id=sq.id,
+            question=sq.question,
+            field_type=sq.field_type,
+            target_category=sq.target_category,
+            is_required=sq.is_required,
+            is_active=sq.is_active,
+            source_model=sq.source_model or '',
+            category=sq.category.name if sq.category else '',
+            order=fq.order,
+            options=options,
+            legacy_options=tuple(sq.options or ()),
+            scores=scores,
+        ))
+    return FormBundle(
+        call_id=call_id,
+        form_id=form.id,
+        title=form.title,
+        is_active=form.is_active,
+        questions=tuple(questions),
+    )
+
+
+class FormBundleCache:
+    """
+    Bundles por convocatoria en memoria del worker, respaldados por el cache de Django.
+    El diccionario local se reemplaza entero en cada escritura (los hilos del
+    worker lo comparten).
+    """
+
+    def __init__(self):
+        self._bundles = {}
+        self._lock = threading.Lock()
+
+    def _store(self, call_id, memo):
+        with self._lock:
+            bundles = dict(self._bundles)
+            if memo is None:
+                bundles.pop(call_id, None)
+            else:
+                bundles[call_id] = memo
+            self._bundles = bundles
+
+    def _versions(self, call_id):
+        call_key = CALL_VERSION_KEY.format(call_id=call_id)
+        stamps = cache.get_many([GLOBAL_VERSION_KEY, call_key])
+        for key in (GLOBAL_VERSION_KEY, call_key):
+            if key not in stamps:
+                cache.add(key, uuid4().hex, None)
+                stamps[key] = cache.get(key)
+        return stamps[GLOBAL_VERSION_KEY], stamps[call_key]
+
+    def get(self, call_id):
+        versions = self._versions(call_id)
+        memo = self._bundles.get(call_id)
+        if memo is not None and memo[0] == versions:
+            return memo[1]
+
+        key = BUNDLE_KEY.format(call_id=call_id, global_version=versions[0], call_version=versions[1])
+        bundle = cache.get(key)
+        if bundle is None:
+            bundle = compile_form(call_id)
+            cache.set(key, bundle, BUNDLE_CACHE_TIMEOUT)
+        self._store(call_id, (versions, bundle))
+        return bundle
+
+    def invalidate_call(self, call_id):
+        cache.set(CALL_VERSION_KEY.format(call_id=call_id), uuid4().hex, None)
+        self._store(call_id, None)
+
+    def invalidate_all(self):
+        cache.set(GLOBAL_VERSION_KEY, uuid4().hex, None)
+        with self._lock:
+            self._bundles = {}
+
+
+form_bundles = FormBundleCache()
+
+
+def form_bundle(call_id):
+    """Compiled ProponentForm for a call (empty bundle if the call has no form)."""
+    return form_bundles.get(call_id)
+
+
+def _on_form_change(sender, instance, **kwargs):
+    call_id = instance.call_id
+    transaction.on_commit(lambda: form_bundles.invalidate_call(call_id))
+
+
+def _on_form_question_change(sender, instance, **kwargs):
+    ProponentForm = apps.get_model('proponent_forms', 'ProponentForm')
+    for call_id in ProponentForm.objects.filter(pk=instance.form_id).values_list('call_id', flat=True):
+        transaction.on_commit(lambda call_id=call_id: form_bundles.invalidate_call(call_id))
+
+
+def _on_question_change(sender, **kwargs):
+    transaction.on_commit(form_bundles.invalidate_all)
+
+
+def connect_signals():
+    """Called from ProponentFormsConfig.ready()."""
+    handlers = {
+        'ProponentForm': _on_form_change,
+        'ProponentFormQuestion': _on_form_question_change,
+        'SharedQuestion': _on_question_change,
+        'SharedQuestionOption': _on_question_change,
+        'SharedQuestionCategory': _on_question_change,
+    }
+    for model_name, handler in handlers.items():
+        model = apps.get_model('proponent_forms', model_name)
+        uid = f'form_bundle:{model_name}'
+        post_save.connect(handler, sender=model, dispatch_uid=uid + ':save')
+        post_delete.connect(handler, sender=model, dispatch_uid=uid + ':delete')
@@ -2,6 +2,7 @@ from django.apps import apps
 from django.db import models
 from core.models import TimestampMixin
 from core.choices import SOURCE_MODEL_CHOICES, FIELD_TYPE_CHOICES
+from common.reference_data import reference_data
 from decimal import Decimal
 
 class SharedQuestionCategory(TimestampMixin, models.Model):
@@ -113,8 +114,11 @@ class SharedQuestion(TimestampMixin, models.Model):
             try:
                 app_label, model_name = self.source_model.split('.')
                 model = apps.get_model(app_label, model_name)
+                rows = reference_data.for_model_path(self.source_model)
                 for field in ['name', 'title', 'code', 'label', 'description']:
                     if hasattr(model, field):
+                        if rows is not None:
+                            return [getattr(obj, field) for obj in rows]
                         return list(model.objects.values_list(field, flat=True))
                 return [str(obj) for obj in model.objects.all()[:50]]
             except (LookupError, AttributeError) as e:
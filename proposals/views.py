@@ -5,6 +5,7 @@ from django.shortcuts import get_object_or_404
 from django.core.exceptions import PermissionDenied
 from .models import ProposalDocument
 from accounts.models import CustomUser
+from accounts.decorators import role_required
 from .models import Proposal
 from institutions.models import Institution
 from cbo.models import CBODocument
@@ -80,13 +81,11 @@ def download_cbo_document(request, doc_id):
     return response
 
 @login_required
+@role_required('Researcher', message='Acceso denegado.', json=True)
 def add_institution_to_proposal(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Método no permitido.'})
 
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Researcher':
-        return JsonResponse({'success': False, 'error': 'Acceso denegado.'})
-
     institution_id = request.POST.get('institution_id')
     proposal_id = request.POST.get('proposal_id')
 
@@ -119,13 +118,11 @@ def add_institution_to_proposal(request):
     
 
 @login_required
+@role_required('Researcher', message='Acceso denegado.', json=True)
 def remove_institution_from_proposal(request):
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Método no permitido.'})
 
-    if not hasattr(request.user, 'customuser') or request.user.customuser.role.name != 'Researcher':
-        return JsonResponse({'success': False, 'error': 'Acceso denegado.'})
-
     institution_id = request.POST.get('institution_id')
     proposal_id = request.POST.get('proposal_id')
 